@@ -0,0 +1,66 @@
+"""Throwaway Postgres databases and round-trip counting for benchmarks."""
+
+import functools
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import psycopg
+from psycopg.conninfo import conninfo_to_dict, make_conninfo
+
+
+class RoundTripCounter:
+    """Counts statements sent by psycopg's async cursors in this process.
+
+    `executemany` counts once: psycopg pipelines it into a single round-trip.
+    Every FETCH of a server-side cursor counts as one.
+    """
+
+    METHODS = (
+        (psycopg.AsyncCursor, "execute"),
+        (psycopg.AsyncCursor, "executemany"),
+        (psycopg.AsyncServerCursor, "execute"),
+        (psycopg.AsyncServerCursor, "fetchmany"),
+    )
+
+    def __init__(self):
+        self.count = 0
+        self._originals = {}
+
+    def install(self):
+        for cursor_class, name in self.METHODS:
+            original = getattr(cursor_class, name)
+            self._originals[cursor_class, name] = original
+            setattr(cursor_class, name, self._wrap(original))
+
+    def uninstall(self):
+        for (cursor_class, name), original in self._originals.items():
+            setattr(cursor_class, name, original)
+        self._originals.clear()
+
+    def _wrap(self, original):
+        @functools.wraps(original)
+        async def counted(cursor, *args, **kwargs):
+            self.count += 1
+            return await original(cursor, *args, **kwargs)
+
+        return counted
+
+
+@asynccontextmanager
+async def throwaway_database(admin_url: str) -> AsyncIterator[str]:
+    """Create a scratch database next to `admin_url` and drop it afterwards."""
+    name = f"tntl_bench_{uuid.uuid4().hex[:12]}"
+
+    async with await psycopg.AsyncConnection.connect(
+        admin_url, autocommit=True
+    ) as conn:
+        await conn.execute(f'CREATE DATABASE "{name}"')
+
+    try:
+        yield make_conninfo(**{**conninfo_to_dict(admin_url), "dbname": name})
+    finally:
+        async with await psycopg.AsyncConnection.connect(
+            admin_url, autocommit=True
+        ) as conn:
+            await conn.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
@@ -0,0 +1,195 @@
+"""Local stand-ins for the parts of the Discord API the handlers touch.
+
+Every REST call goes through `FakeRest`, which adds latency, injects 429
+responses and counts calls, so handlers can be timed without a gateway.
+"""
+
+import asyncio
+import itertools
+import random
+from collections import Counter
+
+import discord
+
+_snowflakes = itertools.count(1_000_000_000_000_000_000)
+
+
+def next_snowflake() -> int:
+    return next(_snowflakes)
+
+
+class FakeRest:
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        rate_limit_probability: float = 0.0,
+        retry_after: float = 0.5,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+
+        self.calls: Counter[str] = Counter()
+        self.rate_limited: Counter[str] = Counter()
+        self.rate_limit_wait = 0.0
+
+    async def request(self, route: str):
+        """Simulate one REST call, retrying 429s like py-cord does."""
+        while True:
+            self.calls[route] += 1
+            await asyncio.sleep(
+                max(0.0, self._random.gauss(self.latency, self.jitter))
+            )
+
+            if self._random.random() >= self.rate_limit_probability:
+                return
+
+            self.rate_limited[route] += 1
+            self.rate_limit_wait += self.retry_after
+            await asyncio.sleep(self.retry_after)
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset(self):
+        self.calls.clear()
+        self.rate_limited.clear()
+        self.rate_limit_wait = 0.0
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int = 0, shard_id: int = 0):
+        self.id = guild_id or next_snowflake()
+        self.shard_id = shard_id
+
+
+class FakeUser:
+    def __init__(self, rest: FakeRest, user_id: int | None = None):
+        self._rest = rest
+        self.id = user_id or next_snowflake()
+        self.mention = f"<@{self.id}>"
+        self.dms: list[str] = []
+
+    async def send(self, content: str | None = None, **kwargs):
+        await self._rest.request("POST /users/@me/channels")
+        await self._rest.request("POST /channels/{dm_id}/messages")
+        self.dms.append(content or "")
+
+
+class FakeMessage:
+    def __init__(
+        self,
+        rest: FakeRest,
+        channel: "FakeChannel",
+        content: str = "",
+        author: FakeUser | None = None,
+        embed: discord.Embed | None = None,
+        message_id: int | None = None,
+    ):
+        self._rest = rest
+        self.id = message_id or next_snowflake()
+        self.channel = channel
+        self.guild = channel.guild
+        self.content = content
+        self.author = author
+        self.embeds = [embed] if embed else []
+        self.view: discord.ui.View | None = None
+        self.deleted = False
+
+    async def edit(self, embed: discord.Embed | None = None, **kwargs):
+        await self._rest.request("PATCH /channels/{channel_id}/messages/{message_id}")
+        if embed is not None:
+            self.embeds = [embed]
+
+    async def delete(self, **kwargs):
+        await self._rest.request("DELETE /channels/{channel_id}/messages/{message_id}")
+        self.deleted = True
+
+
+class FakeChannel:
+    def __init__(self, rest: FakeRest, guild: FakeGuild | None = None):
+        self._rest = rest
+        self.id = next_snowflake()
+        self.guild = guild or FakeGuild()
+        self.mention = f"<#{self.id}>"
+        self.messages: dict[int, FakeMessage] = {}
+
+    async def send(
+        self,
+        content: str | None = None,
+        embed: discord.Embed | None = None,
+        view: discord.ui.View | None = None,
+        **kwargs,
+    ) -> FakeMessage:
+        await self._rest.request("POST /channels/{channel_id}/messages")
+        message = FakeMessage(self._rest, self, content or "", embed=embed)
+        message.view = view
+        self.messages[message.id] = message
+        return message
+
+    def get_partial_message(self, message_id: int) -> FakeMessage:
+        return self.messages.get(message_id) or FakeMessage(
+            self._rest, self, message_id=message_id
+        )
+
+    async def delete_messages(self, messages, **kwargs):
+        await self._rest.request("POST /channels/{channel_id}/messages/bulk-delete")
+        for message in messages:
+            message.deleted = True
+
+
+class FakeInteraction:
+    def __init__(
+        self,
+        rest: FakeRest,
+        user: FakeUser,
+        message: FakeMessage | None = None,
+        custom_id: str | None = None,
+    ):
+        self._rest = rest
+        self.user = user
+        self.message = message
+        self.channel = message.channel if message else None
+        self.channel_id = self.channel.id if self.channel else None
+        self.guild = self.channel.guild if self.channel else None
+        self.type = discord.InteractionType.component
+        self.data = {"custom_id": custom_id} if custom_id else {}
+        self.responses: list[str] = []
+
+    async def respond(self, content: str | None = None, **kwargs):
+        await self._rest.request("POST /interactions/{interaction_id}/{token}/callback")
+        self.responses.append(content or "")
+
+
+class FakeApplicationContext:
+    def __init__(self, rest: FakeRest, channel: FakeChannel, author: FakeUser):
+        self._rest = rest
+        self.channel = channel
+        self.author = author
+        self.guild = channel.guild
+        self.responses: list[str] = []
+        self._deferred = False
+
+    async def respond(self, content: str | None = None, **kwargs):
+        route = (
+            "POST /webhooks/{application_id}/{token}"
+            if self._deferred
+            else "POST /interactions/{interaction_id}/{token}/callback"
+        )
+        await self._rest.request(route)
+        self.responses.append(content or "")
+
+    async def defer(self, **kwargs):
+        await self._rest.request("POST /interactions/{interaction_id}/{token}/callback")
+        self._deferred = True
+
+    async def edit(self, content: str | None = None, **kwargs):
+        await self._rest.request("PATCH /webhooks/{application_id}/{token}/messages/@original")
+        self.responses.append(content or "")
+
+    async def send(self, content: str | None = None, **kwargs):
+        return await self.channel.send(content, **kwargs)
@@ -0,0 +1,509 @@
+"""Replay recorded gateway events against the bot's handlers.
+
+Record with the bot itself, then play the file back here:
+
+    EVENT_RECORDING_PATH=events.jsonl.gz python src
+    python -m bench.replay events.jsonl.gz --speed 10 --database-url memory://
+
+Events keep their recorded spacing divided by --speed, and each is handled
+in a task of its own as the gateway does, by the handlers in events.py,
+commands.py and ui.py with real services, a fake Discord and a scratch
+database (see `python -m bench` for the URLs). Upvotes are aimed at
+submissions posted by a watch party before the clock starts, one for each
+recorded submission. Admin commands are skipped, leaving that setup alone.
+
+Reported are throughput and latency percentiles per event type, latency
+being from when the event arrived to when its handler returned, and the
+windows in which the bot fell behind: events answered later than --slo-ms,
+or dispatched late because the event loop was busy.
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from bench.database import throwaway_database  # noqa: E402
+from bench.fake_discord import (  # noqa: E402
+    FakeApplicationContext,
+    FakeChannel,
+    FakeInteraction,
+    FakeMessage,
+    FakeRest,
+    FakeUser,
+    next_snowflake,
+)
+from bench.scenarios import Harness  # noqa: E402
+from canonical_url import canonicalize_url, hash_canonical_url  # noqa: E402
+from config import (  # noqa: E402
+    SUBMISSION_BURST,
+    SUBMISSION_RATE_PER_MINUTE,
+    UPVOTE_BURST,
+    UPVOTE_RATE_PER_MINUTE,
+    logger,
+)
+from services.rate_limiter import RateLimiter  # noqa: E402
+from ui import handle_upvote, parse_upvote_custom_id  # noqa: E402
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Replaying these would redefine the channels or end the cycle the
+# prepared watch party belongs to.
+ADMIN_COMMANDS = {"define-tntl-channel", "start-tntl-watch-party", "end-tntl-cycle"}
+
+# Dispatched later than this after it was due, an event counts as late.
+DISPATCH_LAG_THRESHOLD = 0.1
+
+
+def load_events(path: Path) -> list[dict]:
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as file:
+        events = [json.loads(line) for line in file if line.strip()]
+    events.sort(key=lambda event: event["t"])
+    return events
+
+
+def summarize_latencies(latencies: list[float]) -> dict:
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    def percentile(fraction: float) -> float | None:
+        if not count:
+            return None
+        return round(latencies[min(count - 1, int(count * fraction))] * 1000, 2)
+
+    return {
+        "count": count,
+        "p50_ms": percentile(0.5),
+        "p90_ms": percentile(0.9),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(latencies[-1] * 1000, 2) if count else None,
+    }
+
+
+@dataclass
+class Window:
+    arrived: int = 0
+    handled: int = 0
+    late_dispatches: int = 0
+    max_in_flight: int = 0
+    pending_upvotes: int = 0
+    pending_deletes: int = 0
+    latencies: list[float] = field(default_factory=list)
+
+
+class Replay:
+    """One recording played through a Harness."""
+
+    def __init__(
+        self,
+        harness: Harness,
+        events: list[dict],
+        speed: float,
+        max_gap: float | None = None,
+        window: float = 1.0,
+        slo: float = 1.0,
+        max_submissions: int = 5,
+    ):
+        self.harness = harness
+        self.events = events
+        self.speed = speed
+        self.window = window
+        self.slo = slo
+        self.max_submissions = max_submissions
+
+        # When each event is due, in seconds after the replay starts.
+        self.offsets = []
+        offset = 0.0
+        for previous, event in zip([None, *events], events):
+            if previous is not None:
+                gap = event["t"] - previous["t"]
+                offset += min(gap, max_gap) if max_gap else gap
+            self.offsets.append(offset / speed)
+
+        self.channels: dict[int, FakeChannel] = {}
+        self.users: dict[int, FakeUser] = {}
+        # Recorded submission id -> submission posted for it, and its message.
+        self.targets: dict[int, tuple[int, FakeMessage]] = {}
+
+        self.latencies: dict[str, list[float]] = {}
+        self.dispatch_lags: list[float] = []
+        self.windows: dict[int, Window] = {}
+        self.skipped: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self.in_flight = 0
+        self.duration = 0.0
+        self.drain_duration = 0.0
+        self.db_round_trips = 0
+        self._started_at = 0.0
+
+    def _channel(self, recorded_channel_id: int) -> FakeChannel:
+        if recorded_channel_id not in self.channels:
+            self.channels[recorded_channel_id] = FakeChannel(self.harness.rest)
+        return self.channels[recorded_channel_id]
+
+    def _user(self, recorded_user_id: int) -> FakeUser:
+        if recorded_user_id not in self.users:
+            self.users[recorded_user_id] = FakeUser(self.harness.rest, recorded_user_id)
+        return self.users[recorded_user_id]
+
+    async def prepare(self):
+        """Define the recorded TNTL channels and post what gets upvoted."""
+        rest = self.harness.rest
+        commands = self.harness.commands
+        admin = FakeUser(rest)
+
+        tntl_channels = sorted(
+            {
+                event["channel"]
+                for event in self.events
+                if event["type"] in ("message", "upvote")
+                or event.get("name") == "define-tntl-channel"
+            }
+        )
+        for recorded_channel_id in tntl_channels:
+            channel = self._channel(recorded_channel_id)
+            await commands["define-tntl-channel"](
+                FakeApplicationContext(rest, channel, admin),
+                max_submissions=self.max_submissions,
+            )
+
+            # In the order they were first clicked.
+            targets = list(
+                dict.fromkeys(
+                    event["submission"]
+                    for event in self.events
+                    if event["type"] == "upvote"
+                    and event["channel"] == recorded_channel_id
+                )
+            )
+            if not targets:
+                continue
+
+            for index in range(len(targets)):
+                url = f"https://example.com/replay/{channel.id}/{index}"
+                canonical_url = canonicalize_url(url)
+                await self.harness.db_service.submit_if_under_quota(
+                    url,
+                    channel.id,
+                    next_snowflake(),
+                    canonical_url,
+                    hash_canonical_url(canonical_url),
+                )
+            await commands["start-tntl-watch-party"](
+                FakeApplicationContext(rest, channel, admin)
+            )
+
+            posted = [
+                (parse_upvote_custom_id(message.view.children[0].custom_id), message)
+                for message in channel.messages.values()
+                if message.view is not None
+            ]
+            self.targets.update(zip(targets, posted))  # type: ignore
+
+        rest.reset()
+
+    async def run(self):
+        harness = self.harness
+        round_trips_before = harness.round_trips.count
+        harness.upvote_aggregator.start()
+        harness.submission_cleanup.start()
+        sampler = asyncio.create_task(self._sample())
+
+        self._started_at = time.perf_counter()
+        tasks = []
+        for event, offset in zip(self.events, self.offsets):
+            delay = offset - self._elapsed()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(self._handle(event, offset)))
+        await asyncio.gather(*tasks)
+        self.duration = self._elapsed()
+
+        # Whatever the background services still have to catch up on.
+        sampler.cancel()
+        drain_started_at = time.perf_counter()
+        await harness.upvote_aggregator.stop()
+        await harness.submission_cleanup.stop()
+        self.drain_duration = time.perf_counter() - drain_started_at
+        self.db_round_trips = harness.round_trips.count - round_trips_before
+
+    def _elapsed(self) -> float:
+        return time.perf_counter() - self._started_at
+
+    def _window(self, offset: float) -> Window:
+        index = int(offset / self.window)
+        if index not in self.windows:
+            self.windows[index] = Window()
+        return self.windows[index]
+
+    async def _sample(self):
+        aggregator = self.harness.upvote_aggregator
+        while True:
+            window = self._window(self._elapsed())
+            window.pending_upvotes = max(
+                window.pending_upvotes, aggregator.queued - aggregator.flushed
+            )
+            window.pending_deletes = max(
+                window.pending_deletes, self.harness.submission_cleanup.pending()
+            )
+            await asyncio.sleep(self.window / 4)
+
+    async def _handle(self, event: dict, offset: float):
+        lag = self._elapsed() - offset
+        self.dispatch_lags.append(lag)
+        window = self._window(offset)
+        window.arrived += 1
+        if lag > DISPATCH_LAG_THRESHOLD:
+            window.late_dispatches += 1
+
+        self.in_flight += 1
+        window.max_in_flight = max(window.max_in_flight, self.in_flight)
+        try:
+            kind = await self._dispatch(event)
+        except Exception:
+            logger.exception(f"Replaying {event['type']} event failed")
+            self.errors[event["type"]] += 1
+            return
+        finally:
+            self.in_flight -= 1
+
+        if kind is None:
+            return
+        latency = self._elapsed() - offset
+        self.latencies.setdefault(kind, []).append(latency)
+        window.latencies.append(latency)
+        self._window(self._elapsed()).handled += 1
+
+    async def _dispatch(self, event: dict) -> str | None:
+        """Hand `event` to its handler and return what to file it under."""
+        harness = self.harness
+        rest = harness.rest
+        channel = self._channel(event["channel"])
+        user = self._user(event["user"])
+
+        if event["type"] == "message":
+            message = FakeMessage(rest, channel, event["content"], author=user)
+            await harness.bot.on_message(message)  # type: ignore
+            return "message"
+
+        if event["type"] == "upvote":
+            target = self.targets.get(event["submission"])
+            if target is None:
+                self.skipped["upvote of a submission not posted"] += 1
+                return None
+            tntl_submission_id, message = target
+            interaction = FakeInteraction(
+                rest, user, message, f"upvote_button_{tntl_submission_id}"
+            )
+            await handle_upvote(
+                interaction,  # type: ignore
+                tntl_submission_id,
+                harness.upvote_aggregator,
+                harness.upvote_limiter,
+            )
+            return "upvote"
+
+        if event["type"] == "command":
+            name = event["name"]
+            if name in ADMIN_COMMANDS or name not in harness.commands:
+                self.skipped[f"/{name}"] += 1
+                return None
+            await harness.commands[name](
+                FakeApplicationContext(rest, channel, user), **event["options"]
+            )
+            return f"/{name}"
+
+        self.skipped[event["type"]] += 1
+        return None
+
+    def report(self) -> dict:
+        handled = sum(len(latencies) for latencies in self.latencies.values())
+        slo_ms = self.slo * 1000
+
+        fell_behind = []
+        for index, window in sorted(self.windows.items()):
+            latencies = summarize_latencies(window.latencies)
+            if not window.late_dispatches and (latencies["p99_ms"] or 0) <= slo_ms:
+                continue
+            fell_behind.append(
+                {
+                    "offset_s": round(index * self.window, 3),
+                    "arrived": window.arrived,
+                    "handled": window.handled,
+                    "late_dispatches": window.late_dispatches,
+                    "max_in_flight": window.max_in_flight,
+                    "pending_upvotes": window.pending_upvotes,
+                    "pending_deletes": window.pending_deletes,
+                    "p99_ms": latencies["p99_ms"],
+                }
+            )
+
+        return {
+            "events": len(self.events),
+            "recorded_span_s": (
+                round(self.events[-1]["t"] - self.events[0]["t"], 3)
+                if self.events
+                else 0
+            ),
+            "duration_s": round(self.duration, 4),
+            "throughput_per_s": (
+                round(handled / self.duration, 2) if self.duration else None
+            ),
+            "drain_s": round(self.drain_duration, 4),
+            "by_type": {
+                kind: {
+                    **summarize_latencies(latencies),
+                    "throughput_per_s": (
+                        round(len(latencies) / self.duration, 2)
+                        if self.duration
+                        else None
+                    ),
+                }
+                for kind, latencies in sorted(self.latencies.items())
+            },
+            "dispatch_lag": summarize_latencies(self.dispatch_lags),
+            "fell_behind": fell_behind,
+            "db_round_trips": self.db_round_trips,
+            "rest_calls": dict(self.harness.rest.calls),
+            "skipped": dict(self.skipped),
+            "errors": dict(self.errors),
+        }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", type=Path)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument(
+        "--max-gap",
+        type=float,
+        help="shorten recorded pauses longer than this many seconds",
+    )
+    parser.add_argument("--window", type=float, default=1.0)
+    parser.add_argument("--slo-ms", type=float, default=1000.0)
+    parser.add_argument("--max-submissions", type=int, default=5)
+    parser.add_argument(
+        "--rate-limits",
+        action="store_true",
+        help="apply the bot's configured submission and upvote rate limits",
+    )
+    parser.add_argument("--rest-latency", type=float, default=0.05)
+    parser.add_argument("--rest-jitter", type=float, default=0.02)
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("--database-url or BENCH_DATABASE_URL is required")
+    if not 1 <= args.speed <= 100:
+        parser.error("--speed must be between 1 and 100")
+
+    return args
+
+
+async def main(args: argparse.Namespace) -> dict:
+    events = load_events(args.recording)
+    rest = FakeRest(
+        latency=args.rest_latency,
+        jitter=args.rest_jitter,
+        rate_limit_probability=args.rate_limit_probability,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    limiters = (
+        {
+            "submission_limiter": RateLimiter(
+                rate=SUBMISSION_RATE_PER_MINUTE / 60, burst=SUBMISSION_BURST
+            ),
+            "upvote_limiter": RateLimiter(
+                rate=UPVOTE_RATE_PER_MINUTE / 60, burst=UPVOTE_BURST
+            ),
+        }
+        if args.rate_limits
+        else {}
+    )
+
+    scratch_database = (
+        throwaway_database(args.database_url)
+        if urlsplit(args.database_url).scheme in ("postgresql", "postgres")
+        else nullcontext(args.database_url)
+    )
+    async with scratch_database as conn_string:
+        async with Harness(conn_string, rest, **limiters) as harness:
+            replay = Replay(
+                harness,
+                events,
+                args.speed,
+                max_gap=args.max_gap,
+                window=args.window,
+                slo=args.slo_ms / 1000,
+                max_submissions=args.max_submissions,
+            )
+            await replay.prepare()
+            await replay.run()
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "recording": str(args.recording),
+        "parameters": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("database_url", "output", "recording")
+        },
+        "results": replay.report(),
+    }
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    results = report["results"]
+
+    print(
+        f"{results['events']} events over {results['recorded_span_s']}s replayed in "
+        f"{results['duration_s']}s at {args.speed}x: {results['throughput_per_s']}/s, "
+        f"{results['drain_s']}s to drain"
+    )
+    for kind, summary in results["by_type"].items():
+        print(
+            f"{kind:<28} n={summary['count']:<6} {summary['throughput_per_s']}/s "
+            f"p50={summary['p50_ms']}ms p90={summary['p90_ms']}ms "
+            f"p99={summary['p99_ms']}ms max={summary['max_ms']}ms"
+        )
+    lag = results["dispatch_lag"]
+    print(f"{'dispatch lag':<28} p99={lag['p99_ms']}ms max={lag['max_ms']}ms")
+
+    for window in results["fell_behind"]:
+        print(
+            f"fell behind at {window['offset_s']}s: {window['arrived']} arrived, "
+            f"{window['handled']} handled, {window['max_in_flight']} in flight, "
+            f"p99={window['p99_ms']}ms, {window['pending_upvotes']} upvotes and "
+            f"{window['pending_deletes']} deletes pending"
+        )
+    for reason, count in results["skipped"].items():
+        print(f"{reason}: {count} not replayed")
+    for event_type, count in results["errors"].items():
+        print(f"{event_type}: {count} failed")
+
+    output = (
+        args.output
+        or RESULTS_DIR / f"replay-{report['started_at'].replace(':', '-')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
@@ -0,0 +1,342 @@
+import asyncio
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+import discord
+
+from bench.database import RoundTripCounter
+from bench.fake_discord import (
+    FakeApplicationContext,
+    FakeChannel,
+    FakeInteraction,
+    FakeMessage,
+    FakeRest,
+    FakeUser,
+)
+from commands import register_commands
+from events import register_events
+from services.channel_registry import ChannelRegistry
+from services.cycle_archiver import CycleArchiver
+from services.database import create_database_service
+from services.leaderboard_cache import LeaderboardCache
+from services.rate_limiter import RateLimiter
+from services.submission_cleanup import SubmissionCleanup
+from services.upvote_aggregator import UpvoteAggregator
+from startup import Readiness
+from ui import get_tntl_message_embed, handle_upvote, parse_upvote_custom_id
+
+SUBMISSIONS_PER_USER = 5
+SPAM_CLICKS = 200
+UNLIMITED_BURST = 10**9
+
+
+@dataclass
+class OperationStats:
+    name: str
+    duration: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+    db_round_trips: int = 0
+    rest_calls: int = 0
+    rate_limited: int = 0
+
+    def summary(self) -> dict:
+        count = len(self.latencies)
+        latencies = sorted(self.latencies)
+        return {
+            "count": count,
+            "duration_s": round(self.duration, 4),
+            "throughput_per_s": round(count / self.duration, 2) if self.duration else None,
+            "p50_ms": round(statistics.median(latencies) * 1000, 2) if count else None,
+            "p99_ms": round(latencies[min(count - 1, int(count * 0.99))] * 1000, 2)
+            if count
+            else None,
+            "db_round_trips": self.db_round_trips,
+            "db_round_trips_per_op": round(self.db_round_trips / count, 2) if count else None,
+            "rest_calls_per_op": round(self.rest_calls / count, 2) if count else None,
+            "rate_limited": self.rate_limited,
+        }
+
+
+class Harness:
+    """The bot's handlers wired to real services and a fake Discord."""
+
+    def __init__(
+        self,
+        conn_string: str,
+        rest: FakeRest,
+        submission_limiter: RateLimiter | None = None,
+        upvote_limiter: RateLimiter | None = None,
+    ):
+        self.rest = rest
+        self.round_trips = RoundTripCounter()
+        self.db_service = create_database_service(conn_string)
+        self.channel_registry = ChannelRegistry(self.db_service)
+        # Flushing is driven by the scenario so it can be timed on its own.
+        self.leaderboard_cache = LeaderboardCache(self.db_service)
+        self.upvote_aggregator = UpvoteAggregator(
+            self.db_service,
+            get_tntl_message_embed,
+            edit_interval=0,
+            on_flush=self.leaderboard_cache.invalidate,
+        )
+        self.cycle_archiver = CycleArchiver(self.db_service, batch_delay=0)
+        # Never limiting unless given; the upvote_spam phase brings its own.
+        self.submission_limiter = submission_limiter or RateLimiter(
+            rate=1, burst=UNLIMITED_BURST
+        )
+        self.upvote_limiter = upvote_limiter or RateLimiter(
+            rate=1, burst=UNLIMITED_BURST
+        )
+        # Flushed by the scenario too.
+        self.submission_cleanup = SubmissionCleanup()
+        # Marked ready once the database is up, as the bot does.
+        self.readiness = Readiness()
+
+        self.bot = discord.Bot(intents=discord.Intents.default())
+        register_commands(
+            self.bot,
+            self.db_service,
+            self.channel_registry,
+            self.upvote_aggregator,
+            self.cycle_archiver,
+            self.leaderboard_cache,
+            self.submission_limiter,
+        )
+        register_events(
+            self.bot,
+            self.db_service,
+            self.channel_registry,
+            self.upvote_aggregator,
+            self.submission_limiter,
+            self.upvote_limiter,
+            self.submission_cleanup,
+            self.readiness,
+        )
+        # on_message ignores the bot's own messages, so it needs a bot user.
+        self.bot._connection.user = FakeUser(rest)  # type: ignore
+        self.commands = {
+            command.name: command.callback
+            for command in self.bot.pending_application_commands
+        }
+
+    async def __aenter__(self):
+        await self.db_service.open()
+        await self.db_service.migrate()
+        await self.channel_registry.load()
+        self.readiness.mark_ready()
+        self.round_trips.install()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.round_trips.uninstall()
+        await self.cycle_archiver.stop()
+        await self.db_service.close()
+
+    async def measure(
+        self,
+        name: str,
+        operations: list[Callable[[], Awaitable]],
+        concurrency: int = 1,
+    ) -> OperationStats:
+        stats = OperationStats(name)
+        semaphore = asyncio.Semaphore(concurrency)
+        round_trips_before = self.round_trips.count
+        rest_calls_before = self.rest.total_calls()
+        rate_limited_before = sum(self.rest.rate_limited.values())
+
+        async def timed(operation: Callable[[], Awaitable]):
+            async with semaphore:
+                started_at = time.perf_counter()
+                await operation()
+                stats.latencies.append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(timed(operation) for operation in operations))
+        stats.duration = time.perf_counter() - started_at
+
+        stats.db_round_trips = self.round_trips.count - round_trips_before
+        stats.rest_calls = self.rest.total_calls() - rest_calls_before
+        stats.rate_limited = sum(self.rest.rate_limited.values()) - rate_limited_before
+        return stats
+
+
+async def run_benchmark(
+    conn_string: str,
+    rest: FakeRest,
+    submissions: int,
+    voters: int,
+    concurrency: int,
+) -> list[OperationStats]:
+    results = []
+
+    async with Harness(conn_string, rest) as harness:
+        commands = harness.commands
+        channel = FakeChannel(rest)
+        admin = FakeUser(rest)
+
+        await commands["define-tntl-channel"](
+            FakeApplicationContext(rest, channel, admin),
+            max_submissions=SUBMISSIONS_PER_USER,
+        )
+
+        tntl_channel_id = harness.channel_registry.get_tntl_channel_id(channel.id)
+        assert tntl_channel_id is not None
+
+        submitters = [
+            FakeUser(rest)
+            for _ in range(max(1, -(-submissions // SUBMISSIONS_PER_USER)))
+        ]
+
+        def submit(index: int):
+            context = FakeApplicationContext(
+                rest, channel, submitters[index // SUBMISSIONS_PER_USER]
+            )
+            return lambda: commands["submit-tntl-message"](
+                context, url=f"https://www.youtube.com/watch?v=bench{index}"
+            )
+
+        results.append(
+            await harness.measure(
+                "process_submission",
+                [submit(index) for index in range(submissions)],
+                concurrency,
+            )
+        )
+
+        results.append(
+            await harness.measure(
+                "start_tntl_watch_party",
+                [
+                    lambda: commands["start-tntl-watch-party"](
+                        FakeApplicationContext(rest, channel, admin)
+                    )
+                ],
+            )
+        )
+
+        # Read back from the posted buttons, which works with every backend.
+        posted = [
+            (parse_upvote_custom_id(message.view.children[0].custom_id), message)
+            for message in channel.messages.values()
+            if message.view is not None
+        ]
+
+        voter_users = [FakeUser(rest) for _ in range(voters)]
+
+        def upvote(tntl_submission_id: int, message, user: FakeUser):
+            interaction = FakeInteraction(
+                rest, user, message, f"upvote_button_{tntl_submission_id}"
+            )
+            return lambda: handle_upvote(
+                interaction,
+                tntl_submission_id,
+                harness.upvote_aggregator,
+                harness.upvote_limiter,
+            )
+
+        results.append(
+            await harness.measure(
+                "upvote",
+                [
+                    upvote(tntl_submission_id, message, user)
+                    for user in voter_users
+                    for tntl_submission_id, message in posted
+                ],
+                concurrency,
+            )
+        )
+
+        # One user hammering a button: all but the first few clicks should
+        # be turned away before touching the database.
+        spammer = FakeUser(rest)
+        spam_limiter = RateLimiter(rate=1, burst=10)
+        spam_target, spam_message = posted[0]
+        results.append(
+            await harness.measure(
+                "upvote_spam",
+                [
+                    lambda: handle_upvote(
+                        FakeInteraction(
+                            rest, spammer, spam_message, f"upvote_button_{spam_target}"
+                        ),
+                        spam_target,
+                        harness.upvote_aggregator,
+                        spam_limiter,
+                    )
+                    for _ in range(SPAM_CLICKS)
+                ],
+                concurrency,
+            )
+        )
+
+        results.append(
+            await harness.measure(
+                "upvote_flush", [harness.upvote_aggregator.drain]
+            )
+        )
+
+        def show_leaderboard(name: str, page: int):
+            return lambda: commands[name](
+                FakeApplicationContext(rest, channel, voter_users[0]), page=page
+            )
+
+        results.append(
+            await harness.measure(
+                "leaderboard",
+                [
+                    show_leaderboard(name, page)
+                    for name in ("tntl-leaderboard", "tntl-all-time-leaderboard")
+                    for page in (1, 2, 1, 2)
+                ],
+            )
+        )
+
+        results.append(
+            await harness.measure(
+                "end_tntl_cycle",
+                [
+                    lambda: commands["end-tntl-cycle"](
+                        FakeApplicationContext(rest, channel, admin)
+                    )
+                ],
+            )
+        )
+
+        results.append(
+            await harness.measure("cycle_archive", [harness.cycle_archiver.join])
+        )
+
+        # Submissions posted as channel messages, in a channel of their own
+        # so the phases above are unaffected.
+        message_channel = FakeChannel(rest)
+        await commands["define-tntl-channel"](
+            FakeApplicationContext(rest, message_channel, admin),
+            max_submissions=SUBMISSIONS_PER_USER,
+        )
+
+        def post(index: int):
+            message = FakeMessage(
+                rest,
+                message_channel,
+                f"https://www.youtube.com/watch?v=message{index}",
+                author=submitters[index // SUBMISSIONS_PER_USER],
+            )
+            return lambda: harness.bot.on_message(message)
+
+        results.append(
+            await harness.measure(
+                "on_message",
+                [post(index) for index in range(submissions)],
+                concurrency,
+            )
+        )
+        results.append(
+            await harness.measure(
+                "submission_cleanup", [harness.submission_cleanup.drain]
+            )
+        )
+
+    return results
+
@@ -1,25 +1,76 @@
+import argparse
+import asyncio
+import sys
+
 import discord
 
 from commands import register_commands
 from config import (
+    BLOCKING_POOL_SIZE,
+    CHANNEL_REGISTRY_LISTEN,
+    CYCLE_ARCHIVE_BATCH_DELAY,
+    CYCLE_ARCHIVE_BATCH_SIZE,
     DATABASE_URL,
+    DB_POOL_MAX_LIFETIME,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_PREPARED_STATEMENTS,
+    DB_SLOW_QUERY_MS,
+    DB_TRACE,
     DISCORD_TOKEN,
+    EVENT_RECORDING_ANONYMIZE,
+    EVENT_RECORDING_PATH,
+    LEADERBOARD_CACHE_SIZE,
+    LEADERBOARD_CACHE_TTL,
+    LEADERBOARD_PAGE_SIZE,
+    LOOP_LAG_INTERVAL,
+    LOOP_LAG_THRESHOLD,
+    METRICS_HOST,
+    METRICS_PORT,
     POSTGRES_DB,
     POSTGRES_HOST,
     POSTGRES_PASSWORD,
     POSTGRES_PORT,
     POSTGRES_USER,
+    REST_MAX_CONCURRENCY,
+    SUBMISSION_BURST,
+    SUBMISSION_CLEANUP_INTERVAL,
+    SUBMISSION_CLEANUP_MAX_ATTEMPTS,
+    SUBMISSION_RATE_PER_MINUTE,
+    UPVOTE_BURST,
+    UPVOTE_EDIT_INTERVAL,
+    UPVOTE_FLUSH_INTERVAL,
+    UPVOTE_MESSAGE_CACHE_SIZE,
+    UPVOTE_RATE_PER_MINUTE,
+    WORKER_INDEX,
     logger,
 )
 from events import register_events
-from services.database import DatabaseService
+from metrics import REGISTRY, CallbackMetric, instrument_bot, start_metrics_server
+from monitoring import LoopLagMonitor, configure_blocking_executor
+from recording import EventRecorder
+from services.channel_registry import ChannelRegistry
+from services.cycle_archiver import CycleArchiver
+from services.database import create_database_service
+from services.leaderboard_cache import LeaderboardCache
+from services.rate_limiter import RateLimiter
+from services.rest_scheduler import RestScheduler
+from services.submission_cleanup import SubmissionCleanup
+from services.upvote_aggregator import UpvoteAggregator
+from sharding import ShardStats, create_bot, run_workers
+from startup import Readiness
+from ui import get_tntl_message_embed
 
 # Configs
 
 intents = discord.Intents.default()
 intents.message_content = True
 
-bot = discord.bot.Bot(intents=intents)
+bot = create_bot(intents)
+shard_stats = ShardStats(bot)
+readiness = Readiness()
+readiness.install(bot)
 
 db_url_defined = DATABASE_URL is not None
 db_url_fields_defined = (
@@ -47,17 +98,400 @@ conn_string = (
 
 # Database service setup
 
-db_service = DatabaseService(conn_string)
-db_service.migrate()
-logger.info("Database migration completed")
+db_service = create_database_service(
+    conn_string,
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    max_lifetime=DB_POOL_MAX_LIFETIME,
+    timeout=DB_POOL_TIMEOUT,
+    prepare=DB_PREPARED_STATEMENTS,
+    slow_query_threshold=DB_SLOW_QUERY_MS / 1000,
+    trace=DB_TRACE,
+)
+channel_registry = ChannelRegistry(db_service)
+cycle_archiver = CycleArchiver(
+    db_service,
+    batch_size=CYCLE_ARCHIVE_BATCH_SIZE,
+    batch_delay=CYCLE_ARCHIVE_BATCH_DELAY,
+)
+loop_lag_monitor = LoopLagMonitor(
+    interval=LOOP_LAG_INTERVAL, threshold=LOOP_LAG_THRESHOLD
+)
+submission_limiter = RateLimiter(
+    rate=SUBMISSION_RATE_PER_MINUTE / 60, burst=SUBMISSION_BURST
+)
+upvote_limiter = RateLimiter(rate=UPVOTE_RATE_PER_MINUTE / 60, burst=UPVOTE_BURST)
+leaderboard_cache = LeaderboardCache(
+    db_service,
+    page_size=LEADERBOARD_PAGE_SIZE,
+    ttl=LEADERBOARD_CACHE_TTL,
+    max_pages=LEADERBOARD_CACHE_SIZE,
+)
+submission_cleanup = SubmissionCleanup(
+    flush_interval=SUBMISSION_CLEANUP_INTERVAL,
+    max_attempts=SUBMISSION_CLEANUP_MAX_ATTEMPTS,
+)
+upvote_aggregator = UpvoteAggregator(
+    db_service,
+    get_tntl_message_embed,
+    flush_interval=UPVOTE_FLUSH_INTERVAL,
+    edit_interval=UPVOTE_EDIT_INTERVAL,
+    message_cache_size=UPVOTE_MESSAGE_CACHE_SIZE,
+    on_flush=leaderboard_cache.invalidate,
+)
+
+event_recorder = (
+    EventRecorder(
+        EVENT_RECORDING_PATH, channel_registry, anonymize=EVENT_RECORDING_ANONYMIZE
+    )
+    if EVENT_RECORDING_PATH
+    else None
+)
+if event_recorder is not None:
+    event_recorder.install(bot)
+
+# Metrics setup
+
+instrument_bot(bot)
+
+# Outbound REST calls are queued after being timed, so the timings above
+# leave out the time spent in the queue.
+rest_scheduler = RestScheduler(max_concurrency=REST_MAX_CONCURRENCY)
+rest_scheduler.install(bot)
+
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_channel_registry_hits_total",
+        "Channel lookups that found a TNTL channel.",
+        "counter",
+        lambda: channel_registry.hits,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_channel_registry_misses_total",
+        "Channel lookups for non-TNTL channels.",
+        "counter",
+        lambda: channel_registry.misses,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_leaderboard_cache_hits_total",
+        "Leaderboard pages served from memory.",
+        "counter",
+        lambda: leaderboard_cache.hits,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_leaderboard_cache_misses_total",
+        "Leaderboard pages read from the database.",
+        "counter",
+        lambda: leaderboard_cache.misses,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_rate_limited_total",
+        "Submissions and upvotes rejected for coming too fast.",
+        "counter",
+        lambda: {
+            ("submission",): submission_limiter.rejected,
+            ("upvote",): upvote_limiter.rejected,
+        },
+        ("action",),
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_rate_limit_buckets",
+        "Token buckets held in memory.",
+        "gauge",
+        lambda: {
+            ("submission",): len(submission_limiter),
+            ("upvote",): len(upvote_limiter),
+        },
+        ("action",),
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_upvotes_queued_total",
+        "Upvotes buffered by the aggregator.",
+        "counter",
+        lambda: upvote_aggregator.queued,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_upvotes_flushed_total",
+        "Upvotes written to the database.",
+        "counter",
+        lambda: upvote_aggregator.flushed,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_upvote_edits_total",
+        "Submission embeds edited with new counts.",
+        "counter",
+        lambda: upvote_aggregator.edits,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_upvote_coalesced_edits_total",
+        "Embed edits absorbed by a pending one.",
+        "counter",
+        lambda: upvote_aggregator.coalesced_edits,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_submission_messages_deleted_total",
+        "Submission messages removed from TNTL channels.",
+        "counter",
+        lambda: submission_cleanup.deleted,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_submission_bulk_deletes_total",
+        "Bulk deletes of several submission messages.",
+        "counter",
+        lambda: submission_cleanup.bulk_deletes,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_submission_notices_sent_total",
+        "DMs confirming submissions, each covering one or more messages.",
+        "counter",
+        lambda: submission_cleanup.notices_sent,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_submission_notices_coalesced_total",
+        "Submission notices folded into a DM already queued for the user.",
+        "counter",
+        lambda: submission_cleanup.coalesced_notices,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_submission_cleanup_retries_total",
+        "Deletes and DMs queued again after failing.",
+        "counter",
+        lambda: submission_cleanup.retries,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_submission_cleanup_dropped_total",
+        "Messages left undeleted and DMs not sent after giving up.",
+        "counter",
+        lambda: submission_cleanup.dropped,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_submission_messages_pending",
+        "Submission messages waiting to be deleted.",
+        "gauge",
+        submission_cleanup.pending,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_submissions_archived_total",
+        "Submissions moved to the archive after their cycle ended.",
+        "counter",
+        lambda: cycle_archiver.archived,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_discord_rest_queue_depth",
+        "Discord REST calls waiting to be sent, by priority.",
+        "gauge",
+        rest_scheduler.queue_depths,
+        ("priority",),
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_discord_rest_merged_edits_total",
+        "Queued message edits replaced by a newer edit of the same message.",
+        "counter",
+        lambda: rest_scheduler.merged_edits,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_event_loop_blocked_total",
+        "Event loop lag samples above the threshold.",
+        "counter",
+        lambda: loop_lag_monitor.blocked_count,
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_ready",
+        "1 once startup has finished and events are handled.",
+        "gauge",
+        lambda: int(readiness.ready),
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_startup_phase_seconds",
+        "How long each startup phase took.",
+        "gauge",
+        lambda: {
+            (phase,): duration for phase, duration in readiness.phase_durations.items()
+        },
+        ("phase",),
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_db_pool_size",
+        "Connections held by the pool.",
+        "gauge",
+        lambda: db_service.get_pool_stats().get("pool_size", 0),
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_db_pool_available",
+        "Idle connections in the pool.",
+        "gauge",
+        lambda: db_service.get_pool_stats().get("pool_available", 0),
+    )
+)
+REGISTRY.register(
+    CallbackMetric(
+        "tntl_db_pool_requests_waiting",
+        "Callers waiting for a connection.",
+        "gauge",
+        lambda: db_service.get_pool_stats().get("requests_waiting", 0),
+    )
+)
 
 # Register commands
-register_commands(bot, db_service)
+register_commands(
+    bot,
+    db_service,
+    channel_registry,
+    upvote_aggregator,
+    cycle_archiver,
+    leaderboard_cache,
+    submission_limiter,
+)
 
 # Register events
-register_events(bot, db_service)
+register_events(
+    bot,
+    db_service,
+    channel_registry,
+    upvote_aggregator,
+    submission_limiter,
+    upvote_limiter,
+    submission_cleanup,
+    readiness,
+)
+
+
+async def warm_up():
+    """Bring up everything the handlers need while the gateway connects."""
+    async with readiness.phase("database"):
+        await db_service.open()
+        await db_service.migrate()
+    logger.info("Database migration completed")
+
+    async with readiness.phase("channel_registry"):
+        await channel_registry.load()
+    if CHANNEL_REGISTRY_LISTEN:
+        channel_registry.start_listening()
+
+    # Resumes archiving cycles that ended before the restart.
+    async with readiness.phase("background_services"):
+        upvote_aggregator.start()
+        submission_cleanup.start()
+        await cycle_archiver.start()
+
+    readiness.mark_ready()
+
+
+async def main():
+    configure_blocking_executor(BLOCKING_POOL_SIZE)
+    loop_lag_monitor.start()
+    metrics_runner = (
+        await start_metrics_server(METRICS_HOST, METRICS_PORT + WORKER_INDEX)
+        if METRICS_PORT
+        else None
+    )
+
+    try:
+        shard_stats.start()
+        if event_recorder is not None:
+            event_recorder.start()
+
+        async with bot:
+            logger.info("Starting bot")
+            # A failed warm-up cancels the gateway connection and vice versa.
+            async with asyncio.TaskGroup() as startup:
+                startup.create_task(bot.start(DISCORD_TOKEN))  # type: ignore
+                startup.create_task(warm_up())
+    finally:
+        loop_lag_monitor.stop()
+        shard_stats.stop()
+        await upvote_aggregator.stop()
+        await submission_cleanup.stop()
+        await cycle_archiver.stop()
+        await channel_registry.stop_listening()
+        if event_recorder is not None:
+            await event_recorder.stop()
+        await db_service.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+
+
+async def migrate_only():
+    await db_service.open()
+    try:
+        await db_service.migrate()
+        logger.info("Database migration completed")
+    finally:
+        await db_service.close()
 
 
 if __name__ == "__main__":
-    logger.info("Starting bot")
-    bot.run(DISCORD_TOKEN)
+    parser = argparse.ArgumentParser(description="Try Not To Laugh Discord bot")
+    parser.add_argument(
+        "--migrate-only",
+        action="store_true",
+        help="apply pending database migrations and exit",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="spread SHARD_IDS or SHARD_COUNT shards over this many processes",
+    )
+    args = parser.parse_args()
+
+    if args.workers > 1 and not db_service.shared_between_processes:
+        parser.error("--workers needs a Postgres database")
+
+    if args.migrate_only:
+        asyncio.run(migrate_only())
+    elif args.workers > 1:
+        try:
+            sys.exit(run_workers(args.workers))
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        asyncio.run(main())
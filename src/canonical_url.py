@@ -0,0 +1,133 @@
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track where a link was shared from.
+TRACKING_PARAMS = {
+    "fbclid",
+    "feature",
+    "gclid",
+    "igsh",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "ref",
+    "ref_src",
+    "ref_url",
+    "si",
+    "share_id",
+    "utm_campaign",
+    "utm_content",
+    "utm_id",
+    "utm_medium",
+    "utm_name",
+    "utm_source",
+    "utm_term",
+}
+
+HOST_PREFIXES = ("www.", "m.", "mobile.")
+
+YOUTUBE_HOSTS = {"youtube.com", "music.youtube.com", "youtube-nocookie.com"}
+YOUTUBE_PATH_PATTERN = re.compile(r"^/(?:shorts|embed|live|v)/([\w-]{11})")
+YOUTUBE_ID_PATTERN = re.compile(r"^[\w-]{11}$")
+TWITTER_HOSTS = {"twitter.com", "x.com", "fxtwitter.com", "vxtwitter.com", "fixupx.com"}
+TWITTER_PATH_PATTERN = re.compile(r"^/(?:[\w]+|i(?:/web)?)/status(?:es)?/(\d+)")
+INSTAGRAM_PATH_PATTERN = re.compile(r"^/(?:[\w.]+/)?(?:p|reels?|tv)/([\w-]+)")
+TIKTOK_PATH_PATTERN = re.compile(r"^/@[\w.-]+/video/(\d+)")
+VIMEO_PATH_PATTERN = re.compile(r"^/(?:video/)?(\d+)")
+TWITCH_CLIP_PATH_PATTERN = re.compile(r"^/[\w]+/clip/([\w-]+)")
+
+
+def canonicalize_url(text: str) -> str:
+    """Normalize a submitted link so the same clip always maps to one string.
+
+    Links to common video hosts are reduced to the id of the video; other
+    links lose their fragment, tracking parameters and trailing slash.
+    Anything that isn't an http(s) link is only stripped of whitespace.
+    """
+    text = text.strip()
+    candidate = text if "://" in text else f"https://{text}"
+
+    try:
+        parts = urlsplit(candidate)
+    except ValueError:
+        return text
+
+    if parts.scheme.lower() not in ("http", "https") or "." not in parts.netloc:
+        return text
+    if any(character.isspace() for character in candidate):
+        return text
+
+    host = (parts.hostname or "").lower()
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix) :]
+            break
+
+    path = parts.path
+    query = parse_qsl(parts.query, keep_blank_values=True)
+
+    video_url = _canonicalize_video_url(host, path, dict(query))
+    if video_url is not None:
+        return video_url
+
+    query = sorted(
+        (name, value) for name, value in query if name.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit(("https", host, path.rstrip("/"), urlencode(query), ""))
+
+
+def _canonicalize_video_url(
+    host: str, path: str, query: dict[str, str]
+) -> str | None:
+    if host == "youtu.be":
+        video_id = path.strip("/").split("/")[0]
+        if YOUTUBE_ID_PATTERN.match(video_id):
+            return f"https://www.youtube.com/watch?v={video_id}"
+
+    if host in YOUTUBE_HOSTS:
+        match = YOUTUBE_PATH_PATTERN.match(path)
+        video_id = match.group(1) if match else query.get("v", "")
+        if YOUTUBE_ID_PATTERN.match(video_id):
+            return f"https://www.youtube.com/watch?v={video_id}"
+
+    if host in TWITTER_HOSTS:
+        match = TWITTER_PATH_PATTERN.match(path)
+        if match:
+            return f"https://x.com/i/status/{match.group(1)}"
+
+    if host in ("instagram.com", "ddinstagram.com"):
+        match = INSTAGRAM_PATH_PATTERN.match(path)
+        if match:
+            return f"https://www.instagram.com/p/{match.group(1)}"
+
+    if host == "tiktok.com":
+        match = TIKTOK_PATH_PATTERN.match(path)
+        if match:
+            return f"https://www.tiktok.com/video/{match.group(1)}"
+
+    if host in ("vimeo.com", "player.vimeo.com"):
+        match = VIMEO_PATH_PATTERN.match(path)
+        if match:
+            return f"https://vimeo.com/{match.group(1)}"
+
+    if host == "clips.twitch.tv":
+        slug = path.strip("/").split("/")[0]
+        if slug:
+            return f"https://clips.twitch.tv/{slug}"
+
+    if host == "twitch.tv":
+        match = TWITCH_CLIP_PATH_PATTERN.match(path)
+        if match:
+            return f"https://clips.twitch.tv/{match.group(1)}"
+
+    if host in ("reddit.com", "old.reddit.com", "new.reddit.com"):
+        return f"https://www.reddit.com{path.rstrip('/')}"
+
+    return None
+
+
+def hash_canonical_url(canonical_url: str) -> int:
+    """64-bit signed hash of a canonical URL, to fit a BIGINT column."""
+    digest = hashlib.blake2b(canonical_url.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
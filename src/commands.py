@@ -1,16 +1,34 @@
-import random
-
 import discord
 from discord.ext import commands
 
 from checks import is_admin_check
 from config import logger
+from metrics import format_stats
+from services.channel_registry import ChannelRegistry
+from services.cycle_archiver import CycleArchiver
 from services.database import DatabaseService
-from ui import get_tntl_message_embed, get_tntl_message_view
-from utils import NonTntlChannelError, SubmissionLimitExceededError, process_submission
-
-
-def register_commands(bot: discord.Bot, db_service: DatabaseService):
+from services.leaderboard_cache import LeaderboardCache
+from services.rate_limiter import RateLimiter
+from services.upvote_aggregator import UpvoteAggregator
+from utils import (
+    DuplicateSubmissionError,
+    NonTntlChannelError,
+    SubmissionLimitExceededError,
+    SubmissionRateLimitedError,
+    process_submission,
+)
+from watch_party import publish_watch_party
+
+
+def register_commands(
+    bot: discord.Bot,
+    db_service: DatabaseService,
+    channel_registry: ChannelRegistry,
+    upvote_aggregator: UpvoteAggregator,
+    cycle_archiver: CycleArchiver,
+    leaderboard_cache: LeaderboardCache,
+    submission_limiter: RateLimiter,
+):
     @bot.slash_command(name="ping", description="Ping the bot")
     async def ping(ctx):
         logger.debug(f"Ping command received from {ctx.author.id}")
@@ -23,14 +41,15 @@ def register_commands(bot: discord.Bot, db_service: DatabaseService):
     async def define_tntl_channel(ctx: discord.ApplicationContext, max_submissions: int):
         channel = ctx.channel
 
-        tntl_channel_id = db_service.get_tntl_channel_id(channel.id)
+        tntl_channel_id = channel_registry.get_tntl_channel_id(channel.id)
 
         if tntl_channel_id:
             logger.warning(f"Attempted to redefine existing TNTL channel {channel.id}")
             await ctx.respond("Try Not To Laugh channel already defined.")
             return
 
-        db_service.define_tntl_channel(channel.id, max_submissions)
+        tntl_channel_id = await db_service.define_tntl_channel(channel.id, max_submissions)
+        channel_registry.add(channel.id, tntl_channel_id)
         logger.info(
             f"New TNTL channel defined: {channel.id} with {max_submissions} max submissions"
         )
@@ -45,7 +64,14 @@ def register_commands(bot: discord.Bot, db_service: DatabaseService):
     )
     async def submit_tntl_message(ctx: discord.ApplicationContext, url: str):
         try:
-            await process_submission(url, ctx.channel, ctx.author.id, db_service)
+            await process_submission(
+                url,
+                ctx.channel,
+                ctx.author.id,
+                db_service,
+                channel_registry,
+                submission_limiter,
+            )
             await ctx.respond(
                 "Your message has been submitted. It will be posted to the channel when the watch party starts.",
                 ephemeral=True,
@@ -57,6 +83,14 @@ def register_commands(bot: discord.Bot, db_service: DatabaseService):
                 "You have already submitted the maximum number of messages for this channel.",
                 ephemeral=True,
             )
+        except DuplicateSubmissionError:
+            await ctx.respond(
+                "That has already been submitted this cycle.", ephemeral=True
+            )
+        except SubmissionRateLimitedError:
+            await ctx.respond(
+                "You are submitting too fast. Try again in a moment.", ephemeral=True
+            )
 
     @bot.slash_command(
         name="start-tntl-watch-party",
@@ -64,7 +98,7 @@ def register_commands(bot: discord.Bot, db_service: DatabaseService):
     )
     @commands.check(is_admin_check)  # type: ignore
     async def start_tntl_watch_party(ctx: discord.ApplicationContext):
-        tntl_channel_id = db_service.get_tntl_channel_id(ctx.channel.id)
+        tntl_channel_id = channel_registry.get_tntl_channel_id(ctx.channel.id)
 
         if not tntl_channel_id:
             logger.warning(
@@ -73,33 +107,35 @@ def register_commands(bot: discord.Bot, db_service: DatabaseService):
             await ctx.respond("This is not a Try Not To Laugh channel.", ephemeral=True)
             return
 
-        tntl_submissions = db_service.get_tntl_submissions(tntl_channel_id)
-        random.shuffle(tntl_submissions)
-
+        # Posting can take longer than the 3 second interaction deadline.
+        await ctx.defer(ephemeral=True)
+
+        async def report_progress(posted: int, total: int):
+            try:
+                await ctx.edit(content=f"Posting submissions... {posted}/{total}")
+            except discord.HTTPException:
+                logger.warning(
+                    f"Could not report watch party progress in channel {ctx.channel.id}"
+                )
+
+        posted = await publish_watch_party(
+            ctx.channel,  # type: ignore
+            tntl_channel_id,
+            db_service,
+            upvote_aggregator,
+            report_progress,
+        )
         logger.info(
-            f"Starting TNTL watch party in channel {tntl_channel_id} with {len(tntl_submissions)} submissions"
+            f"TNTL watch party in channel {tntl_channel_id} posted {posted} submissions"
         )
 
-        await ctx.channel.send("Here are the submissions for this watch party:")
-
-        for submission in tntl_submissions:
-            upvote_count = db_service.get_upvote_count_by_tntl_submission_id(submission.id)
-            submission_message = await ctx.channel.send(
-                embed=get_tntl_message_embed(submission.message_text, upvote_count),
-                view=get_tntl_message_view(submission.id, db_service, bot),
-            )
-            db_service.delete_submission_messages(submission.id)
-            db_service.link_tntl_submission_to_discord_message(
-                submission.id, submission_message.id
-            )
-
-        await ctx.respond("Try Not To Laugh watch party started.", ephemeral=True)
+        await ctx.edit(content="Try Not To Laugh watch party started.")
 
     @bot.slash_command(name="end-tntl-cycle", description="End the Try Not To Laugh cycle.")
     @commands.check(is_admin_check)  # type: ignore
     async def end_tntl_cycle(ctx: discord.ApplicationContext):
         channel_id = ctx.channel.id
-        tntl_channel_id = db_service.get_tntl_channel_id(channel_id)
+        tntl_channel_id = channel_registry.get_tntl_channel_id(channel_id)
 
         if not tntl_channel_id:
             logger.warning(f"Attempted to end TNTL cycle in non-TNTL channel {channel_id}")
@@ -107,7 +143,7 @@ def register_commands(bot: discord.Bot, db_service: DatabaseService):
             return
 
         logger.info(f"Ending TNTL cycle in channel {channel_id}") 
-        top_upvoted_messages = db_service.get_top_upvoted_messages(tntl_channel_id)
+        top_upvoted_messages = await db_service.get_top_upvoted_messages(tntl_channel_id)
 
         top_upvoted_messages_text = "Here are the top upvoted messages:\n"
 
@@ -116,7 +152,7 @@ def register_commands(bot: discord.Bot, db_service: DatabaseService):
 
         await ctx.send(top_upvoted_messages_text)
 
-        top_upvoted_user_ids = db_service.get_top_upvoted_user_ids(tntl_channel_id)
+        top_upvoted_user_ids = await db_service.get_top_upvoted_user_ids(tntl_channel_id)
 
         top_upvoted_users_text = "Here are the top upvoted users:\n"
 
@@ -125,7 +161,73 @@ def register_commands(bot: discord.Bot, db_service: DatabaseService):
 
         await ctx.send(top_upvoted_users_text)
 
-        db_service.end_tntl_cycle(tntl_channel_id)
-        logger.info(f"TNTL cycle ended in channel {channel_id}")
+        ended_cycle_number = await db_service.end_tntl_cycle(tntl_channel_id)
+        cycle_archiver.schedule(tntl_channel_id, ended_cycle_number)
+        leaderboard_cache.invalidate({tntl_channel_id})
+        upvote_aggregator.forget_channel(channel_id)
+        logger.info(f"TNTL cycle {ended_cycle_number} ended in channel {channel_id}")
 
         await ctx.respond("Try Not To Laugh cycle ended.", ephemeral=True)
+
+    async def respond_with_leaderboard(
+        ctx: discord.ApplicationContext,
+        scope: DatabaseService.LeaderboardScope,
+        page: int,
+    ):
+        tntl_channel_id = channel_registry.get_tntl_channel_id(ctx.channel.id)
+
+        if not tntl_channel_id:
+            await ctx.respond("This is not a Try Not To Laugh channel.", ephemeral=True)
+            return
+
+        page = max(page, 1)
+        entries, has_next = await leaderboard_cache.get_page(
+            tntl_channel_id, scope, page
+        )
+
+        if scope == DatabaseService.LeaderboardScope.CYCLE:
+            text = f"Top submitters this cycle (page {page}):\n"
+        else:
+            text = f"Top submitters of all time (page {page}):\n"
+
+        if not entries:
+            text += "Nobody here yet.\n"
+
+        first_rank = (page - 1) * leaderboard_cache.page_size + 1
+        for rank, entry in enumerate(entries, start=first_rank):
+            text += f"{rank}. <@{entry.submitter_id}> - {entry.upvote_count} upvotes"
+            if entry.submission_count is not None:
+                text += f" over {entry.cycle_count} cycles, {entry.submission_count} submissions"
+            text += "\n"
+
+        if has_next:
+            text += f"Use page {page + 1} to see more."
+
+        await ctx.respond(
+            text, ephemeral=True, allowed_mentions=discord.AllowedMentions.none()
+        )
+
+    @bot.slash_command(
+        name="tntl-leaderboard",
+        description="Show who got the most upvotes this Try Not To Laugh cycle.",
+    )
+    async def tntl_leaderboard(ctx: discord.ApplicationContext, page: int = 1):
+        await respond_with_leaderboard(
+            ctx, DatabaseService.LeaderboardScope.CYCLE, page
+        )
+
+    @bot.slash_command(
+        name="tntl-all-time-leaderboard",
+        description="Show who got the most Try Not To Laugh upvotes of all time.",
+    )
+    async def tntl_all_time_leaderboard(ctx: discord.ApplicationContext, page: int = 1):
+        await respond_with_leaderboard(
+            ctx, DatabaseService.LeaderboardScope.ALL_TIME, page
+        )
+
+    @bot.slash_command(
+        name="tntl-stats", description="Show where the bot spends its time."
+    )
+    @commands.check(is_admin_check)  # type: ignore
+    async def tntl_stats(ctx: discord.ApplicationContext):
+        await ctx.respond(format_stats(), ephemeral=True)
@@ -9,6 +9,89 @@ POSTGRES_HOST = os.getenv("POSTGRES_HOST")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT")
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Connection pool
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+# Queries
+# Turn off behind poolers that can't keep prepared statements (such as
+# PgBouncer before 1.21 in transaction mode).
+DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "true").lower() == "true"
+# Statements slower than this are logged; 0 turns it off.
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+# Per-statement timings and row counts, and plans of slow statements.
+DB_TRACE = os.getenv("DB_TRACE", "false").lower() == "true"
+
+# Channel registry
+CHANNEL_REGISTRY_LISTEN = os.getenv("CHANNEL_REGISTRY_LISTEN", "false").lower() == "true"
+
+# Watch party
+WATCH_PARTY_FETCH_SIZE = int(os.getenv("WATCH_PARTY_FETCH_SIZE", "100"))
+WATCH_PARTY_FLUSH_SIZE = int(os.getenv("WATCH_PARTY_FLUSH_SIZE", "10"))
+
+# Upvotes
+UPVOTE_FLUSH_INTERVAL = float(os.getenv("UPVOTE_FLUSH_INTERVAL", "1"))
+UPVOTE_EDIT_INTERVAL = float(os.getenv("UPVOTE_EDIT_INTERVAL", "5"))
+# Posted messages, and submissions known to be gone, kept in memory.
+UPVOTE_MESSAGE_CACHE_SIZE = int(os.getenv("UPVOTE_MESSAGE_CACHE_SIZE", "10000"))
+
+# Submission cleanup
+SUBMISSION_CLEANUP_INTERVAL = float(os.getenv("SUBMISSION_CLEANUP_INTERVAL", "1"))
+SUBMISSION_CLEANUP_MAX_ATTEMPTS = int(os.getenv("SUBMISSION_CLEANUP_MAX_ATTEMPTS", "5"))
+
+# Cycle archival
+CYCLE_ARCHIVE_BATCH_SIZE = int(os.getenv("CYCLE_ARCHIVE_BATCH_SIZE", "500"))
+CYCLE_ARCHIVE_BATCH_DELAY = float(os.getenv("CYCLE_ARCHIVE_BATCH_DELAY", "0.1"))
+
+# Rate limits, per user and channel
+SUBMISSION_RATE_PER_MINUTE = float(os.getenv("SUBMISSION_RATE_PER_MINUTE", "6"))
+SUBMISSION_BURST = int(os.getenv("SUBMISSION_BURST", "3"))
+UPVOTE_RATE_PER_MINUTE = float(os.getenv("UPVOTE_RATE_PER_MINUTE", "60"))
+UPVOTE_BURST = int(os.getenv("UPVOTE_BURST", "10"))
+
+# Leaderboards
+LEADERBOARD_PAGE_SIZE = int(os.getenv("LEADERBOARD_PAGE_SIZE", "10"))
+LEADERBOARD_CACHE_TTL = float(os.getenv("LEADERBOARD_CACHE_TTL", "30"))
+LEADERBOARD_CACHE_SIZE = int(os.getenv("LEADERBOARD_CACHE_SIZE", "1000"))
+
+# Event recording, for replay with `python -m bench.replay`
+# Messages, upvotes and commands are appended here when set; .gz compresses.
+EVENT_RECORDING_PATH = os.getenv("EVENT_RECORDING_PATH")
+EVENT_RECORDING_ANONYMIZE = (
+    os.getenv("EVENT_RECORDING_ANONYMIZE", "false").lower() == "true"
+)
+
+# Sharding
+SHARD_COUNT = int(os.environ["SHARD_COUNT"]) if os.getenv("SHARD_COUNT") else None
+SHARD_IDS = os.getenv("SHARD_IDS")
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0"))
+WORKER_COUNT = int(os.getenv("WORKER_COUNT", "1"))
+SHARD_STATS_INTERVAL = float(os.getenv("SHARD_STATS_INTERVAL", "60"))
+# Whether this process syncs the application commands; unset, the process
+# running shard 0 does.
+SYNC_COMMANDS = (
+    os.environ["SYNC_COMMANDS"].lower() == "true"
+    if os.getenv("SYNC_COMMANDS")
+    else None
+)
+# Seconds Discord wants between two shards identifying (max_concurrency 1).
+IDENTIFY_INTERVAL = float(os.getenv("IDENTIFY_INTERVAL", "5"))
+
+# Discord REST
+REST_MAX_CONCURRENCY = int(os.getenv("REST_MAX_CONCURRENCY", "5"))
+
+# Event loop
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "4"))
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", "0.1"))
+
+# Metrics
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+# Each sharded worker listens on METRICS_PORT + WORKER_INDEX; 0 disables it.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
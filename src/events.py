@@ -1,26 +1,65 @@
 import discord
 
 from config import logger
+from metrics import EVENT_DURATION, timed
+from services.channel_registry import ChannelRegistry
 from services.database import DatabaseService
-from ui import get_tntl_message_view
-from utils import NonTntlChannelError, SubmissionLimitExceededError, process_submission
+from services.rate_limiter import RateLimiter
+from services.submission_cleanup import SubmissionCleanup
+from services.upvote_aggregator import UpvoteAggregator
+from startup import WARMING_UP_MESSAGE, Readiness
+from ui import handle_upvote, parse_upvote_custom_id
+from utils import (
+    DuplicateSubmissionError,
+    NonTntlChannelError,
+    SubmissionLimitExceededError,
+    SubmissionRateLimitedError,
+    process_submission,
+)
 
 
-def register_events(bot: discord.Bot, db_service: DatabaseService):
+def register_events(
+    bot: discord.Bot,
+    db_service: DatabaseService,
+    channel_registry: ChannelRegistry,
+    upvote_aggregator: UpvoteAggregator,
+    submission_limiter: RateLimiter,
+    upvote_limiter: RateLimiter,
+    submission_cleanup: SubmissionCleanup,
+    readiness: Readiness,
+):
     @bot.event
     async def on_ready():
         logger.info(f"Bot logged in as {bot.user}")
+        print(f"Logged in as {bot.user}")
 
-        submission_ids = db_service.get_tntl_submission_ids()
-        for submission_id in submission_ids:
-            bot.add_view(get_tntl_message_view(submission_id, db_service, bot))
+    @bot.listen("on_interaction")
+    async def on_upvote_interaction(interaction: discord.Interaction):
+        if interaction.type != discord.InteractionType.component or not interaction.data:
+            return
 
-        print(f"Logged in as {bot.user}")
+        tntl_submission_id = parse_upvote_custom_id(
+            interaction.data.get("custom_id", "")  # type: ignore
+        )
+        if tntl_submission_id is None:
+            return
+
+        if not readiness.ready:
+            await interaction.respond(WARMING_UP_MESSAGE, ephemeral=True)
+            return
 
-    @bot.event 
+        await handle_upvote(
+            interaction, tntl_submission_id, upvote_aggregator, upvote_limiter
+        )
+
+    @bot.event
+    @timed(EVENT_DURATION, event="on_message")
     async def on_message(message: discord.Message):
+        # Channels are only known once the registry has loaded.
+        await readiness.wait()
+
         discord_channel_id = message.channel.id
-        tntl_channel_id = db_service.get_tntl_channel_id(discord_channel_id)
+        tntl_channel_id = channel_registry.get_tntl_channel_id(discord_channel_id)
 
         if not tntl_channel_id:
             return
@@ -36,21 +75,26 @@ def register_events(bot: discord.Bot, db_service: DatabaseService):
             return
 
         message_text = message.content
+        notice = None
         try:
             await process_submission(
                 message_text,
                 message.channel,  # type: ignore
                 message_sender_id,
                 db_service,
+                channel_registry,
+                submission_limiter,
             )
-            await message.author.send(
-                "Your message has been submitted. It will be posted to the channel when the watch party starts.",
-            )
+            notice = "Your message has been submitted. It will be posted to the channel when the watch party starts."
         except NonTntlChannelError:
-            await message.author.send("This is not a Try Not To Laugh channel.")
+            notice = "This is not a Try Not To Laugh channel."
         except SubmissionLimitExceededError:
-            await message.author.send(
-                "You have already submitted the maximum number of messages for this channel."
-            )
+            notice = "You have already submitted the maximum number of messages for this channel."
+        except DuplicateSubmissionError:
+            notice = "That has already been submitted this cycle."
+        except SubmissionRateLimitedError:
+            # Spam gets no DM, only its message removed.
+            pass
 
-        await message.delete()
+        # Deleted in bulk and confirmed in one DM per user, a moment later.
+        submission_cleanup.queue(message, notice)
@@ -0,0 +1,352 @@
+import bisect
+import functools
+import inspect
+import logging
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+
+import discord
+from aiohttp import web
+
+from config import logger
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = tuple[str, ...]
+
+
+def _format_labels(labelnames: tuple[str, ...], values: LabelValues, **extra) -> str:
+    pairs = list(zip(labelnames, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in sorted(self.values.items())
+        ]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Per label set: count per bucket (plus +Inf), sum, count.
+        self.values: dict[LabelValues, tuple[list[int], float, int]] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        bucket_counts, total, count = self.values.get(
+            key, ([0] * (len(self.buckets) + 1), 0.0, 0)
+        )
+        bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.values[key] = (bucket_counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def quantile(self, q: float, **labels) -> float | None:
+        """Upper bound of the bucket holding the q-quantile."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        if key not in self.values:
+            return None
+        bucket_counts, _, count = self.values[key]
+        rank = q * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def render(self) -> list[str]:
+        lines = []
+        for key, (bucket_counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le=le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """A counter or gauge whose value is read from elsewhere at scrape time.
+
+    With `labelnames`, the callback returns a value per label values tuple.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        type: str,
+        callback: Callable[[], float] | Callable[[], dict[LabelValues, float]],
+        labelnames: tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.callback = callback
+        self.labelnames = labelnames
+
+    def render(self) -> list[str]:
+        if not self.labelnames:
+            return [f"{self.name} {self.callback()}"]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in sorted(self.callback().items())  # type: ignore
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Counter | Histogram | CallbackMetric] = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+COMMAND_DURATION = REGISTRY.register(
+    Histogram(
+        "tntl_command_duration_seconds", "Slash command handling time.", ("command",)
+    )
+)
+COMMAND_ERRORS = REGISTRY.register(
+    Counter("tntl_command_errors_total", "Slash commands that raised.", ("command",))
+)
+EVENT_DURATION = REGISTRY.register(
+    Histogram(
+        "tntl_event_duration_seconds",
+        "Gateway event and component handling time.",
+        ("event",),
+    )
+)
+DB_QUERY_DURATION = REGISTRY.register(
+    Histogram(
+        "tntl_db_query_duration_seconds",
+        "DatabaseService call time, by method.",
+        ("method",),
+    )
+)
+DB_QUERY_ERRORS = REGISTRY.register(
+    Counter(
+        "tntl_db_query_errors_total", "DatabaseService calls that raised.", ("method",)
+    )
+)
+DB_STATEMENT_DURATION = REGISTRY.register(
+    Histogram(
+        "tntl_db_statement_duration_seconds",
+        "SQL statement time, by statement. Recorded with DB_TRACE only.",
+        ("statement",),
+    )
+)
+DB_STATEMENT_ROWS = REGISTRY.register(
+    Counter(
+        "tntl_db_statement_rows_total",
+        "Rows returned or changed, by statement. Recorded with DB_TRACE only.",
+        ("statement",),
+    )
+)
+DISCORD_REST_DURATION = REGISTRY.register(
+    Histogram(
+        "tntl_discord_rest_duration_seconds",
+        "Discord REST call time, including rate limit waits.",
+        ("method", "route"),
+    )
+)
+DISCORD_REST_QUEUE_WAIT = REGISTRY.register(
+    Histogram(
+        "tntl_discord_rest_queue_wait_seconds",
+        "Time Discord REST calls spent queued before being sent.",
+        ("priority",),
+    )
+)
+DISCORD_RATE_LIMITED = REGISTRY.register(
+    Counter("tntl_discord_rate_limited_total", "429 responses from Discord.")
+)
+DISCORD_RATE_LIMIT_WAIT = REGISTRY.register(
+    Counter(
+        "tntl_discord_rate_limit_wait_seconds_total",
+        "Time spent sleeping on 429 responses.",
+    )
+)
+
+
+def timed(histogram: Histogram, errors: Counter | None = None, **labels):
+    """Decorator observing how long each call of a coroutine function takes."""
+
+    def decorate(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            started_at = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc(**labels)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started_at, **labels)
+
+        return wrapper
+
+    return decorate
+
+
+def instrument_methods(histogram: Histogram, errors: Counter):
+    """Class decorator timing every public coroutine method by name."""
+
+    def decorate(cls):
+        for name, method in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.iscoroutinefunction(method):
+                continue
+            setattr(cls, name, timed(histogram, errors, method=name)(method))
+        return cls
+
+    return decorate
+
+
+class _RateLimitLogHandler(logging.Handler):
+    # py-cord only reports 429s through this log line, with retry_after as
+    # its first argument.
+    def emit(self, record: logging.LogRecord):
+        if str(record.msg).startswith("We are being rate limited") and record.args:
+            DISCORD_RATE_LIMITED.inc()
+            DISCORD_RATE_LIMIT_WAIT.inc(float(record.args[0]))  # type: ignore
+
+
+def instrument_bot(bot: discord.Bot):
+    """Time slash commands and Discord REST calls made by `bot`."""
+    started_at: dict[int, float] = {}
+
+    @bot.before_invoke
+    async def start_command_timer(ctx: discord.ApplicationContext):
+        started_at[id(ctx)] = time.perf_counter()
+
+    @bot.after_invoke
+    async def stop_command_timer(ctx: discord.ApplicationContext):
+        start = started_at.pop(id(ctx), None)
+        if start is None:
+            return
+        command = ctx.command.qualified_name if ctx.command else "unknown"
+        COMMAND_DURATION.observe(time.perf_counter() - start, command=command)
+        if ctx.command_failed:
+            COMMAND_ERRORS.inc(command=command)
+
+    request = bot.http.request
+
+    async def timed_request(route, **kwargs):
+        with DISCORD_REST_DURATION.time(method=route.method, route=route.path):
+            return await request(route, **kwargs)
+
+    bot.http.request = timed_request  # type: ignore
+
+    logging.getLogger("discord.http").addHandler(_RateLimitLogHandler())
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    async def serve_metrics(request: web.Request) -> web.Response:
+        return web.Response(
+            text=REGISTRY.render(), content_type="text/plain", charset="utf-8"
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", serve_metrics)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return runner
+
+
+def format_stats() -> str:
+    """Short human-readable summary for the /tntl-stats command."""
+
+    def describe(histogram: Histogram, label: str) -> list[str]:
+        rows = []
+        for (value,), (_, total, count) in sorted(
+            histogram.values.items(), key=lambda item: -item[1][1]
+        ):
+            p99 = histogram.quantile(0.99, **{label: value})
+            rows.append(
+                f"`{value}` {count}x, avg {total / count * 1000:.0f} ms, p99 <= {p99 * 1000:.0f} ms"
+            )
+        return rows or ["nothing yet"]
+
+    def describe_rest() -> list[str]:
+        rows = []
+        for (method, route), (_, total, count) in sorted(
+            DISCORD_REST_DURATION.values.items(), key=lambda item: -item[1][1]
+        )[:5]:
+            rows.append(f"`{method} {route}` {count}x, avg {total / count * 1000:.0f} ms")
+        return rows or ["nothing yet"]
+
+    sections = [
+        ("Commands", describe(COMMAND_DURATION, "command")),
+        ("Events", describe(EVENT_DURATION, "event")),
+        ("Database (by total time)", describe(DB_QUERY_DURATION, "method")[:8]),
+        ("Discord REST (by total time)", describe_rest()),
+        (
+            "Rate limits",
+            [
+                f"{DISCORD_RATE_LIMITED.values.get((), 0):.0f} hits, "
+                f"{DISCORD_RATE_LIMIT_WAIT.values.get((), 0):.1f} s waited"
+            ],
+        ),
+    ]
+    return "\n\n".join(
+        f"**{title}**\n" + "\n".join(rows) for title, rows in sections
+    )[:1900]
@@ -0,0 +1,70 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import logger
+from metrics import REGISTRY, Histogram
+
+# Upper bounds, in seconds, of the event loop lag histogram buckets.
+LOOP_LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+LOOP_LAG = REGISTRY.register(
+    Histogram(
+        "tntl_event_loop_lag_seconds",
+        "How late the event loop woke up from a short sleep.",
+        buckets=LOOP_LAG_BUCKETS,
+    )
+)
+
+
+def configure_blocking_executor(max_workers: int):
+    """Bound the thread pool behind run_in_executor and asyncio.to_thread.
+
+    Blocking work that has to leave the event loop (DNS lookups for new
+    database connections among it) runs there, so its size caps how many
+    threads that work may occupy.
+    """
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="blocking")
+    )
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up from a short sleep.
+
+    Any lag is time during which the loop was blocked and could not serve
+    gateway heartbeats or interactions. Every sample goes into the
+    `tntl_event_loop_lag_seconds` histogram; samples above `threshold` are
+    logged as warnings.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1):
+        self._interval = interval
+        self._threshold = threshold
+        self._task: asyncio.Task | None = None
+
+        self.max_lag = 0.0
+        self.blocked_count = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def record(self, lag: float):
+        LOOP_LAG.observe(lag)
+        self.max_lag = max(self.max_lag, lag)
+
+        if lag > self._threshold:
+            self.blocked_count += 1
+            logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms")
+
+    async def _run(self):
+        while True:
+            started_at = time.perf_counter()
+            await asyncio.sleep(self._interval)
+            self.record(max(0.0, time.perf_counter() - started_at - self._interval))
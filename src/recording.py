@@ -0,0 +1,164 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TextIO
+
+import discord
+
+from canonical_url import canonicalize_url
+from config import logger
+from services.channel_registry import ChannelRegistry
+from ui import parse_upvote_custom_id
+
+# Command options holding a submitted link, anonymized like message content.
+LINK_OPTIONS = {"url"}
+
+
+class EventRecorder:
+    """Appends the events the bot receives to a JSON lines file for replay.
+
+    Recorded are messages in TNTL channels, upvote clicks and slash
+    commands, one line each, with their arrival time in seconds since the
+    epoch. A path ending in .gz is written gzip compressed. Lines are
+    buffered and written every `flush_interval` seconds from a thread.
+
+    With `anonymize`, user, channel and submission ids are replaced by keyed
+    hashes and links by a made-up URL per canonical link, so duplicates stay
+    duplicates. The key is drawn per run, so ids only line up within one run.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        channel_registry: ChannelRegistry,
+        anonymize: bool = False,
+        flush_interval: float = 1.0,
+    ):
+        self._path = path
+        self._channel_registry = channel_registry
+        self._key = os.urandom(16) if anonymize else None
+        self._flush_interval = flush_interval
+        self._lines: list[str] = []
+        self._file: TextIO | None = None
+        self._task: asyncio.Task | None = None
+        # One thread, so writes and the final close run in order even when
+        # `stop` cancels the loop mid-write.
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="event-recorder"
+        )
+        self.recorded = 0
+
+    def install(self, bot: discord.Bot):
+        @bot.listen("on_message")
+        async def record_message(message: discord.Message):
+            if message.author.bot or message.channel.id not in self._channel_registry:
+                return
+            self._record(
+                "message",
+                message.channel.id,
+                message.author.id,
+                content=self._link(message.content),
+            )
+
+        @bot.listen("on_interaction")
+        async def record_interaction(interaction: discord.Interaction):
+            if not interaction.data or not interaction.user:
+                return
+            channel_id = interaction.channel_id or 0
+
+            if interaction.type == discord.InteractionType.component:
+                tntl_submission_id = parse_upvote_custom_id(
+                    interaction.data.get("custom_id", "")  # type: ignore
+                )
+                if tntl_submission_id is not None:
+                    self._record(
+                        "upvote",
+                        channel_id,
+                        interaction.user.id,
+                        submission=self._id(tntl_submission_id),
+                    )
+            elif interaction.type == discord.InteractionType.application_command:
+                options = {
+                    option["name"]: (
+                        self._link(option["value"])
+                        if option["name"] in LINK_OPTIONS
+                        else option["value"]
+                    )
+                    for option in interaction.data.get("options", [])  # type: ignore
+                }
+                self._record(
+                    "command",
+                    channel_id,
+                    interaction.user.id,
+                    name=interaction.data.get("name"),  # type: ignore
+                    options=options,
+                )
+
+    def _id(self, value: int) -> int:
+        if self._key is None:
+            return value
+        digest = hashlib.blake2b(str(value).encode(), key=self._key, digest_size=7)
+        return int.from_bytes(digest.digest(), "big")
+
+    def _link(self, text: str) -> str:
+        if self._key is None:
+            return text
+        digest = hashlib.blake2b(
+            canonicalize_url(text).encode(), key=self._key, digest_size=8
+        )
+        return f"https://example.com/{digest.hexdigest()}"
+
+    def _record(self, event_type: str, channel_id: int, user_id: int, **fields):
+        event = {
+            "t": round(time.time(), 3),
+            "type": event_type,
+            "channel": self._id(channel_id),
+            "user": self._id(user_id),
+            **fields,
+        }
+        self._lines.append(json.dumps(event, separators=(",", ":")) + "\n")
+        self.recorded += 1
+
+    def start(self):
+        if self._task is not None:
+            return
+        opener = gzip.open if self._path.endswith(".gz") else open
+        self._file = opener(self._path, "at", encoding="utf-8")
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Recording events to {self._path}")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        await self.flush()
+        file, self._file = self._file, None
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, file.close  # type: ignore
+        )
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to write recorded events")
+
+    async def flush(self):
+        if self._file is None or not self._lines:
+            return
+        lines, self._lines = self._lines, []
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._write, self._file, lines
+        )
+
+    @staticmethod
+    def _write(file: TextIO, lines: list[str]):
+        file.writelines(lines)
+        file.flush()
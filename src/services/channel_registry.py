@@ -0,0 +1,77 @@
+import asyncio
+
+from config import logger
+from services.database import DatabaseService
+
+
+class ChannelRegistry:
+    """In-memory map of Discord channel ids to TNTL channel ids.
+
+    Loaded once at startup and kept current by `add`, so looking up a channel
+    never touches the database. With `start_listening` the registry also
+    follows channels defined by other replicas through LISTEN/NOTIFY.
+    """
+
+    LISTEN_RETRY_DELAY = 5
+
+    def __init__(self, db_service: DatabaseService):
+        self._db_service = db_service
+        self._channels: dict[int, int] = {}
+        self._listen_task: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+
+    async def load(self):
+        self._channels = await self._db_service.get_tntl_channels()
+        logger.info(f"Loaded {len(self._channels)} TNTL channels into the registry")
+
+    def get_tntl_channel_id(self, discord_channel_id: int) -> int | None:
+        tntl_channel_id = self._channels.get(discord_channel_id)
+
+        if tntl_channel_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return tntl_channel_id
+
+    def add(self, discord_channel_id: int, tntl_channel_id: int):
+        self._channels[discord_channel_id] = tntl_channel_id
+
+    def __contains__(self, discord_channel_id: int) -> bool:
+        # Not counted as a hit or miss.
+        return discord_channel_id in self._channels
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def start_listening(self):
+        if self._listen_task is None:
+            self._listen_task = asyncio.create_task(self._listen())
+
+    async def stop_listening(self):
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            self._listen_task = None
+
+    async def _listen(self):
+        while True:
+            try:
+                # Reloaded once subscribed, so definitions made while we were
+                # not listening are either loaded or notified.
+                async for (
+                    discord_channel_id,
+                    tntl_channel_id,
+                ) in self._db_service.listen_tntl_channel_definitions(
+                    on_subscribed=self.load
+                ):
+                    logger.info(
+                        f"TNTL channel {discord_channel_id} defined by another replica"
+                    )
+                    self.add(discord_channel_id, tntl_channel_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("TNTL channel listener failed, retrying")
+
+            await asyncio.sleep(self.LISTEN_RETRY_DELAY)
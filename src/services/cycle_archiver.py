@@ -0,0 +1,88 @@
+import asyncio
+
+from config import logger
+from services.database import DatabaseService
+
+
+class CycleArchiver:
+    """Moves the submissions of ended cycles to the archive in the background.
+
+    Submissions are moved `batch_size` at a time, each batch in its own
+    short transaction, with a `batch_delay` pause in between so one large
+    cycle never holds locks other channels' submissions and upvotes need.
+    Progress lives in the database, so teardowns interrupted by a restart
+    are picked up again by `start`.
+    """
+
+    def __init__(
+        self,
+        db_service: DatabaseService,
+        batch_size: int = 500,
+        batch_delay: float = 0.1,
+    ):
+        self._db_service = db_service
+        self._batch_size = batch_size
+        self._batch_delay = batch_delay
+        self._tasks: dict[int, asyncio.Task] = {}
+
+        self.archived = 0
+
+    async def start(self):
+        pending = await self._db_service.get_pending_cycle_teardowns()
+        for tntl_channel_id, cycle_number in pending.items():
+            logger.info(f"Resuming archival of TNTL channel {tntl_channel_id} cycles")
+            self.schedule(tntl_channel_id, cycle_number)
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def schedule(self, tntl_channel_id: int, cycle_number: int):
+        # A running teardown for the channel is replaced, the new one covers
+        # every cycle up to `cycle_number` anyway.
+        previous = self._tasks.get(tntl_channel_id)
+        if previous is not None:
+            previous.cancel()
+
+        task = asyncio.create_task(self._archive(tntl_channel_id, cycle_number))
+        self._tasks[tntl_channel_id] = task
+        task.add_done_callback(lambda _: self._forget(tntl_channel_id, task))
+
+    async def join(self):
+        """Wait until every scheduled teardown has finished."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def _forget(self, tntl_channel_id: int, task: asyncio.Task):
+        if self._tasks.get(tntl_channel_id) is task:
+            del self._tasks[tntl_channel_id]
+
+    async def _archive(self, tntl_channel_id: int, cycle_number: int):
+        archived = 0
+        try:
+            while True:
+                moved = await self._db_service.archive_ended_cycle_batch(
+                    tntl_channel_id, cycle_number, self._batch_size
+                )
+                archived += moved
+                self.archived += moved
+                if not moved:
+                    break
+                await asyncio.sleep(self._batch_delay)
+
+            await self._db_service.complete_cycle_teardown(
+                tntl_channel_id, cycle_number
+            )
+            logger.info(
+                f"Archived {archived} submissions of TNTL channel {tntl_channel_id} up to cycle {cycle_number}"
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # The teardown row is left in place and retried on next start.
+            logger.exception(
+                f"Archiving TNTL channel {tntl_channel_id} cycle {cycle_number} failed"
+            )
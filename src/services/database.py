@@ -1,91 +1,88 @@
+import hashlib
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Awaitable, Callable
 from dataclasses import dataclass
+from enum import Enum
+from urllib.parse import urlsplit
 
-import psycopg
-
-
-class DatabaseService:
-    def __init__(self, conn_string: str):
-        self._connection_string = conn_string
-
-    def get_connection(self):
-        return psycopg.connect(self._connection_string)
-
-    def migrate(self):
-        with self.get_connection() as conn:
-            print("Migrating database...")
-
-            conn.execute(
-                "CREATE TABLE IF NOT EXISTS tntl_channel (id BIGSERIAL PRIMARY KEY, discord_channel_id BIGINT NOT NULL UNIQUE, max_submissions INTEGER NOT NULL)"
-            )
-
-            conn.execute(
-                "CREATE TABLE IF NOT EXISTS tntl_submission (id BIGSERIAL PRIMARY KEY, message_text TEXT NOT NULL, tntl_channel_id BIGINT NOT NULL REFERENCES tntl_channel(id) ON DELETE CASCADE, submitter_id BIGINT NOT NULL, created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
-            )
-
-            conn.execute(
-                "CREATE TABLE IF NOT EXISTS tntl_submission_message (id BIGSERIAL PRIMARY KEY, tntl_submission_id BIGINT NOT NULL REFERENCES tntl_submission(id) ON DELETE CASCADE, discord_message_id BIGINT NOT NULL, UNIQUE(tntl_submission_id))"
-            )
-
-            conn.execute(
-                "CREATE TABLE IF NOT EXISTS tntl_submission_upvote (id BIGSERIAL PRIMARY KEY, tntl_submission_id BIGINT NOT NULL REFERENCES tntl_submission(id) ON DELETE CASCADE, user_id BIGINT NOT NULL, UNIQUE(tntl_submission_id, user_id))"
-            )
-            print("Database migrated.")
-
-    def define_tntl_channel(self, discord_channel_id: int, max_submissions: int):
-        print(
-            f"Defining Try Not To Laugh channel with ID {discord_channel_id} and {max_submissions} submissions."
-        )
-        with self.get_connection() as conn:
-            conn.execute(
-                "INSERT INTO tntl_channel (discord_channel_id, max_submissions) VALUES (%s, %s)",
-                (discord_channel_id, max_submissions),
-            )
-
-    def get_tntl_channel_id(self, discord_channel_id: int) -> int | None:
-        with self.get_connection() as conn:
-            result = conn.execute(
-                "SELECT id FROM tntl_channel WHERE discord_channel_id = %s",
-                (discord_channel_id,),
-            ).fetchone()
-            return result[0] if result else None
-
-    def check_tntl_submission_exists(self, tntl_submission_id: int) -> bool:
-        with self.get_connection() as conn:
-            return (
-                conn.execute(
-                    "SELECT COUNT(*) FROM tntl_submission WHERE id = %s",
-                    (tntl_submission_id,),
-                ).fetchone()[0]
-                > 0
-            )
-
-    def can_submit_tntl_message(self, tntl_channel_id: int, submitter_id: int) -> bool:
-        with self.get_connection() as conn:
-            max_submissions = conn.execute(
-                "SELECT max_submissions FROM tntl_channel WHERE id = %s",
-                (tntl_channel_id,),
-            ).fetchone()[0]
-            submission_count = conn.execute(
-                "SELECT COUNT(*) FROM tntl_submission WHERE tntl_channel_id = %s AND submitter_id = %s",
-                (tntl_channel_id, submitter_id),
-            ).fetchone()[0]
-            return submission_count < max_submissions
-
-    def submit_tntl_message(
-        self, message_text: str, tntl_channel_id: int, submitter_id: int
-    ) -> int:
-        with self.get_connection() as conn:
-            return conn.execute(
-                "INSERT INTO tntl_submission (message_text, tntl_channel_id, submitter_id) VALUES (%s, %s, %s) RETURNING id",
-                (message_text, tntl_channel_id, submitter_id),
-            ).fetchone()[0]
-
-    def upvote_tntl_submission(self, tntl_submission_id: int, user_id: int):
-        with self.get_connection() as conn:
-            conn.execute(
-                "INSERT INTO tntl_submission_upvote (tntl_submission_id, user_id) VALUES (%s, %s) ON CONFLICT DO NOTHING",
-                (tntl_submission_id, user_id),
-            )
+
+class DatabaseService(ABC):
+    """Storage used by the bot, independent of where the data lives.
+
+    Implementations: PostgresDatabaseService (the default, shared by every
+    replica), SqliteDatabaseService (one embedded file) and
+    MemoryDatabaseService (nothing persisted). Pick one with
+    `create_database_service`.
+    """
+
+    # Whether several worker processes can use the same database.
+    shared_between_processes = False
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def get_pool_stats(self) -> dict[str, int]:
+        return {}
+
+    @abstractmethod
+    async def migrate(self): ...
+
+    @abstractmethod
+    async def define_tntl_channel(
+        self, discord_channel_id: int, max_submissions: int
+    ) -> int: ...
+
+    @abstractmethod
+    async def get_tntl_channels(self) -> dict[int, int]: ...
+
+    async def listen_tntl_channel_definitions(
+        self, on_subscribed: Callable[[], Awaitable[None]] | None = None
+    ) -> AsyncIterator[tuple[int, int]]:
+        """Yield (discord channel id, TNTL channel id) as other replicas define them.
+
+        `on_subscribed` is awaited once notifications are being received, so
+        a reload done there can't miss a definition made meanwhile. Backends
+        without notifications call it and end right away, so listeners fall
+        back to reloading every channel now and then.
+        """
+        if on_subscribed is not None:
+            await on_subscribed()
+        return
+        yield
+
+    @abstractmethod
+    async def get_tntl_channel_id(self, discord_channel_id: int) -> int | None: ...
+
+    class SubmissionStatus(Enum):
+        SUBMITTED = "submitted"
+        LIMIT_EXCEEDED = "limit_exceeded"
+        DUPLICATE = "duplicate"
+        NOT_TNTL_CHANNEL = "not_tntl_channel"
+
+    @dataclass
+    class SubmissionResult:
+        status: "DatabaseService.SubmissionStatus"
+        tntl_submission_id: int | None = None
+
+    @abstractmethod
+    async def submit_if_under_quota(
+        self,
+        message_text: str,
+        discord_channel_id: int,
+        submitter_id: int,
+        canonical_url: str,
+        canonical_hash: int,
+    ) -> SubmissionResult:
+        """Store a submission unless the quota is used up or it is a duplicate."""
+
+    @abstractmethod
+    async def upvote_tntl_submissions(
+        self, votes: list[tuple[int, int]]
+    ) -> dict[int, int]:
+        """Record votes and return how many were new, per TNTL channel."""
 
     @dataclass
     class TopUpvotedMessage:
@@ -93,95 +90,136 @@ class DatabaseService:
         upvote_count: int
         sender_id: int
 
-    def get_top_upvoted_messages(
+    @abstractmethod
+    async def get_top_upvoted_messages(
         self, tntl_channel_id: int, limit: int = 10
-    ) -> list[TopUpvotedMessage]:
-        with self.get_connection() as conn:
-            result = conn.execute(
-                """
-                SELECT m.message_text, COUNT(u.user_id), m.submitter_id 
-                FROM tntl_submission m
-                LEFT JOIN tntl_submission_upvote u ON m.id = u.tntl_submission_id
-                WHERE m.tntl_channel_id = %s
-                GROUP BY m.id, m.message_text, m.submitter_id
-                ORDER BY COUNT(u.user_id) DESC 
-                LIMIT %s
-                """,
-                (tntl_channel_id, limit),
-            ).fetchall()
-
-            return [
-                self.TopUpvotedMessage(message_text, upvote_count, sender_id)
-                for message_text, upvote_count, sender_id in result
-            ]
-
-    def get_top_upvoted_user_ids(
+    ) -> list[TopUpvotedMessage]: ...
+
+    @abstractmethod
+    async def get_top_upvoted_user_ids(
         self, tntl_channel_id: int, limit: int = 10
-    ) -> list[int]:
-        with self.get_connection() as conn:
-            result = conn.execute(
-                "SELECT user_id FROM tntl_submission_upvote WHERE tntl_submission_id IN (SELECT id FROM tntl_submission WHERE tntl_channel_id = %s) GROUP BY user_id ORDER BY COUNT(tntl_submission_id) DESC LIMIT %s",
-                (tntl_channel_id, limit),
-            ).fetchall()
-            return [user_id for (user_id,) in result]
-
-    def end_tntl_cycle(self, tntl_channel_id: int):
-        with self.get_connection() as conn:
-            conn.execute(
-                "DELETE FROM tntl_submission WHERE tntl_channel_id = %s",
-                (tntl_channel_id,),
-            )
+    ) -> list[int]: ...
+
+    @abstractmethod
+    async def end_tntl_cycle(self, tntl_channel_id: int) -> int:
+        """Start a new cycle in the channel and return the one that ended."""
+
+    @abstractmethod
+    async def get_pending_cycle_teardowns(self) -> dict[int, int]: ...
+
+    @abstractmethod
+    async def archive_ended_cycle_batch(
+        self, tntl_channel_id: int, cycle_number: int, batch_size: int
+    ) -> int:
+        """Move up to `batch_size` submissions of ended cycles to the archive."""
+
+    @abstractmethod
+    async def complete_cycle_teardown(self, tntl_channel_id: int, cycle_number: int): ...
+
+    class LeaderboardScope(Enum):
+        CYCLE = "cycle"
+        ALL_TIME = "all_time"
 
     @dataclass
-    class TntlSubmission:
+    class LeaderboardEntry:
+        submitter_id: int
+        upvote_count: int
+        submission_count: int | None = None
+        cycle_count: int | None = None
+
+    @abstractmethod
+    async def get_leaderboard(
+        self,
+        tntl_channel_id: int,
+        scope: LeaderboardScope,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> list[LeaderboardEntry]: ...
+
+    @dataclass(slots=True)
+    class WatchPartySubmission:
         id: int
         message_text: str
         submitter_id: int
+        upvote_count: int
+
+    @abstractmethod
+    def stream_watch_party_submissions(
+        self, tntl_channel_id: int, batch_size: int = 100
+    ) -> AsyncIterator[list[WatchPartySubmission]]:
+        """Yield the channel's unposted submissions in the order the party
+        was shuffled into by `begin_watch_party`."""
 
-    def get_tntl_submissions(self, tntl_channel_id: int) -> list[TntlSubmission]:
-        with self.get_connection() as conn:
-            result = conn.execute(
-                "SELECT id, message_text, submitter_id FROM tntl_submission WHERE tntl_channel_id = %s",
-                (tntl_channel_id,),
-            ).fetchall()
-            return [
-                self.TntlSubmission(id, message_text, submitter_id)
-                for id, message_text, submitter_id in result
-            ]
-
-    def link_tntl_submission_to_discord_message(
-        self, tntl_submission_id: int, discord_message_id: int
-    ):
-        with self.get_connection() as conn:
-            conn.execute(
-                "INSERT INTO tntl_submission_message (tntl_submission_id, discord_message_id) VALUES (%s, %s)",
-                (tntl_submission_id, discord_message_id),
-            )
-
-    def get_discord_message_id_by_tntl_submission_id(
+    @dataclass
+    class WatchParty:
+        seed: int
+        total_submissions: int
+        posted_submissions: int
+
+    @abstractmethod
+    async def get_unfinished_watch_party(
+        self, tntl_channel_id: int
+    ) -> WatchParty | None: ...
+
+    @abstractmethod
+    async def begin_watch_party(self, tntl_channel_id: int, seed: int) -> int:
+        """Start a party over every submission of the cycle and return its size."""
+
+    @abstractmethod
+    async def record_watch_party_progress(
+        self, tntl_channel_id: int, links: list[tuple[int, int]]
+    ): ...
+
+    @abstractmethod
+    async def complete_watch_party(self, tntl_channel_id: int): ...
+
+    @abstractmethod
+    async def get_upvote_counts(self, tntl_submission_ids: list[int]) -> dict[int, int]:
+        """Upvote counts by submission; submissions that are gone, or whose
+        cycle ended, are left out."""
+
+    @abstractmethod
+    async def get_discord_message_id_by_tntl_submission_id(
         self, tntl_submission_id: int
     ) -> int | None:
-        with self.get_connection() as conn:
-            return conn.execute(
-                "SELECT discord_message_id FROM tntl_submission_message WHERE tntl_submission_id = %s",
-                (tntl_submission_id,),
-            ).fetchone()[0]
-
-    def get_upvote_count_by_tntl_submission_id(self, tntl_submission_id: int) -> int:
-        with self.get_connection() as conn:
-            return conn.execute(
-                "SELECT COUNT(*) FROM tntl_submission_upvote WHERE tntl_submission_id = %s",
-                (tntl_submission_id,),
-            ).fetchone()[0]
-
-    def get_tntl_submission_ids(self) -> list[int]:
-        with self.get_connection() as conn:
-            result = conn.execute("SELECT id FROM tntl_submission").fetchall()
-            return [id for (id,) in result]
-
-    def delete_submission_messages(self, tntl_submission_id: int):
-        with self.get_connection() as conn:
-            conn.execute(
-                "DELETE FROM tntl_submission_message WHERE tntl_submission_id = %s",
-                (tntl_submission_id,),
-            )
+        """The message a submission of a current cycle is posted as."""
+
+
+def shuffle_key(tntl_submission_id: int, seed: int) -> int:
+    """Sort key giving the seeded watch party order of the embedded backends."""
+    digest = hashlib.blake2b(
+        f"{tntl_submission_id}:{seed}".encode(), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def create_database_service(database_url: str, **postgres_options) -> DatabaseService:
+    """Pick the backend from the URL scheme.
+
+    postgresql:// (or postgres://, or a libpq key=value string) uses
+    Postgres with `postgres_options`, sqlite:///tntl.db an embedded SQLite file
+    and memory:// keeps everything in this process. Only Postgres can be shared by several
+    processes, the others are meant for one worker.
+    """
+    # Backends are imported on demand so each one only needs its own driver.
+    scheme = urlsplit(database_url).scheme
+
+    # Without a scheme it is a libpq "key=value" connection string.
+    if scheme in ("postgresql", "postgres", ""):
+        from services.postgres_database import PostgresDatabaseService
+
+        return PostgresDatabaseService(database_url, **postgres_options)
+
+    if scheme == "sqlite":
+        from services.sqlite_database import SqliteDatabaseService
+
+        # Like SQLAlchemy: sqlite:///relative.db, sqlite:////absolute.db.
+        path = database_url.removeprefix("sqlite://").removeprefix("/")
+        return SqliteDatabaseService(path or ":memory:")
+
+    if scheme == "memory":
+        from services.memory_database import MemoryDatabaseService
+
+        return MemoryDatabaseService()
+
+    raise ValueError(f"Unsupported DATABASE_URL scheme: {scheme!r}")
@@ -0,0 +1,90 @@
+import time
+from collections import OrderedDict
+
+from services.database import DatabaseService
+
+
+class LeaderboardCache:
+    """Keeps recently read leaderboard pages in memory.
+
+    Pages of a channel are dropped by `invalidate` when its scores change:
+    on every upvote flush that counted new votes in it, and when its cycle
+    ends. Writes made by other worker processes can't invalidate this cache,
+    so pages also expire after `ttl` seconds. At most `max_pages` pages are
+    kept, oldest out first, and pages past the end of a leaderboard are not
+    kept at all.
+    """
+
+    def __init__(
+        self,
+        db_service: DatabaseService,
+        page_size: int = 10,
+        ttl: float = 30.0,
+        max_pages: int = 1000,
+    ):
+        self._db_service = db_service
+        self._ttl = ttl
+        self._max_pages = max_pages
+        # (channel, scope, page) -> (when read, entries, whether more follow),
+        # in the order the pages were read.
+        self._pages: OrderedDict[
+            tuple[int, DatabaseService.LeaderboardScope, int],
+            tuple[float, list[DatabaseService.LeaderboardEntry], bool],
+        ] = OrderedDict()
+
+        self.page_size = page_size
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    async def get_page(
+        self,
+        tntl_channel_id: int,
+        scope: DatabaseService.LeaderboardScope,
+        page: int,
+    ) -> tuple[list[DatabaseService.LeaderboardEntry], bool]:
+        """Return the entries on a 1-based page and whether more follow."""
+        key = (tntl_channel_id, scope, page)
+        cached = self._pages.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self._ttl:
+            self.hits += 1
+            return cached[1], cached[2]
+
+        self.misses += 1
+        # One extra row tells whether there is a next page.
+        entries = await self._db_service.get_leaderboard(
+            tntl_channel_id,
+            scope,
+            limit=self.page_size + 1,
+            offset=(page - 1) * self.page_size,
+        )
+        has_next = len(entries) > self.page_size
+        entries = entries[: self.page_size]
+
+        if entries or page == 1:
+            self._store(key, entries, has_next)
+        return entries, has_next
+
+    def invalidate(self, tntl_channel_ids: set[int]):
+        for key in [key for key in self._pages if key[0] in tntl_channel_ids]:
+            del self._pages[key]
+
+    def _store(
+        self,
+        key: tuple[int, DatabaseService.LeaderboardScope, int],
+        entries: list[DatabaseService.LeaderboardEntry],
+        has_next: bool,
+    ):
+        now = time.monotonic()
+        self._pages.pop(key, None)
+        self._pages[key] = (now, entries, has_next)
+
+        # Pages are in the order they were read, so the expired ones and
+        # the oldest are at the front.
+        while self._pages:
+            read_at, _, _ = next(iter(self._pages.values()))
+            if now - read_at < self._ttl and len(self._pages) <= self._max_pages:
+                break
+            self._pages.popitem(last=False)
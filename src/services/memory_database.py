@@ -0,0 +1,360 @@
+import itertools
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+
+from metrics import DB_QUERY_DURATION, DB_QUERY_ERRORS, instrument_methods
+from services.database import DatabaseService, shuffle_key
+
+
+@dataclass
+class _Channel:
+    id: int
+    discord_channel_id: int
+    max_submissions: int
+    cycle_number: int = 1
+
+
+@dataclass
+class _Submission:
+    id: int
+    tntl_channel_id: int
+    cycle_number: int
+    submitter_id: int
+    message_text: str
+    canonical_hash: int
+    upvote_count: int = 0
+    voters: set[int] = field(default_factory=set)
+
+
+@dataclass
+class _WatchParty:
+    seed: int
+    total_submissions: int
+    # Submission ids in the order they are posted.
+    order: list[int] = field(default_factory=list)
+    posted_submissions: int = 0
+    completed: bool = False
+
+
+@instrument_methods(DB_QUERY_DURATION, DB_QUERY_ERRORS)
+class MemoryDatabaseService(DatabaseService):
+    """Plain dictionaries in this process; everything is lost on exit.
+
+    Meant for tests, benchmarks and trying the bot out without a database
+    server. None of the methods await, so each call is atomic with respect
+    to the others, as a transaction would be.
+    """
+
+    def __init__(self):
+        self._channel_sequence = itertools.count(1)
+        self._submission_sequence = itertools.count(1)
+        self._channels: dict[int, _Channel] = {}
+        self._channel_ids: dict[int, int] = {}
+        self._submissions: dict[int, _Submission] = {}
+        # (channel, cycle, canonical hash) -> submission.
+        self._canonical_hashes: dict[tuple[int, int, int], int] = {}
+        self._quotas: dict[tuple[int, int], int] = {}
+        self._voters: dict[int, dict[int, int]] = {}
+        self._cycle_scores: dict[tuple[int, int], dict[int, int]] = {}
+        self._all_time_scores: dict[
+            int, dict[int, DatabaseService.LeaderboardEntry]
+        ] = {}
+        self._teardowns: dict[int, int] = {}
+        self._archive: dict[int, _Submission] = {}
+        self._watch_parties: dict[int, _WatchParty] = {}
+        self._message_ids: dict[int, int] = {}
+
+    async def migrate(self):
+        pass
+
+    async def define_tntl_channel(
+        self, discord_channel_id: int, max_submissions: int
+    ) -> int:
+        print(
+            f"Defining Try Not To Laugh channel with ID {discord_channel_id} and {max_submissions} submissions."
+        )
+        if discord_channel_id in self._channel_ids:
+            raise ValueError(f"Channel {discord_channel_id} is already a TNTL channel.")
+
+        channel = _Channel(
+            next(self._channel_sequence), discord_channel_id, max_submissions
+        )
+        self._channels[channel.id] = channel
+        self._channel_ids[discord_channel_id] = channel.id
+        return channel.id
+
+    async def get_tntl_channels(self) -> dict[int, int]:
+        return dict(self._channel_ids)
+
+    async def get_tntl_channel_id(self, discord_channel_id: int) -> int | None:
+        return self._channel_ids.get(discord_channel_id)
+
+    async def submit_if_under_quota(
+        self,
+        message_text: str,
+        discord_channel_id: int,
+        submitter_id: int,
+        canonical_url: str,
+        canonical_hash: int,
+    ) -> DatabaseService.SubmissionResult:
+        tntl_channel_id = self._channel_ids.get(discord_channel_id)
+        if tntl_channel_id is None:
+            return self.SubmissionResult(self.SubmissionStatus.NOT_TNTL_CHANNEL)
+        channel = self._channels[tntl_channel_id]
+
+        hash_key = (channel.id, channel.cycle_number, canonical_hash)
+        if hash_key in self._canonical_hashes:
+            return self.SubmissionResult(self.SubmissionStatus.DUPLICATE)
+
+        quota_key = (channel.id, submitter_id)
+        if self._quotas.get(quota_key, 0) >= channel.max_submissions:
+            return self.SubmissionResult(self.SubmissionStatus.LIMIT_EXCEEDED)
+        self._quotas[quota_key] = self._quotas.get(quota_key, 0) + 1
+
+        submission = _Submission(
+            next(self._submission_sequence),
+            channel.id,
+            channel.cycle_number,
+            submitter_id,
+            message_text,
+            canonical_hash,
+        )
+        self._submissions[submission.id] = submission
+        self._canonical_hashes[hash_key] = submission.id
+        return self.SubmissionResult(self.SubmissionStatus.SUBMITTED, submission.id)
+
+    def _current_submission(self, tntl_submission_id: int) -> _Submission | None:
+        submission = self._submissions.get(tntl_submission_id)
+        if submission is None:
+            return None
+        channel = self._channels[submission.tntl_channel_id]
+        return submission if submission.cycle_number == channel.cycle_number else None
+
+    async def upvote_tntl_submissions(
+        self, votes: list[tuple[int, int]]
+    ) -> dict[int, int]:
+        counts: dict[int, int] = {}
+        for tntl_submission_id, user_id in votes:
+            submission = self._current_submission(tntl_submission_id)
+            if submission is None or user_id in submission.voters:
+                continue
+
+            submission.voters.add(user_id)
+            submission.upvote_count += 1
+            channel_id = submission.tntl_channel_id
+
+            voters = self._voters.setdefault(channel_id, {})
+            voters[user_id] = voters.get(user_id, 0) + 1
+            cycle_scores = self._cycle_scores.setdefault(
+                (channel_id, submission.cycle_number), {}
+            )
+            cycle_scores[submission.submitter_id] = (
+                cycle_scores.get(submission.submitter_id, 0) + 1
+            )
+            self._all_time_score(channel_id, submission.submitter_id).upvote_count += 1
+
+            counts[channel_id] = counts.get(channel_id, 0) + 1
+        return counts
+
+    def _all_time_score(
+        self, tntl_channel_id: int, submitter_id: int
+    ) -> DatabaseService.LeaderboardEntry:
+        scores = self._all_time_scores.setdefault(tntl_channel_id, {})
+        if submitter_id not in scores:
+            scores[submitter_id] = self.LeaderboardEntry(submitter_id, 0, 0, 0)
+        return scores[submitter_id]
+
+    def _cycle_submissions(self, tntl_channel_id: int) -> list[_Submission]:
+        cycle_number = self._channels[tntl_channel_id].cycle_number
+        return [
+            submission
+            for submission in self._submissions.values()
+            if submission.tntl_channel_id == tntl_channel_id
+            and submission.cycle_number == cycle_number
+        ]
+
+    async def get_top_upvoted_messages(
+        self, tntl_channel_id: int, limit: int = 10
+    ) -> list[DatabaseService.TopUpvotedMessage]:
+        submissions = sorted(
+            self._cycle_submissions(tntl_channel_id),
+            key=lambda submission: -submission.upvote_count,
+        )
+        return [
+            self.TopUpvotedMessage(
+                submission.message_text,
+                submission.upvote_count,
+                submission.submitter_id,
+            )
+            for submission in submissions[:limit]
+        ]
+
+    async def get_top_upvoted_user_ids(
+        self, tntl_channel_id: int, limit: int = 10
+    ) -> list[int]:
+        voters = self._voters.get(tntl_channel_id, {})
+        return sorted(voters, key=lambda user_id: -voters[user_id])[:limit]
+
+    async def end_tntl_cycle(self, tntl_channel_id: int) -> int:
+        channel = self._channels[tntl_channel_id]
+        ended_cycle_number = channel.cycle_number
+        channel.cycle_number += 1
+        self._teardowns[tntl_channel_id] = ended_cycle_number
+
+        for (quota_channel_id, submitter_id), submission_count in list(
+            self._quotas.items()
+        ):
+            if quota_channel_id != tntl_channel_id:
+                continue
+            score = self._all_time_score(tntl_channel_id, submitter_id)
+            score.submission_count += submission_count
+            score.cycle_count += 1
+            del self._quotas[quota_channel_id, submitter_id]
+
+        self._voters.pop(tntl_channel_id, None)
+        self._watch_parties.pop(tntl_channel_id, None)
+        return ended_cycle_number
+
+    async def get_pending_cycle_teardowns(self) -> dict[int, int]:
+        return dict(self._teardowns)
+
+    async def archive_ended_cycle_batch(
+        self, tntl_channel_id: int, cycle_number: int, batch_size: int
+    ) -> int:
+        batch = sorted(
+            submission.id
+            for submission in self._submissions.values()
+            if submission.tntl_channel_id == tntl_channel_id
+            and submission.cycle_number <= cycle_number
+        )[:batch_size]
+
+        for tntl_submission_id in batch:
+            submission = self._submissions.pop(tntl_submission_id)
+            self._canonical_hashes.pop(
+                (
+                    submission.tntl_channel_id,
+                    submission.cycle_number,
+                    submission.canonical_hash,
+                ),
+                None,
+            )
+            self._message_ids.pop(tntl_submission_id, None)
+            submission.voters = set()
+            self._archive[tntl_submission_id] = submission
+
+        return len(batch)
+
+    async def complete_cycle_teardown(self, tntl_channel_id: int, cycle_number: int):
+        if self._teardowns.get(tntl_channel_id) == cycle_number:
+            del self._teardowns[tntl_channel_id]
+
+    async def get_leaderboard(
+        self,
+        tntl_channel_id: int,
+        scope: DatabaseService.LeaderboardScope,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> list[DatabaseService.LeaderboardEntry]:
+        if scope == self.LeaderboardScope.CYCLE:
+            cycle_number = self._channels[tntl_channel_id].cycle_number
+            scores = self._cycle_scores.get((tntl_channel_id, cycle_number), {})
+            entries = [
+                self.LeaderboardEntry(submitter_id, upvote_count)
+                for submitter_id, upvote_count in scores.items()
+            ]
+        else:
+            entries = [
+                self.LeaderboardEntry(
+                    entry.submitter_id,
+                    entry.upvote_count,
+                    entry.submission_count,
+                    entry.cycle_count,
+                )
+                for entry in self._all_time_scores.get(tntl_channel_id, {}).values()
+            ]
+
+        entries.sort(key=lambda entry: (-entry.upvote_count, entry.submitter_id))
+        return entries[offset : offset + limit]
+
+    async def stream_watch_party_submissions(
+        self, tntl_channel_id: int, batch_size: int = 100
+    ) -> AsyncIterator[list[DatabaseService.WatchPartySubmission]]:
+        party = self._watch_parties.get(tntl_channel_id)
+        if party is None:
+            return
+        order = [
+            tntl_submission_id
+            for tntl_submission_id in party.order
+            if tntl_submission_id not in self._message_ids
+        ]
+
+        for start in range(0, len(order), batch_size):
+            batch = [
+                self.WatchPartySubmission(
+                    submission.id,
+                    submission.message_text,
+                    submission.submitter_id,
+                    submission.upvote_count,
+                )
+                for tntl_submission_id in order[start : start + batch_size]
+                if (submission := self._submissions.get(tntl_submission_id))
+            ]
+            if batch:
+                yield batch
+
+    async def get_unfinished_watch_party(
+        self, tntl_channel_id: int
+    ) -> DatabaseService.WatchParty | None:
+        party = self._watch_parties.get(tntl_channel_id)
+        if party is None or party.completed:
+            return None
+        return self.WatchParty(
+            party.seed, party.total_submissions, party.posted_submissions
+        )
+
+    async def begin_watch_party(self, tntl_channel_id: int, seed: int) -> int:
+        for submission in self._submissions.values():
+            if submission.tntl_channel_id == tntl_channel_id:
+                self._message_ids.pop(submission.id, None)
+
+        order = sorted(
+            (submission.id for submission in self._cycle_submissions(tntl_channel_id)),
+            key=lambda tntl_submission_id: (
+                shuffle_key(tntl_submission_id, seed),
+                tntl_submission_id,
+            ),
+        )
+        self._watch_parties[tntl_channel_id] = _WatchParty(seed, len(order), order)
+        return len(order)
+
+    async def record_watch_party_progress(
+        self, tntl_channel_id: int, links: list[tuple[int, int]]
+    ):
+        for tntl_submission_id, discord_message_id in links:
+            if tntl_submission_id in self._submissions:
+                self._message_ids[tntl_submission_id] = discord_message_id
+
+        party = self._watch_parties.get(tntl_channel_id)
+        if party is not None:
+            party.posted_submissions += len(links)
+
+    async def complete_watch_party(self, tntl_channel_id: int):
+        party = self._watch_parties.get(tntl_channel_id)
+        if party is not None:
+            party.completed = True
+            party.order = []
+
+    async def get_upvote_counts(self, tntl_submission_ids: list[int]) -> dict[int, int]:
+        counts = {}
+        for tntl_submission_id in tntl_submission_ids:
+            submission = self._current_submission(tntl_submission_id)
+            if submission is not None:
+                counts[tntl_submission_id] = submission.upvote_count
+        return counts
+
+    async def get_discord_message_id_by_tntl_submission_id(
+        self, tntl_submission_id: int
+    ) -> int | None:
+        if self._current_submission(tntl_submission_id) is None:
+            return None
+        return self._message_ids.get(tntl_submission_id)
@@ -0,0 +1,9 @@
+-- Tables created by the original migrate(); IF NOT EXISTS keeps this safe on
+-- databases that predate schema_migrations.
+CREATE TABLE IF NOT EXISTS tntl_channel (id BIGSERIAL PRIMARY KEY, discord_channel_id BIGINT NOT NULL UNIQUE, max_submissions INTEGER NOT NULL);
+
+CREATE TABLE IF NOT EXISTS tntl_submission (id BIGSERIAL PRIMARY KEY, message_text TEXT NOT NULL, tntl_channel_id BIGINT NOT NULL REFERENCES tntl_channel(id) ON DELETE CASCADE, submitter_id BIGINT NOT NULL, created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP);
+
+CREATE TABLE IF NOT EXISTS tntl_submission_message (id BIGSERIAL PRIMARY KEY, tntl_submission_id BIGINT NOT NULL REFERENCES tntl_submission(id) ON DELETE CASCADE, discord_message_id BIGINT NOT NULL, UNIQUE(tntl_submission_id));
+
+CREATE TABLE IF NOT EXISTS tntl_submission_upvote (id BIGSERIAL PRIMARY KEY, tntl_submission_id BIGINT NOT NULL REFERENCES tntl_submission(id) ON DELETE CASCADE, user_id BIGINT NOT NULL, UNIQUE(tntl_submission_id, user_id));
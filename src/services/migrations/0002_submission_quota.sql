@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS tntl_submission_quota (tntl_channel_id BIGINT NOT NULL REFERENCES tntl_channel(id) ON DELETE CASCADE, submitter_id BIGINT NOT NULL, submission_count INTEGER NOT NULL, PRIMARY KEY (tntl_channel_id, submitter_id));
+
+INSERT INTO tntl_submission_quota (tntl_channel_id, submitter_id, submission_count)
+SELECT tntl_channel_id, submitter_id, COUNT(*) FROM tntl_submission GROUP BY tntl_channel_id, submitter_id
+ON CONFLICT (tntl_channel_id, submitter_id) DO UPDATE SET submission_count = EXCLUDED.submission_count;
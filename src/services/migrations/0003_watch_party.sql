@@ -0,0 +1 @@
+CREATE TABLE IF NOT EXISTS tntl_watch_party (tntl_channel_id BIGINT PRIMARY KEY REFERENCES tntl_channel(id) ON DELETE CASCADE, seed BIGINT NOT NULL, total_submissions INTEGER NOT NULL, posted_submissions INTEGER NOT NULL DEFAULT 0, started_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP, completed_at TIMESTAMP);
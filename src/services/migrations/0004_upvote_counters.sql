@@ -0,0 +1,45 @@
+-- Upvote totals kept per submission and per (channel, voter) by a trigger, so
+-- leaderboards read them instead of aggregating every vote.
+ALTER TABLE tntl_submission ADD COLUMN IF NOT EXISTS upvote_count INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS tntl_channel_voter (tntl_channel_id BIGINT NOT NULL REFERENCES tntl_channel(id) ON DELETE CASCADE, user_id BIGINT NOT NULL, upvote_count INTEGER NOT NULL, PRIMARY KEY (tntl_channel_id, user_id));
+
+CREATE OR REPLACE FUNCTION tntl_count_upvote() RETURNS trigger AS $$
+DECLARE
+    channel_id BIGINT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE tntl_submission SET upvote_count = upvote_count + 1
+        WHERE id = NEW.tntl_submission_id
+        RETURNING tntl_channel_id INTO channel_id;
+
+        INSERT INTO tntl_channel_voter (tntl_channel_id, user_id, upvote_count)
+        VALUES (channel_id, NEW.user_id, 1)
+        ON CONFLICT (tntl_channel_id, user_id) DO UPDATE
+        SET upvote_count = tntl_channel_voter.upvote_count + 1;
+
+        RETURN NEW;
+    END IF;
+
+    -- Nothing to update when the vote goes away with its submission.
+    UPDATE tntl_submission SET upvote_count = upvote_count - 1
+    WHERE id = OLD.tntl_submission_id
+    RETURNING tntl_channel_id INTO channel_id;
+
+    IF FOUND THEN
+        UPDATE tntl_channel_voter SET upvote_count = upvote_count - 1
+        WHERE tntl_channel_id = channel_id AND user_id = OLD.user_id;
+    END IF;
+
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER tntl_submission_upvote_count AFTER INSERT OR DELETE ON tntl_submission_upvote FOR EACH ROW EXECUTE FUNCTION tntl_count_upvote();
+
+-- Recompute rather than trust counters written before this migration ran.
+UPDATE tntl_submission s SET upvote_count = (SELECT COUNT(*) FROM tntl_submission_upvote u WHERE u.tntl_submission_id = s.id);
+
+INSERT INTO tntl_channel_voter (tntl_channel_id, user_id, upvote_count)
+SELECT s.tntl_channel_id, u.user_id, COUNT(*) FROM tntl_submission_upvote u JOIN tntl_submission s ON s.id = u.tntl_submission_id GROUP BY s.tntl_channel_id, u.user_id
+ON CONFLICT (tntl_channel_id, user_id) DO UPDATE SET upvote_count = EXCLUDED.upvote_count;
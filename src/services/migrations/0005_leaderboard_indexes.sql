@@ -0,0 +1,14 @@
+-- migrate: no-transaction
+-- Built concurrently so the hot tables stay writable. A failed concurrent
+-- build leaves an invalid index behind, hence the drop before each create.
+DROP INDEX CONCURRENTLY IF EXISTS tntl_submission_top_upvoted_idx;
+CREATE INDEX CONCURRENTLY tntl_submission_top_upvoted_idx ON tntl_submission (tntl_channel_id, upvote_count DESC) INCLUDE (submitter_id);
+
+DROP INDEX CONCURRENTLY IF EXISTS tntl_submission_submitter_idx;
+CREATE INDEX CONCURRENTLY tntl_submission_submitter_idx ON tntl_submission (tntl_channel_id, submitter_id);
+
+DROP INDEX CONCURRENTLY IF EXISTS tntl_submission_upvote_user_idx;
+CREATE INDEX CONCURRENTLY tntl_submission_upvote_user_idx ON tntl_submission_upvote (user_id);
+
+DROP INDEX CONCURRENTLY IF EXISTS tntl_channel_voter_top_idx;
+CREATE INDEX CONCURRENTLY tntl_channel_voter_top_idx ON tntl_channel_voter (tntl_channel_id, upvote_count DESC) INCLUDE (user_id);
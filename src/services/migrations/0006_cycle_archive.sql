@@ -0,0 +1,13 @@
+-- Submissions belong to the channel cycle they were made in. Ending a cycle
+-- bumps the channel's cycle_number at once and moves the previous cycles'
+-- submissions to tntl_submission_archive in small batches afterwards.
+ALTER TABLE tntl_channel ADD COLUMN IF NOT EXISTS cycle_number INTEGER NOT NULL DEFAULT 1;
+
+ALTER TABLE tntl_submission ADD COLUMN IF NOT EXISTS cycle_number INTEGER NOT NULL DEFAULT 1;
+
+CREATE TABLE IF NOT EXISTS tntl_submission_archive (id BIGINT PRIMARY KEY, tntl_channel_id BIGINT NOT NULL REFERENCES tntl_channel(id) ON DELETE CASCADE, cycle_number INTEGER NOT NULL, submitter_id BIGINT NOT NULL, message_text TEXT NOT NULL, upvote_count INTEGER NOT NULL, created_at TIMESTAMP NOT NULL, archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP);
+
+CREATE INDEX IF NOT EXISTS tntl_submission_archive_cycle_idx ON tntl_submission_archive (tntl_channel_id, cycle_number, upvote_count DESC);
+
+-- One row per channel whose ended cycles still have submissions to move.
+CREATE TABLE IF NOT EXISTS tntl_cycle_teardown (tntl_channel_id BIGINT PRIMARY KEY REFERENCES tntl_channel(id) ON DELETE CASCADE, cycle_number INTEGER NOT NULL, archived_submissions INTEGER NOT NULL DEFAULT 0, started_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP);
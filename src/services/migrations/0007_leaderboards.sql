@@ -0,0 +1,78 @@
+-- Upvotes received per submitter, for the current cycle and all time. The
+-- upvote trigger keeps both current; submission and cycle counts are folded
+-- into the all-time row when a cycle ends.
+CREATE TABLE IF NOT EXISTS tntl_cycle_score (tntl_channel_id BIGINT NOT NULL REFERENCES tntl_channel(id) ON DELETE CASCADE, cycle_number INTEGER NOT NULL, submitter_id BIGINT NOT NULL, upvote_count INTEGER NOT NULL, PRIMARY KEY (tntl_channel_id, cycle_number, submitter_id));
+
+CREATE INDEX IF NOT EXISTS tntl_cycle_score_top_idx ON tntl_cycle_score (tntl_channel_id, cycle_number, upvote_count DESC, submitter_id);
+
+CREATE TABLE IF NOT EXISTS tntl_all_time_score (tntl_channel_id BIGINT NOT NULL REFERENCES tntl_channel(id) ON DELETE CASCADE, submitter_id BIGINT NOT NULL, upvote_count INTEGER NOT NULL DEFAULT 0, submission_count INTEGER NOT NULL DEFAULT 0, cycle_count INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (tntl_channel_id, submitter_id));
+
+CREATE INDEX IF NOT EXISTS tntl_all_time_score_top_idx ON tntl_all_time_score (tntl_channel_id, upvote_count DESC, submitter_id);
+
+CREATE OR REPLACE FUNCTION tntl_count_upvote() RETURNS trigger AS $$
+DECLARE
+    channel_id BIGINT;
+    submission_submitter_id BIGINT;
+    submission_cycle_number INTEGER;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE tntl_submission SET upvote_count = upvote_count + 1
+        WHERE id = NEW.tntl_submission_id
+        RETURNING tntl_channel_id, submitter_id, cycle_number
+        INTO channel_id, submission_submitter_id, submission_cycle_number;
+
+        INSERT INTO tntl_channel_voter (tntl_channel_id, user_id, upvote_count)
+        VALUES (channel_id, NEW.user_id, 1)
+        ON CONFLICT (tntl_channel_id, user_id) DO UPDATE
+        SET upvote_count = tntl_channel_voter.upvote_count + 1;
+
+        INSERT INTO tntl_cycle_score (tntl_channel_id, cycle_number, submitter_id, upvote_count)
+        VALUES (channel_id, submission_cycle_number, submission_submitter_id, 1)
+        ON CONFLICT (tntl_channel_id, cycle_number, submitter_id) DO UPDATE
+        SET upvote_count = tntl_cycle_score.upvote_count + 1;
+
+        INSERT INTO tntl_all_time_score (tntl_channel_id, submitter_id, upvote_count)
+        VALUES (channel_id, submission_submitter_id, 1)
+        ON CONFLICT (tntl_channel_id, submitter_id) DO UPDATE
+        SET upvote_count = tntl_all_time_score.upvote_count + 1;
+
+        RETURN NEW;
+    END IF;
+
+    -- Nothing to update when the vote goes away with its submission, which
+    -- is also how archived submissions keep their scores.
+    UPDATE tntl_submission SET upvote_count = upvote_count - 1
+    WHERE id = OLD.tntl_submission_id
+    RETURNING tntl_channel_id, submitter_id, cycle_number
+    INTO channel_id, submission_submitter_id, submission_cycle_number;
+
+    IF FOUND THEN
+        UPDATE tntl_channel_voter SET upvote_count = upvote_count - 1
+        WHERE tntl_channel_id = channel_id AND user_id = OLD.user_id;
+
+        UPDATE tntl_cycle_score SET upvote_count = upvote_count - 1
+        WHERE tntl_channel_id = channel_id AND cycle_number = submission_cycle_number AND submitter_id = submission_submitter_id;
+
+        UPDATE tntl_all_time_score SET upvote_count = upvote_count - 1
+        WHERE tntl_channel_id = channel_id AND submitter_id = submission_submitter_id;
+    END IF;
+
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill from live and archived submissions. Submission and cycle counts
+-- only cover cycles that have already ended.
+INSERT INTO tntl_cycle_score (tntl_channel_id, cycle_number, submitter_id, upvote_count)
+SELECT tntl_channel_id, cycle_number, submitter_id, SUM(upvote_count) FROM tntl_submission WHERE upvote_count > 0 GROUP BY tntl_channel_id, cycle_number, submitter_id
+ON CONFLICT (tntl_channel_id, cycle_number, submitter_id) DO UPDATE SET upvote_count = EXCLUDED.upvote_count;
+
+INSERT INTO tntl_all_time_score (tntl_channel_id, submitter_id, upvote_count, submission_count, cycle_count)
+SELECT tntl_channel_id, submitter_id, SUM(upvote_count), SUM(archived), COUNT(DISTINCT cycle_number) FILTER (WHERE archived = 1)
+FROM (
+    SELECT tntl_channel_id, submitter_id, upvote_count, cycle_number, 0 AS archived FROM tntl_submission
+    UNION ALL
+    SELECT tntl_channel_id, submitter_id, upvote_count, cycle_number, 1 AS archived FROM tntl_submission_archive
+) scores
+GROUP BY tntl_channel_id, submitter_id
+ON CONFLICT (tntl_channel_id, submitter_id) DO UPDATE SET upvote_count = EXCLUDED.upvote_count, submission_count = EXCLUDED.submission_count, cycle_count = EXCLUDED.cycle_count;
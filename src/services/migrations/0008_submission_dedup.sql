@@ -0,0 +1,10 @@
+-- migrate: no-transaction
+-- Canonical form of each submitted link and a 64-bit hash of it, unique per
+-- channel cycle. Rows submitted before this migration keep NULLs, which the
+-- unique index ignores.
+ALTER TABLE tntl_submission ADD COLUMN IF NOT EXISTS canonical_url TEXT;
+
+ALTER TABLE tntl_submission ADD COLUMN IF NOT EXISTS canonical_hash BIGINT;
+
+DROP INDEX CONCURRENTLY IF EXISTS tntl_submission_canonical_hash_idx;
+CREATE UNIQUE INDEX CONCURRENTLY tntl_submission_canonical_hash_idx ON tntl_submission (tntl_channel_id, cycle_number, canonical_hash);
@@ -0,0 +1,17 @@
+-- The shuffled order of a running watch party, computed once when it begins,
+-- so posting pages through it by position instead of re-sorting the
+-- channel's submissions for every batch. Rows go away with the party's
+-- submissions and once the party completes.
+CREATE TABLE IF NOT EXISTS tntl_watch_party_order (tntl_channel_id BIGINT NOT NULL REFERENCES tntl_watch_party(tntl_channel_id) ON DELETE CASCADE, position INTEGER NOT NULL, tntl_submission_id BIGINT NOT NULL REFERENCES tntl_submission(id) ON DELETE CASCADE, PRIMARY KEY (tntl_channel_id, position));
+
+CREATE INDEX IF NOT EXISTS tntl_watch_party_order_submission_idx ON tntl_watch_party_order (tntl_submission_id);
+
+-- Parties left unfinished by an older version resume in the order they
+-- were started with.
+INSERT INTO tntl_watch_party_order (tntl_channel_id, position, tntl_submission_id)
+SELECT p.tntl_channel_id, row_number() OVER (PARTITION BY p.tntl_channel_id ORDER BY md5(s.id::text || ':' || p.seed::text), s.id), s.id
+FROM tntl_watch_party p
+JOIN tntl_channel c ON c.id = p.tntl_channel_id
+JOIN tntl_submission s ON s.tntl_channel_id = c.id AND s.cycle_number = c.cycle_number
+WHERE p.completed_at IS NULL
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,131 @@
+import asyncio
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import psycopg
+
+from config import logger
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_(\w+)\.sql$")
+NO_TRANSACTION_DIRECTIVE = "-- migrate: no-transaction"
+
+# Arbitrary key for pg_try_advisory_lock, shared by every replica.
+MIGRATION_LOCK_ID = 7_345_812_001
+# Seconds between two attempts at taking the migration lock.
+MIGRATION_LOCK_POLL_INTERVAL = 0.5
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.startswith(NO_TRANSACTION_DIRECTIVE)
+
+    def statements(self) -> list[str]:
+        # Statements such as CREATE INDEX CONCURRENTLY can't share a query
+        # string with others, so non-transactional migrations are run one
+        # statement at a time. They must not contain function bodies.
+        statements = []
+        for chunk in self.sql.split(";"):
+            lines = [
+                line for line in chunk.splitlines() if not line.strip().startswith("--")
+            ]
+            statement = "\n".join(lines).strip()
+            if statement:
+                statements.append(statement)
+        return statements
+
+
+def load_migrations() -> list[Migration]:
+    migrations = []
+    for path in MIGRATIONS_DIR.iterdir():
+        match = MIGRATION_FILE_PATTERN.match(path.name)
+        if not match:
+            continue
+        version, name = match.groups()
+        migrations.append(Migration(int(version), name, path.read_text()))
+
+    migrations.sort(key=lambda migration: migration.version)
+
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Duplicate migration versions.")
+
+    return migrations
+
+
+async def run_migrations(conn_string: str):
+    """Apply every migration not yet recorded in schema_migrations.
+
+    Runs on a dedicated autocommit connection holding an advisory lock, so
+    replicas starting together apply each migration exactly once. Replicas
+    waiting for the lock poll for it from the client instead of blocking in
+    pg_advisory_lock: a session waiting inside a statement would hold up the
+    CREATE INDEX CONCURRENTLY of the replica that holds the lock, which in
+    turn waits for every older transaction to finish. Once the lock is
+    taken, schema_migrations is read again, so a replica that waited skips
+    what the previous holder applied.
+    """
+    migrations = load_migrations()
+
+    async with await psycopg.AsyncConnection.connect(
+        conn_string, autocommit=True
+    ) as conn:
+        if {migration.version for migration in migrations} <= await _applied(conn):
+            return
+
+        while not await _try_lock(conn):
+            await asyncio.sleep(MIGRATION_LOCK_POLL_INTERVAL)
+        try:
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+            )
+            applied = await _applied(conn)
+
+            for migration in migrations:
+                if migration.version in applied:
+                    continue
+
+                logger.info(
+                    f"Applying migration {migration.version:04d}_{migration.name}"
+                )
+                if migration.transactional:
+                    async with conn.transaction():
+                        await conn.execute(migration.sql)
+                        await _record(conn, migration)
+                else:
+                    for statement in migration.statements():
+                        await conn.execute(statement)
+                    await _record(conn, migration)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+
+
+async def _try_lock(conn: psycopg.AsyncConnection) -> bool:
+    cursor = await conn.execute(
+        "SELECT pg_try_advisory_lock(%s)", (MIGRATION_LOCK_ID,)
+    )
+    (locked,) = await cursor.fetchone()  # type: ignore
+    return locked
+
+
+async def _applied(conn: psycopg.AsyncConnection) -> set[int]:
+    cursor = await conn.execute("SELECT to_regclass('schema_migrations')")
+    (table,) = await cursor.fetchone()  # type: ignore
+    if table is None:
+        return set()
+    cursor = await conn.execute("SELECT version FROM schema_migrations")
+    return {version for (version,) in await cursor.fetchall()}
+
+
+async def _record(conn: psycopg.AsyncConnection, migration: Migration):
+    await conn.execute(
+        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+        (migration.version, migration.name),
+    )
@@ -0,0 +1,482 @@
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+import psycopg
+from psycopg_pool import AsyncConnectionPool
+
+from config import logger
+from metrics import (
+    DB_QUERY_DURATION,
+    DB_QUERY_ERRORS,
+    DB_STATEMENT_DURATION,
+    DB_STATEMENT_ROWS,
+    instrument_methods,
+)
+from services import postgres_queries as queries
+from services.database import DatabaseService
+from services.migrator import run_migrations
+
+TNTL_CHANNEL_DEFINED_CHANNEL = "tntl_channel_defined"
+
+
+@instrument_methods(DB_QUERY_DURATION, DB_QUERY_ERRORS)
+class PostgresDatabaseService(DatabaseService):
+    """Postgres through a connection pool, shared by every replica.
+
+    Statements come from `postgres_queries` and are prepared on each pooled
+    connection. Those slower than `slow_query_threshold` seconds are logged
+    (0 turns that off). With `trace`, every statement's time and row count
+    are recorded by name, and slow ones are logged with their plan.
+    """
+
+    shared_between_processes = True
+
+    def __init__(
+        self,
+        conn_string: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        max_lifetime: float = 3600.0,
+        timeout: float = 10.0,
+        prepare: bool = True,
+        slow_query_threshold: float = 0.0,
+        trace: bool = False,
+    ):
+        self._connection_string = conn_string
+        # None leaves it to psycopg, which prepares after a few executions.
+        self._prepare = True if prepare else None
+        self._slow_query_threshold = slow_query_threshold
+        self._trace = trace
+        self._pool = AsyncConnectionPool(
+            conn_string,
+            min_size=min_size,
+            max_size=max_size,
+            max_lifetime=max_lifetime,
+            timeout=timeout,
+            open=False,
+        )
+
+    async def open(self):
+        await self._pool.open(wait=True)
+
+    async def close(self):
+        await self._pool.close()
+
+    def get_connection(self):
+        return self._pool.connection()
+
+    def get_pool_stats(self) -> dict[str, int]:
+        return self._pool.get_stats()
+
+    async def _execute(
+        self,
+        conn: psycopg.AsyncConnection,
+        query: queries.Query,
+        params=None,
+    ) -> psycopg.AsyncCursor:
+        started_at = time.perf_counter()
+        cursor = await conn.execute(query.sql, params, prepare=self._prepare)
+        elapsed = time.perf_counter() - started_at
+
+        if self._trace:
+            DB_STATEMENT_DURATION.observe(elapsed, statement=query.name)
+            DB_STATEMENT_ROWS.inc(max(cursor.rowcount, 0), statement=query.name)
+
+        if self._slow_query_threshold and elapsed >= self._slow_query_threshold:
+            logger.warning(
+                f"Slow query {query.name}: {elapsed * 1000:.1f} ms, {cursor.rowcount} rows"
+            )
+            if self._trace:
+                await self._log_plan(conn, query, params)
+
+        return cursor
+
+    async def _log_plan(
+        self, conn: psycopg.AsyncConnection, query: queries.Query, params
+    ):
+        # Plain EXPLAIN plans without running the statement again. It runs
+        # in a savepoint so a failure can't abort the caller's transaction.
+        try:
+            async with conn.transaction():
+                cursor = await conn.execute(f"EXPLAIN {query.sql}", params)
+                plan = "\n".join(line for (line,) in await cursor.fetchall())
+        except psycopg.Error:
+            logger.exception(f"Failed to explain query {query.name}")
+            return
+
+        logger.warning(f"Plan of {query.name}:\n{plan}")
+
+    async def migrate(self):
+        print("Migrating database...")
+        await run_migrations(self._connection_string)
+        print("Database migrated.")
+
+    async def define_tntl_channel(
+        self, discord_channel_id: int, max_submissions: int
+    ) -> int:
+        print(
+            f"Defining Try Not To Laugh channel with ID {discord_channel_id} and {max_submissions} submissions."
+        )
+        async with self.get_connection() as conn:
+            cursor = await self._execute(
+                conn,
+                queries.INSERT_TNTL_CHANNEL,
+                (discord_channel_id, max_submissions),
+            )
+            tntl_channel_id = (await cursor.fetchone())[0]
+            await self._execute(
+                conn,
+                queries.NOTIFY,
+                (
+                    TNTL_CHANNEL_DEFINED_CHANNEL,
+                    f"{discord_channel_id}:{tntl_channel_id}",
+                ),
+            )
+            return tntl_channel_id
+
+    async def get_tntl_channels(self) -> dict[int, int]:
+        async with self.get_connection() as conn:
+            cursor = await self._execute(conn, queries.GET_TNTL_CHANNELS)
+            result = await cursor.fetchall()
+            return {
+                discord_channel_id: tntl_channel_id
+                for discord_channel_id, tntl_channel_id in result
+            }
+
+    async def listen_tntl_channel_definitions(
+        self, on_subscribed: Callable[[], Awaitable[None]] | None = None
+    ) -> AsyncIterator[tuple[int, int]]:
+        # LISTEN needs a session of its own, a pooled connection would be
+        # handed back (and reset) as soon as it is released.
+        async with await psycopg.AsyncConnection.connect(
+            self._connection_string, autocommit=True
+        ) as conn:
+            await conn.execute(f"LISTEN {TNTL_CHANNEL_DEFINED_CHANNEL}")
+            # Notifications sent from here on queue up on the connection
+            # until they are read below.
+            if on_subscribed is not None:
+                await on_subscribed()
+            async for notify in conn.notifies():
+                discord_channel_id, tntl_channel_id = notify.payload.split(":")
+                yield int(discord_channel_id), int(tntl_channel_id)
+
+    async def get_tntl_channel_id(self, discord_channel_id: int) -> int | None:
+        async with self.get_connection() as conn:
+            cursor = await self._execute(
+                conn,
+                queries.GET_TNTL_CHANNEL_ID,
+                (discord_channel_id,),
+            )
+            result = await cursor.fetchone()
+            return result[0] if result else None
+
+    async def submit_if_under_quota(
+        self,
+        message_text: str,
+        discord_channel_id: int,
+        submitter_id: int,
+        canonical_url: str,
+        canonical_hash: int,
+    ) -> DatabaseService.SubmissionResult:
+        try:
+            async with self.get_connection() as conn:
+                cursor = await self._execute(
+                    conn,
+                    queries.SUBMIT_IF_UNDER_QUOTA,
+                    {
+                        "discord_channel_id": discord_channel_id,
+                        "submitter_id": submitter_id,
+                        "message_text": message_text,
+                        "canonical_url": canonical_url,
+                        "canonical_hash": canonical_hash,
+                    },
+                )
+                tntl_channel_id, tntl_submission_id, is_duplicate = (
+                    await cursor.fetchone()
+                )
+        except psycopg.errors.UniqueViolation:
+            return self.SubmissionResult(self.SubmissionStatus.DUPLICATE)
+
+        if tntl_channel_id is None:
+            return self.SubmissionResult(self.SubmissionStatus.NOT_TNTL_CHANNEL)
+        if is_duplicate:
+            return self.SubmissionResult(self.SubmissionStatus.DUPLICATE)
+        if tntl_submission_id is None:
+            return self.SubmissionResult(self.SubmissionStatus.LIMIT_EXCEEDED)
+        return self.SubmissionResult(
+            self.SubmissionStatus.SUBMITTED, tntl_submission_id
+        )
+
+    async def upvote_tntl_submissions(
+        self, votes: list[tuple[int, int]]
+    ) -> dict[int, int]:
+        """Record votes and return how many were new, per TNTL channel."""
+        async with self.get_connection() as conn:
+            cursor = await self._execute(
+                conn,
+                queries.UPVOTE_TNTL_SUBMISSIONS,
+                (
+                    [tntl_submission_id for tntl_submission_id, _ in votes],
+                    [user_id for _, user_id in votes],
+                ),
+            )
+            result = await cursor.fetchall()
+            return {tntl_channel_id: count for tntl_channel_id, count in result}
+
+    async def get_top_upvoted_messages(
+        self, tntl_channel_id: int, limit: int = 10
+    ) -> list[DatabaseService.TopUpvotedMessage]:
+        async with self.get_connection() as conn:
+            cursor = await self._execute(
+                conn,
+                queries.GET_TOP_UPVOTED_MESSAGES,
+                (tntl_channel_id, limit),
+            )
+            result = await cursor.fetchall()
+
+            return [
+                self.TopUpvotedMessage(message_text, upvote_count, sender_id)
+                for message_text, upvote_count, sender_id in result
+            ]
+
+    async def get_top_upvoted_user_ids(
+        self, tntl_channel_id: int, limit: int = 10
+    ) -> list[int]:
+        async with self.get_connection() as conn:
+            cursor = await self._execute(
+                conn,
+                queries.GET_TOP_UPVOTED_USER_IDS,
+                (tntl_channel_id, limit),
+            )
+            result = await cursor.fetchall()
+            return [user_id for (user_id,) in result]
+
+    async def end_tntl_cycle(self, tntl_channel_id: int) -> int:
+        """Start a new cycle in the channel and return the one that ended.
+
+        Only per-cycle bookkeeping is reset here. The ended cycle's
+        submissions stay in place, hidden from the new cycle, until
+        `archive_ended_cycle_batch` has moved them all to the archive.
+        """
+        async with self.get_connection() as conn:
+            cursor = await self._execute(
+                conn,
+                queries.ADVANCE_CYCLE,
+                (tntl_channel_id,),
+            )
+            (ended_cycle_number,) = await cursor.fetchone()
+            await self._execute(
+                conn,
+                queries.UPSERT_CYCLE_TEARDOWN,
+                (tntl_channel_id, ended_cycle_number),
+            )
+            await self._execute(
+                conn,
+                queries.FOLD_QUOTAS_INTO_ALL_TIME_SCORES,
+                (tntl_channel_id,),
+            )
+            await self._execute(
+                conn,
+                queries.DELETE_QUOTAS,
+                (tntl_channel_id,),
+            )
+            await self._execute(
+                conn,
+                queries.DELETE_CHANNEL_VOTERS,
+                (tntl_channel_id,),
+            )
+            await self._execute(
+                conn,
+                queries.DELETE_WATCH_PARTY,
+                (tntl_channel_id,),
+            )
+            return ended_cycle_number
+
+    async def get_pending_cycle_teardowns(self) -> dict[int, int]:
+        async with self.get_connection() as conn:
+            cursor = await self._execute(conn, queries.GET_PENDING_CYCLE_TEARDOWNS)
+            result = await cursor.fetchall()
+            return {
+                tntl_channel_id: cycle_number
+                for tntl_channel_id, cycle_number in result
+            }
+
+    async def archive_ended_cycle_batch(
+        self, tntl_channel_id: int, cycle_number: int, batch_size: int
+    ) -> int:
+        """Move up to `batch_size` submissions of ended cycles to the archive.
+
+        Each batch is its own short transaction, and its votes and message
+        links go with it through the cascade. Returns how many were moved.
+        """
+        async with self.get_connection() as conn:
+            cursor = await self._execute(
+                conn,
+                queries.ARCHIVE_ENDED_CYCLE_BATCH,
+                {
+                    "tntl_channel_id": tntl_channel_id,
+                    "cycle_number": cycle_number,
+                    "batch_size": batch_size,
+                },
+            )
+            (moved_count,) = await cursor.fetchone()
+            return moved_count
+
+    async def complete_cycle_teardown(self, tntl_channel_id: int, cycle_number: int):
+        async with self.get_connection() as conn:
+            await self._execute(
+                conn,
+                queries.COMPLETE_CYCLE_TEARDOWN,
+                (tntl_channel_id, cycle_number),
+            )
+
+    async def get_leaderboard(
+        self,
+        tntl_channel_id: int,
+        scope: DatabaseService.LeaderboardScope,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> list[DatabaseService.LeaderboardEntry]:
+        async with self.get_connection() as conn:
+            if scope == self.LeaderboardScope.CYCLE:
+                cursor = await self._execute(
+                    conn,
+                    queries.GET_CYCLE_LEADERBOARD,
+                    {
+                        "tntl_channel_id": tntl_channel_id,
+                        "limit": limit,
+                        "offset": offset,
+                    },
+                )
+                result = await cursor.fetchall()
+                return [
+                    self.LeaderboardEntry(submitter_id, upvote_count)
+                    for submitter_id, upvote_count in result
+                ]
+
+            cursor = await self._execute(
+                conn,
+                queries.GET_ALL_TIME_LEADERBOARD,
+                (tntl_channel_id, limit, offset),
+            )
+            result = await cursor.fetchall()
+            return [self.LeaderboardEntry(*row) for row in result]
+
+    async def stream_watch_party_submissions(
+        self, tntl_channel_id: int, batch_size: int = 100
+    ) -> AsyncIterator[list[DatabaseService.WatchPartySubmission]]:
+        """Yield the channel's unposted submissions in the party's order.
+
+        The order was stored when the party began, so a resumed party posts
+        the rest in the same order. Each batch is one page of it by position,
+        read in its own short transaction, so no pooled connection is held
+        while the batch is being posted.
+        """
+        after_position = 0
+        while True:
+            async with self.get_connection() as conn:
+                cursor = await self._execute(
+                    conn,
+                    queries.GET_WATCH_PARTY_SUBMISSIONS_PAGE,
+                    (tntl_channel_id, after_position, batch_size),
+                )
+                rows = await cursor.fetchall()
+            if not rows:
+                return
+
+            after_position = rows[-1][0]
+            yield [self.WatchPartySubmission(*row[1:]) for row in rows]
+
+    async def get_unfinished_watch_party(
+        self, tntl_channel_id: int
+    ) -> DatabaseService.WatchParty | None:
+        async with self.get_connection() as conn:
+            cursor = await self._execute(
+                conn,
+                queries.GET_UNFINISHED_WATCH_PARTY,
+                (tntl_channel_id,),
+            )
+            result = await cursor.fetchone()
+            return self.WatchParty(*result) if result else None
+
+    async def begin_watch_party(self, tntl_channel_id: int, seed: int) -> int:
+        """Start a party over every submission of the cycle and return its size."""
+        # Links from a previous party are dropped up front so that, if the
+        # bot dies mid-party, every linked submission is one already posted
+        # by this party.
+        async with self.get_connection() as conn:
+            await self._execute(
+                conn,
+                queries.UNLINK_SUBMISSION_MESSAGES,
+                (tntl_channel_id,),
+            )
+            cursor = await self._execute(
+                conn,
+                queries.BEGIN_WATCH_PARTY,
+                {"tntl_channel_id": tntl_channel_id, "seed": seed},
+            )
+            (total_submissions,) = await cursor.fetchone()
+            await self._execute(
+                conn,
+                queries.CLEAR_WATCH_PARTY_ORDER,
+                (tntl_channel_id,),
+            )
+            await self._execute(
+                conn,
+                queries.SHUFFLE_WATCH_PARTY,
+                {"tntl_channel_id": tntl_channel_id, "seed": seed},
+            )
+            return total_submissions
+
+    async def record_watch_party_progress(
+        self, tntl_channel_id: int, links: list[tuple[int, int]]
+    ):
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.executemany(
+                    queries.LINK_SUBMISSION_MESSAGE.sql,
+                    links,
+                )
+            await self._execute(
+                conn,
+                queries.RECORD_WATCH_PARTY_PROGRESS,
+                (len(links), tntl_channel_id),
+            )
+
+    async def complete_watch_party(self, tntl_channel_id: int):
+        async with self.get_connection() as conn:
+            await self._execute(
+                conn,
+                queries.COMPLETE_WATCH_PARTY,
+                (tntl_channel_id,),
+            )
+            await self._execute(
+                conn,
+                queries.CLEAR_WATCH_PARTY_ORDER,
+                (tntl_channel_id,),
+            )
+
+    async def get_upvote_counts(self, tntl_submission_ids: list[int]) -> dict[int, int]:
+        async with self.get_connection() as conn:
+            cursor = await self._execute(
+                conn,
+                queries.GET_UPVOTE_COUNTS,
+                (tntl_submission_ids,),
+            )
+            result = await cursor.fetchall()
+            return {
+                tntl_submission_id: upvote_count
+                for tntl_submission_id, upvote_count in result
+            }
+
+    async def get_discord_message_id_by_tntl_submission_id(
+        self, tntl_submission_id: int
+    ) -> int | None:
+        async with self.get_connection() as conn:
+            cursor = await self._execute(
+                conn,
+                queries.GET_DISCORD_MESSAGE_ID,
+                (tntl_submission_id,),
+            )
+            result = await cursor.fetchone()
+            return result[0] if result else None
@@ -0,0 +1,318 @@
+"""Every statement PostgresDatabaseService sends, each defined once.
+
+A statement is prepared on a pooled connection the first time it runs
+there and reused after that, so Postgres parses and plans it once per
+connection rather than once per call. The name labels its timings, slow
+query logs and traces.
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Query:
+    name: str
+    sql: str
+
+
+INSERT_TNTL_CHANNEL = Query(
+    "insert_tntl_channel",
+    "INSERT INTO tntl_channel (discord_channel_id, max_submissions) VALUES (%s, %s) RETURNING id",
+)
+
+NOTIFY = Query("notify", "SELECT pg_notify(%s, %s)")
+
+GET_TNTL_CHANNELS = Query(
+    "get_tntl_channels", "SELECT discord_channel_id, id FROM tntl_channel"
+)
+
+GET_TNTL_CHANNEL_ID = Query(
+    "get_tntl_channel_id", "SELECT id FROM tntl_channel WHERE discord_channel_id = %s"
+)
+
+# The quota row is bumped with a conditional upsert, which takes a row lock,
+# so concurrent submissions from one user are serialized and the limit can't
+# be overshot. The submission is only inserted when the counter was actually
+# bumped and no submission of this cycle has the same canonical hash. Two
+# identical submissions racing past that check are stopped by the unique
+# index instead.
+SUBMIT_IF_UNDER_QUOTA = Query(
+    "submit_if_under_quota",
+    """
+    WITH channel AS (
+        SELECT id, max_submissions, cycle_number FROM tntl_channel
+        WHERE discord_channel_id = %(discord_channel_id)s
+    ),
+    duplicate AS (
+        SELECT s.id FROM tntl_submission s, channel
+        WHERE s.tntl_channel_id = channel.id
+        AND s.cycle_number = channel.cycle_number
+        AND s.canonical_hash = %(canonical_hash)s
+    ),
+    quota AS (
+        INSERT INTO tntl_submission_quota (tntl_channel_id, submitter_id, submission_count)
+        SELECT id, %(submitter_id)s, 1 FROM channel
+        WHERE max_submissions > 0 AND NOT EXISTS (SELECT 1 FROM duplicate)
+        ON CONFLICT (tntl_channel_id, submitter_id) DO UPDATE
+        SET submission_count = tntl_submission_quota.submission_count + 1
+        WHERE tntl_submission_quota.submission_count < (SELECT max_submissions FROM channel)
+        RETURNING tntl_channel_id
+    ),
+    submission AS (
+        INSERT INTO tntl_submission (message_text, tntl_channel_id, submitter_id, cycle_number, canonical_url, canonical_hash)
+        SELECT %(message_text)s, tntl_channel_id, %(submitter_id)s, (SELECT cycle_number FROM channel), %(canonical_url)s, %(canonical_hash)s
+        FROM quota
+        RETURNING id
+    )
+    SELECT (SELECT id FROM channel), (SELECT id FROM submission), EXISTS (SELECT 1 FROM duplicate)
+    """,
+)
+
+# Votes for submissions removed since the click, or from a cycle that has
+# ended and is waiting to be archived, are dropped by the joins.
+UPVOTE_TNTL_SUBMISSIONS = Query(
+    "upvote_tntl_submissions",
+    """
+    WITH inserted AS (
+        INSERT INTO tntl_submission_upvote (tntl_submission_id, user_id)
+        SELECT v.tntl_submission_id, v.user_id
+        FROM unnest(%s::bigint[], %s::bigint[]) AS v(tntl_submission_id, user_id)
+        JOIN tntl_submission s ON s.id = v.tntl_submission_id
+        JOIN tntl_channel c ON c.id = s.tntl_channel_id AND c.cycle_number = s.cycle_number
+        ON CONFLICT DO NOTHING
+        RETURNING tntl_submission_id
+    )
+    SELECT s.tntl_channel_id, COUNT(*)
+    FROM inserted
+    JOIN tntl_submission s ON s.id = inserted.tntl_submission_id
+    GROUP BY s.tntl_channel_id
+    """,
+)
+
+GET_TOP_UPVOTED_MESSAGES = Query(
+    "get_top_upvoted_messages",
+    """
+    SELECT s.message_text, s.upvote_count, s.submitter_id
+    FROM tntl_submission s
+    JOIN tntl_channel c ON c.id = s.tntl_channel_id AND c.cycle_number = s.cycle_number
+    WHERE s.tntl_channel_id = %s
+    ORDER BY s.upvote_count DESC
+    LIMIT %s
+    """,
+)
+
+GET_TOP_UPVOTED_USER_IDS = Query(
+    "get_top_upvoted_user_ids",
+    "SELECT user_id FROM tntl_channel_voter WHERE tntl_channel_id = %s ORDER BY upvote_count DESC LIMIT %s",
+)
+
+ADVANCE_CYCLE = Query(
+    "advance_cycle",
+    "UPDATE tntl_channel SET cycle_number = cycle_number + 1 WHERE id = %s RETURNING cycle_number - 1",
+)
+
+UPSERT_CYCLE_TEARDOWN = Query(
+    "upsert_cycle_teardown",
+    """
+    INSERT INTO tntl_cycle_teardown (tntl_channel_id, cycle_number)
+    VALUES (%s, %s)
+    ON CONFLICT (tntl_channel_id) DO UPDATE SET cycle_number = EXCLUDED.cycle_number
+    """,
+)
+
+# Upvotes reach the all-time scores as they come in, the rest of the
+# cycle's totals are folded in when it ends.
+FOLD_QUOTAS_INTO_ALL_TIME_SCORES = Query(
+    "fold_quotas_into_all_time_scores",
+    """
+    INSERT INTO tntl_all_time_score (tntl_channel_id, submitter_id, submission_count, cycle_count)
+    SELECT tntl_channel_id, submitter_id, submission_count, 1
+    FROM tntl_submission_quota
+    WHERE tntl_channel_id = %s
+    ON CONFLICT (tntl_channel_id, submitter_id) DO UPDATE
+    SET submission_count = tntl_all_time_score.submission_count + EXCLUDED.submission_count,
+        cycle_count = tntl_all_time_score.cycle_count + 1
+    """,
+)
+
+DELETE_QUOTAS = Query(
+    "delete_quotas", "DELETE FROM tntl_submission_quota WHERE tntl_channel_id = %s"
+)
+
+DELETE_CHANNEL_VOTERS = Query(
+    "delete_channel_voters", "DELETE FROM tntl_channel_voter WHERE tntl_channel_id = %s"
+)
+
+DELETE_WATCH_PARTY = Query(
+    "delete_watch_party", "DELETE FROM tntl_watch_party WHERE tntl_channel_id = %s"
+)
+
+GET_PENDING_CYCLE_TEARDOWNS = Query(
+    "get_pending_cycle_teardowns",
+    "SELECT tntl_channel_id, cycle_number FROM tntl_cycle_teardown",
+)
+
+ARCHIVE_ENDED_CYCLE_BATCH = Query(
+    "archive_ended_cycle_batch",
+    """
+    WITH batch AS (
+        SELECT id FROM tntl_submission
+        WHERE tntl_channel_id = %(tntl_channel_id)s AND cycle_number <= %(cycle_number)s
+        ORDER BY id
+        LIMIT %(batch_size)s
+        FOR UPDATE SKIP LOCKED
+    ),
+    moved AS (
+        DELETE FROM tntl_submission s USING batch
+        WHERE s.id = batch.id
+        RETURNING s.id, s.tntl_channel_id, s.cycle_number, s.submitter_id,
+            s.message_text, s.upvote_count, s.created_at
+    ),
+    archived AS (
+        INSERT INTO tntl_submission_archive
+            (id, tntl_channel_id, cycle_number, submitter_id, message_text, upvote_count, created_at)
+        SELECT * FROM moved
+        ON CONFLICT (id) DO NOTHING
+    ),
+    progress AS (
+        UPDATE tntl_cycle_teardown
+        SET archived_submissions = archived_submissions + (SELECT COUNT(*) FROM moved)
+        WHERE tntl_channel_id = %(tntl_channel_id)s
+    )
+    SELECT COUNT(*) FROM moved
+    """,
+)
+
+# A cycle that ended again meanwhile keeps its teardown row.
+COMPLETE_CYCLE_TEARDOWN = Query(
+    "complete_cycle_teardown",
+    "DELETE FROM tntl_cycle_teardown WHERE tntl_channel_id = %s AND cycle_number = %s",
+)
+
+# Both leaderboards walk the score tables' (channel, upvote_count DESC)
+# indexes, so a page costs the same however much history there is.
+GET_CYCLE_LEADERBOARD = Query(
+    "get_cycle_leaderboard",
+    """
+    SELECT submitter_id, upvote_count FROM tntl_cycle_score
+    WHERE tntl_channel_id = %(tntl_channel_id)s
+    AND cycle_number = (SELECT cycle_number FROM tntl_channel WHERE id = %(tntl_channel_id)s)
+    ORDER BY upvote_count DESC, submitter_id
+    LIMIT %(limit)s OFFSET %(offset)s
+    """,
+)
+
+GET_ALL_TIME_LEADERBOARD = Query(
+    "get_all_time_leaderboard",
+    """
+    SELECT submitter_id, upvote_count, submission_count, cycle_count
+    FROM tntl_all_time_score
+    WHERE tntl_channel_id = %s
+    ORDER BY upvote_count DESC, submitter_id
+    LIMIT %s OFFSET %s
+    """,
+)
+
+# One page of the party's stored order, after the position of the last row
+# of the previous page; the first page starts after position 0.
+GET_WATCH_PARTY_SUBMISSIONS_PAGE = Query(
+    "get_watch_party_submissions_page",
+    """
+    SELECT o.position, s.id, s.message_text, s.submitter_id, s.upvote_count
+    FROM tntl_watch_party_order o
+    JOIN tntl_submission s ON s.id = o.tntl_submission_id
+    WHERE o.tntl_channel_id = %s
+    AND o.position > %s
+    AND NOT EXISTS (SELECT 1 FROM tntl_submission_message m WHERE m.tntl_submission_id = s.id)
+    ORDER BY o.position
+    LIMIT %s
+    """,
+)
+
+GET_UNFINISHED_WATCH_PARTY = Query(
+    "get_unfinished_watch_party",
+    "SELECT seed, total_submissions, posted_submissions FROM tntl_watch_party WHERE tntl_channel_id = %s AND completed_at IS NULL",
+)
+
+UNLINK_SUBMISSION_MESSAGES = Query(
+    "unlink_submission_messages",
+    "DELETE FROM tntl_submission_message m USING tntl_submission s WHERE m.tntl_submission_id = s.id AND s.tntl_channel_id = %s",
+)
+
+BEGIN_WATCH_PARTY = Query(
+    "begin_watch_party",
+    """
+    INSERT INTO tntl_watch_party (tntl_channel_id, seed, total_submissions)
+    SELECT %(tntl_channel_id)s, %(seed)s, COUNT(*)
+    FROM tntl_submission s
+    JOIN tntl_channel c ON c.id = s.tntl_channel_id AND c.cycle_number = s.cycle_number
+    WHERE s.tntl_channel_id = %(tntl_channel_id)s
+    ON CONFLICT (tntl_channel_id) DO UPDATE
+    SET seed = EXCLUDED.seed,
+        total_submissions = EXCLUDED.total_submissions,
+        posted_submissions = 0,
+        started_at = CURRENT_TIMESTAMP,
+        completed_at = NULL
+    RETURNING total_submissions
+    """,
+)
+
+CLEAR_WATCH_PARTY_ORDER = Query(
+    "clear_watch_party_order",
+    "DELETE FROM tntl_watch_party_order WHERE tntl_channel_id = %s",
+)
+
+# The seeded order is computed here once, for the whole party.
+SHUFFLE_WATCH_PARTY = Query(
+    "shuffle_watch_party",
+    """
+    INSERT INTO tntl_watch_party_order (tntl_channel_id, position, tntl_submission_id)
+    SELECT s.tntl_channel_id, row_number() OVER (ORDER BY md5(s.id::text || ':' || %(seed)s::text), s.id), s.id
+    FROM tntl_submission s
+    JOIN tntl_channel c ON c.id = s.tntl_channel_id AND c.cycle_number = s.cycle_number
+    WHERE s.tntl_channel_id = %(tntl_channel_id)s
+    """,
+)
+
+LINK_SUBMISSION_MESSAGE = Query(
+    "link_submission_message",
+    """
+    INSERT INTO tntl_submission_message (tntl_submission_id, discord_message_id)
+    VALUES (%s, %s)
+    ON CONFLICT (tntl_submission_id) DO UPDATE
+    SET discord_message_id = EXCLUDED.discord_message_id
+    """,
+)
+
+RECORD_WATCH_PARTY_PROGRESS = Query(
+    "record_watch_party_progress",
+    "UPDATE tntl_watch_party SET posted_submissions = posted_submissions + %s WHERE tntl_channel_id = %s",
+)
+
+COMPLETE_WATCH_PARTY = Query(
+    "complete_watch_party",
+    "UPDATE tntl_watch_party SET completed_at = CURRENT_TIMESTAMP WHERE tntl_channel_id = %s",
+)
+
+# Submissions that no longer exist, or whose cycle ended, are missing from
+# the result.
+GET_UPVOTE_COUNTS = Query(
+    "get_upvote_counts",
+    """
+    SELECT s.id, s.upvote_count
+    FROM tntl_submission s
+    JOIN tntl_channel c ON c.id = s.tntl_channel_id AND c.cycle_number = s.cycle_number
+    WHERE s.id = ANY(%s)
+    """,
+)
+
+GET_DISCORD_MESSAGE_ID = Query(
+    "get_discord_message_id",
+    """
+    SELECT m.discord_message_id
+    FROM tntl_submission_message m
+    JOIN tntl_submission s ON s.id = m.tntl_submission_id
+    JOIN tntl_channel c ON c.id = s.tntl_channel_id AND c.cycle_number = s.cycle_number
+    WHERE m.tntl_submission_id = %s
+    """,
+)
@@ -0,0 +1,51 @@
+import time
+
+
+class RateLimiter:
+    """In-memory token buckets keyed by (user, channel).
+
+    Each key may act `burst` times in a row and regains `rate` tokens per
+    second after that. A bucket that has refilled completely is the same as
+    no bucket at all, so those are dropped in periodic sweeps and memory
+    only grows with the number of recently active users.
+    """
+
+    def __init__(self, rate: float, burst: int, sweep_interval: float = 60.0):
+        self._rate = rate
+        self._burst = burst
+        self._sweep_interval = sweep_interval
+        # Key -> (tokens left, when they were counted).
+        self._buckets: dict[tuple[int, int], tuple[float, float]] = {}
+        self._last_sweep = time.monotonic()
+
+        self.allowed = 0
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def allow(self, user_id: int, channel_id: int) -> bool:
+        now = time.monotonic()
+        if now - self._last_sweep >= self._sweep_interval:
+            self._sweep(now)
+
+        key = (user_id, channel_id)
+        tokens, counted_at = self._buckets.get(key, (self._burst, now))
+        tokens = min(self._burst, tokens + (now - counted_at) * self._rate)
+
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            self.rejected += 1
+            return False
+
+        self._buckets[key] = (tokens - 1, now)
+        self.allowed += 1
+        return True
+
+    def _sweep(self, now: float):
+        self._last_sweep = now
+        self._buckets = {
+            key: (tokens, counted_at)
+            for key, (tokens, counted_at) in self._buckets.items()
+            if tokens + (now - counted_at) * self._rate < self._burst
+        }
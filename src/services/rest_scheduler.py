@@ -0,0 +1,158 @@
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any
+
+import discord
+
+from metrics import DISCORD_REST_QUEUE_WAIT
+
+
+class RestPriority(IntEnum):
+    ACK = 0
+    POST = 1
+    EDIT = 2
+
+
+@dataclass
+class _Job:
+    priority: RestPriority
+    bucket: str
+    call: Callable[[], Awaitable[Any]]
+    merge_key: str | None
+    future: asyncio.Future
+    queued_at: float = field(default_factory=time.perf_counter)
+
+
+class RestScheduler:
+    """Orders the bot's outbound Discord REST calls by priority.
+
+    Every call made through the bot's HTTP client waits here for a slot.
+    Interaction acknowledgements never wait. User-visible posts, DMs and
+    deletes come next, and embed edits last, with at most `max_concurrency`
+    of those in flight. Calls in the same rate limit bucket go out one at a
+    time, so the queue (not py-cord's bucket lock) decides which one is
+    next. An edit of a message that already has one queued replaces it,
+    since only the latest content matters.
+    """
+
+    def __init__(self, max_concurrency: int = 5):
+        self._max_concurrency = max_concurrency
+        self._queues: dict[RestPriority, deque[_Job]] = {
+            priority: deque() for priority in RestPriority
+        }
+        self._queued_edits: dict[str, _Job] = {}
+        self._busy_buckets: set[str] = set()
+        self._in_flight = 0
+        self._tasks: set[asyncio.Task] = set()
+
+        self.dispatched = 0
+        self.merged_edits = 0
+
+    def queue_depths(self) -> dict[tuple[str, ...], int]:
+        return {
+            (priority.name.lower(),): len(queue)
+            for priority, queue in self._queues.items()
+        }
+
+    def install(self, bot: discord.Client):
+        """Route every request of `bot`'s HTTP client through the queue."""
+        request = bot.http.request
+
+        async def scheduled_request(route, **kwargs):
+            priority, bucket, merge_key = self.classify(route)
+            return await self.submit(
+                priority, bucket, lambda: request(route, **kwargs), merge_key
+            )
+
+        bot.http.request = scheduled_request  # type: ignore
+
+    @staticmethod
+    def classify(route) -> tuple[RestPriority, str, str | None]:
+        if route.path.startswith(("/interactions/", "/webhooks/")):
+            # Each interaction token is its own bucket.
+            return RestPriority.ACK, route.url, None
+
+        bucket = f"{route.method} {route.bucket}"
+        if (
+            route.method == "PATCH"
+            and route.path == "/channels/{channel_id}/messages/{message_id}"
+        ):
+            return RestPriority.EDIT, bucket, route.url
+        return RestPriority.POST, bucket, None
+
+    async def submit(
+        self,
+        priority: RestPriority,
+        bucket: str,
+        call: Callable[[], Awaitable[Any]],
+        merge_key: str | None = None,
+    ) -> Any:
+        queued = self._queued_edits.get(merge_key) if merge_key else None
+        if queued is not None:
+            queued.call = call
+            self.merged_edits += 1
+            return await asyncio.shield(queued.future)
+
+        job = _Job(
+            priority,
+            bucket,
+            call,
+            merge_key,
+            asyncio.get_running_loop().create_future(),
+        )
+        # Callers that gave up waiting must not leave the error unretrieved.
+        job.future.add_done_callback(
+            lambda future: future.cancelled() or future.exception()
+        )
+        self._queues[priority].append(job)
+        if merge_key:
+            self._queued_edits[merge_key] = job
+
+        self._dispatch()
+        return await asyncio.shield(job.future)
+
+    def _dispatch(self):
+        for priority, queue in self._queues.items():
+            skipped: deque[_Job] = deque()
+            while queue:
+                if (
+                    priority != RestPriority.ACK
+                    and self._in_flight >= self._max_concurrency
+                ):
+                    break
+                job = queue.popleft()
+                if job.bucket in self._busy_buckets:
+                    skipped.append(job)
+                    continue
+                self._start(job)
+            queue.extendleft(reversed(skipped))
+
+    def _start(self, job: _Job):
+        if job.merge_key:
+            self._queued_edits.pop(job.merge_key, None)
+        self._busy_buckets.add(job.bucket)
+        self._in_flight += 1
+        self.dispatched += 1
+        DISCORD_REST_QUEUE_WAIT.observe(
+            time.perf_counter() - job.queued_at, priority=job.priority.name.lower()
+        )
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job: _Job):
+        try:
+            job.future.set_result(await job.call())
+        except asyncio.CancelledError:
+            job.future.cancel()
+            raise
+        except Exception as error:
+            job.future.set_exception(error)
+        finally:
+            self._busy_buckets.discard(job.bucket)
+            self._in_flight -= 1
+            self._dispatch()
@@ -0,0 +1,539 @@
+import asyncio
+import json
+import sqlite3
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TypeVar
+
+from metrics import DB_QUERY_DURATION, DB_QUERY_ERRORS, instrument_methods
+from services.database import DatabaseService, shuffle_key
+
+SCHEMA_PATH = Path(__file__).parent / "sqlite_schema.sql"
+SCHEMA_VERSION = 1
+
+# Statements kept compiled by the connection; every query here fits.
+STATEMENT_CACHE_SIZE = 256
+
+T = TypeVar("T")
+
+
+@instrument_methods(DB_QUERY_DURATION, DB_QUERY_ERRORS)
+class SqliteDatabaseService(DatabaseService):
+    """Everything in one SQLite file, for single-process deployments.
+
+    The connection lives on a thread of its own and every call runs there
+    as one transaction, so calls are serialized and a cancelled caller
+    never leaves a transaction half done. The file is in WAL mode, which
+    lets `sqlite3` readers outside the bot look at it while it runs.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn: sqlite3.Connection | None = None
+
+    async def open(self):
+        await self._submit(self._connect)
+
+    async def close(self):
+        await self._submit(self._disconnect)
+        self._executor.shutdown(wait=False)
+
+    def _connect(self):
+        if self._path != ":memory:":
+            Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+
+        conn = sqlite3.connect(
+            self._path,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.create_function("tntl_shuffle_key", 2, shuffle_key, deterministic=True)
+        self._conn = conn
+
+    def _disconnect(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _submit(self, function: Callable[[], T]) -> T:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, function
+        )
+
+    async def _transaction(self, operation: Callable[[sqlite3.Connection], T]) -> T:
+        def run() -> T:
+            conn = self._conn
+            if conn is None:
+                raise RuntimeError("The SQLite database is not open.")
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = operation(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+        return await self._submit(run)
+
+    async def migrate(self):
+        print("Migrating database...")
+
+        def migrate():
+            (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+            if version < SCHEMA_VERSION:
+                self._conn.executescript(SCHEMA_PATH.read_text())
+
+        await self._submit(migrate)
+        print("Database migrated.")
+
+    async def define_tntl_channel(
+        self, discord_channel_id: int, max_submissions: int
+    ) -> int:
+        print(
+            f"Defining Try Not To Laugh channel with ID {discord_channel_id} and {max_submissions} submissions."
+        )
+        return await self._transaction(
+            lambda conn: conn.execute(
+                "INSERT INTO tntl_channel (discord_channel_id, max_submissions) VALUES (?, ?) RETURNING id",
+                (discord_channel_id, max_submissions),
+            ).fetchone()[0]
+        )
+
+    async def get_tntl_channels(self) -> dict[int, int]:
+        result = await self._transaction(
+            lambda conn: conn.execute(
+                "SELECT discord_channel_id, id FROM tntl_channel"
+            ).fetchall()
+        )
+        return {
+            discord_channel_id: tntl_channel_id
+            for discord_channel_id, tntl_channel_id in result
+        }
+
+    async def get_tntl_channel_id(self, discord_channel_id: int) -> int | None:
+        result = await self._transaction(
+            lambda conn: conn.execute(
+                "SELECT id FROM tntl_channel WHERE discord_channel_id = ?",
+                (discord_channel_id,),
+            ).fetchone()
+        )
+        return result[0] if result else None
+
+    async def submit_if_under_quota(
+        self,
+        message_text: str,
+        discord_channel_id: int,
+        submitter_id: int,
+        canonical_url: str,
+        canonical_hash: int,
+    ) -> DatabaseService.SubmissionResult:
+        # Transactions run one at a time, so checking and then writing is
+        # as safe here as the single statement is in Postgres.
+        def submit(conn: sqlite3.Connection) -> DatabaseService.SubmissionResult:
+            channel = conn.execute(
+                "SELECT id, max_submissions, cycle_number FROM tntl_channel WHERE discord_channel_id = ?",
+                (discord_channel_id,),
+            ).fetchone()
+            if channel is None:
+                return self.SubmissionResult(self.SubmissionStatus.NOT_TNTL_CHANNEL)
+            tntl_channel_id, max_submissions, cycle_number = channel
+
+            duplicate = conn.execute(
+                "SELECT 1 FROM tntl_submission WHERE tntl_channel_id = ? AND cycle_number = ? AND canonical_hash = ?",
+                (tntl_channel_id, cycle_number, canonical_hash),
+            ).fetchone()
+            if duplicate:
+                return self.SubmissionResult(self.SubmissionStatus.DUPLICATE)
+
+            quota = conn.execute(
+                """
+                INSERT INTO tntl_submission_quota (tntl_channel_id, submitter_id, submission_count)
+                SELECT ?, ?, 1 WHERE ? > 0
+                ON CONFLICT (tntl_channel_id, submitter_id) DO UPDATE
+                SET submission_count = submission_count + 1
+                WHERE submission_count < ?
+                RETURNING submission_count
+                """,
+                (tntl_channel_id, submitter_id, max_submissions, max_submissions),
+            ).fetchone()
+            if quota is None:
+                return self.SubmissionResult(self.SubmissionStatus.LIMIT_EXCEEDED)
+
+            (tntl_submission_id,) = conn.execute(
+                """
+                INSERT INTO tntl_submission (message_text, tntl_channel_id, submitter_id, cycle_number, canonical_url, canonical_hash)
+                VALUES (?, ?, ?, ?, ?, ?)
+                RETURNING id
+                """,
+                (
+                    message_text,
+                    tntl_channel_id,
+                    submitter_id,
+                    cycle_number,
+                    canonical_url,
+                    canonical_hash,
+                ),
+            ).fetchone()
+            return self.SubmissionResult(
+                self.SubmissionStatus.SUBMITTED, tntl_submission_id
+            )
+
+        return await self._transaction(submit)
+
+    async def upvote_tntl_submissions(
+        self, votes: list[tuple[int, int]]
+    ) -> dict[int, int]:
+        """Record votes and return how many were new, per TNTL channel."""
+
+        def upvote(conn: sqlite3.Connection) -> dict[int, int]:
+            inserted = conn.execute(
+                """
+                INSERT INTO tntl_submission_upvote (tntl_submission_id, user_id)
+                SELECT s.id, json_extract(v.value, '$[1]')
+                FROM json_each(?) v
+                JOIN tntl_submission s ON s.id = json_extract(v.value, '$[0]')
+                JOIN tntl_channel c ON c.id = s.tntl_channel_id AND c.cycle_number = s.cycle_number
+                WHERE true
+                ON CONFLICT DO NOTHING
+                RETURNING tntl_submission_id
+                """,
+                (json.dumps(votes),),
+            ).fetchall()
+            result = conn.execute(
+                """
+                SELECT s.tntl_channel_id, COUNT(*)
+                FROM json_each(?) i
+                JOIN tntl_submission s ON s.id = i.value
+                GROUP BY s.tntl_channel_id
+                """,
+                (json.dumps([tntl_submission_id for (tntl_submission_id,) in inserted]),),
+            ).fetchall()
+            return {tntl_channel_id: count for tntl_channel_id, count in result}
+
+        return await self._transaction(upvote)
+
+    async def get_top_upvoted_messages(
+        self, tntl_channel_id: int, limit: int = 10
+    ) -> list[DatabaseService.TopUpvotedMessage]:
+        result = await self._transaction(
+            lambda conn: conn.execute(
+                """
+                SELECT s.message_text, s.upvote_count, s.submitter_id
+                FROM tntl_submission s
+                JOIN tntl_channel c ON c.id = s.tntl_channel_id AND c.cycle_number = s.cycle_number
+                WHERE s.tntl_channel_id = ?
+                ORDER BY s.upvote_count DESC
+                LIMIT ?
+                """,
+                (tntl_channel_id, limit),
+            ).fetchall()
+        )
+        return [
+            self.TopUpvotedMessage(message_text, upvote_count, sender_id)
+            for message_text, upvote_count, sender_id in result
+        ]
+
+    async def get_top_upvoted_user_ids(
+        self, tntl_channel_id: int, limit: int = 10
+    ) -> list[int]:
+        result = await self._transaction(
+            lambda conn: conn.execute(
+                "SELECT user_id FROM tntl_channel_voter WHERE tntl_channel_id = ? ORDER BY upvote_count DESC LIMIT ?",
+                (tntl_channel_id, limit),
+            ).fetchall()
+        )
+        return [user_id for (user_id,) in result]
+
+    async def end_tntl_cycle(self, tntl_channel_id: int) -> int:
+        def end_cycle(conn: sqlite3.Connection) -> int:
+            (ended_cycle_number,) = conn.execute(
+                "UPDATE tntl_channel SET cycle_number = cycle_number + 1 WHERE id = ? RETURNING cycle_number - 1",
+                (tntl_channel_id,),
+            ).fetchone()
+            conn.execute(
+                """
+                INSERT INTO tntl_cycle_teardown (tntl_channel_id, cycle_number)
+                VALUES (?, ?)
+                ON CONFLICT (tntl_channel_id) DO UPDATE SET cycle_number = excluded.cycle_number
+                """,
+                (tntl_channel_id, ended_cycle_number),
+            )
+            conn.execute(
+                """
+                INSERT INTO tntl_all_time_score (tntl_channel_id, submitter_id, submission_count, cycle_count)
+                SELECT tntl_channel_id, submitter_id, submission_count, 1
+                FROM tntl_submission_quota
+                WHERE tntl_channel_id = ?
+                ON CONFLICT (tntl_channel_id, submitter_id) DO UPDATE
+                SET submission_count = submission_count + excluded.submission_count,
+                    cycle_count = cycle_count + 1
+                """,
+                (tntl_channel_id,),
+            )
+            for table in (
+                "tntl_submission_quota",
+                "tntl_channel_voter",
+                "tntl_watch_party",
+            ):
+                conn.execute(
+                    f"DELETE FROM {table} WHERE tntl_channel_id = ?",
+                    (tntl_channel_id,),
+                )
+            return ended_cycle_number
+
+        return await self._transaction(end_cycle)
+
+    async def get_pending_cycle_teardowns(self) -> dict[int, int]:
+        result = await self._transaction(
+            lambda conn: conn.execute(
+                "SELECT tntl_channel_id, cycle_number FROM tntl_cycle_teardown"
+            ).fetchall()
+        )
+        return {tntl_channel_id: cycle_number for tntl_channel_id, cycle_number in result}
+
+    async def archive_ended_cycle_batch(
+        self, tntl_channel_id: int, cycle_number: int, batch_size: int
+    ) -> int:
+        def archive(conn: sqlite3.Connection) -> int:
+            batch = json.dumps(
+                [
+                    tntl_submission_id
+                    for (tntl_submission_id,) in conn.execute(
+                        "SELECT id FROM tntl_submission WHERE tntl_channel_id = ? AND cycle_number <= ? ORDER BY id LIMIT ?",
+                        (tntl_channel_id, cycle_number, batch_size),
+                    )
+                ]
+            )
+            conn.execute(
+                """
+                INSERT INTO tntl_submission_archive
+                    (id, tntl_channel_id, cycle_number, submitter_id, message_text, upvote_count, created_at)
+                SELECT id, tntl_channel_id, cycle_number, submitter_id, message_text, upvote_count, created_at
+                FROM tntl_submission
+                WHERE id IN (SELECT value FROM json_each(?))
+                ON CONFLICT (id) DO NOTHING
+                """,
+                (batch,),
+            )
+            moved_count = conn.execute(
+                "DELETE FROM tntl_submission WHERE id IN (SELECT value FROM json_each(?))",
+                (batch,),
+            ).rowcount
+            conn.execute(
+                "UPDATE tntl_cycle_teardown SET archived_submissions = archived_submissions + ? WHERE tntl_channel_id = ?",
+                (moved_count, tntl_channel_id),
+            )
+            return moved_count
+
+        return await self._transaction(archive)
+
+    async def complete_cycle_teardown(self, tntl_channel_id: int, cycle_number: int):
+        await self._transaction(
+            lambda conn: conn.execute(
+                "DELETE FROM tntl_cycle_teardown WHERE tntl_channel_id = ? AND cycle_number = ?",
+                (tntl_channel_id, cycle_number),
+            )
+        )
+
+    async def get_leaderboard(
+        self,
+        tntl_channel_id: int,
+        scope: DatabaseService.LeaderboardScope,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> list[DatabaseService.LeaderboardEntry]:
+        if scope == self.LeaderboardScope.CYCLE:
+            result = await self._transaction(
+                lambda conn: conn.execute(
+                    """
+                    SELECT submitter_id, upvote_count FROM tntl_cycle_score
+                    WHERE tntl_channel_id = :tntl_channel_id
+                    AND cycle_number = (SELECT cycle_number FROM tntl_channel WHERE id = :tntl_channel_id)
+                    ORDER BY upvote_count DESC, submitter_id
+                    LIMIT :limit OFFSET :offset
+                    """,
+                    {
+                        "tntl_channel_id": tntl_channel_id,
+                        "limit": limit,
+                        "offset": offset,
+                    },
+                ).fetchall()
+            )
+            return [
+                self.LeaderboardEntry(submitter_id, upvote_count)
+                for submitter_id, upvote_count in result
+            ]
+
+        result = await self._transaction(
+            lambda conn: conn.execute(
+                """
+                SELECT submitter_id, upvote_count, submission_count, cycle_count
+                FROM tntl_all_time_score
+                WHERE tntl_channel_id = ?
+                ORDER BY upvote_count DESC, submitter_id
+                LIMIT ? OFFSET ?
+                """,
+                (tntl_channel_id, limit, offset),
+            ).fetchall()
+        )
+        return [self.LeaderboardEntry(*row) for row in result]
+
+    async def stream_watch_party_submissions(
+        self, tntl_channel_id: int, batch_size: int = 100
+    ) -> AsyncIterator[list[DatabaseService.WatchPartySubmission]]:
+        """Yield the channel's unposted submissions in the party's order.
+
+        Each batch is one page of the order stored by `begin_watch_party`,
+        read by position in its own transaction, so other calls get their
+        turn in between.
+        """
+        after_position = 0
+        while True:
+            rows = await self._transaction(
+                lambda conn: conn.execute(
+                    """
+                    SELECT o.position, s.id, s.message_text, s.submitter_id, s.upvote_count
+                    FROM tntl_watch_party_order o
+                    JOIN tntl_submission s ON s.id = o.tntl_submission_id
+                    WHERE o.tntl_channel_id = ?
+                    AND o.position > ?
+                    AND NOT EXISTS (SELECT 1 FROM tntl_submission_message m WHERE m.tntl_submission_id = s.id)
+                    ORDER BY o.position
+                    LIMIT ?
+                    """,
+                    (tntl_channel_id, after_position, batch_size),
+                ).fetchall()
+            )
+            if not rows:
+                return
+
+            after_position = rows[-1][0]
+            yield [self.WatchPartySubmission(*row[1:]) for row in rows]
+
+    async def get_unfinished_watch_party(
+        self, tntl_channel_id: int
+    ) -> DatabaseService.WatchParty | None:
+        result = await self._transaction(
+            lambda conn: conn.execute(
+                "SELECT seed, total_submissions, posted_submissions FROM tntl_watch_party WHERE tntl_channel_id = ? AND completed_at IS NULL",
+                (tntl_channel_id,),
+            ).fetchone()
+        )
+        return self.WatchParty(*result) if result else None
+
+    async def begin_watch_party(self, tntl_channel_id: int, seed: int) -> int:
+        def begin(conn: sqlite3.Connection) -> int:
+            conn.execute(
+                "DELETE FROM tntl_submission_message WHERE tntl_submission_id IN (SELECT id FROM tntl_submission WHERE tntl_channel_id = ?)",
+                (tntl_channel_id,),
+            )
+            (total_submissions,) = conn.execute(
+                """
+                INSERT INTO tntl_watch_party (tntl_channel_id, seed, total_submissions)
+                SELECT :tntl_channel_id, :seed, COUNT(*)
+                FROM tntl_submission s
+                JOIN tntl_channel c ON c.id = s.tntl_channel_id AND c.cycle_number = s.cycle_number
+                WHERE s.tntl_channel_id = :tntl_channel_id
+                ON CONFLICT (tntl_channel_id) DO UPDATE
+                SET seed = excluded.seed,
+                    total_submissions = excluded.total_submissions,
+                    posted_submissions = 0,
+                    started_at = CURRENT_TIMESTAMP,
+                    completed_at = NULL
+                RETURNING total_submissions
+                """,
+                {"tntl_channel_id": tntl_channel_id, "seed": seed},
+            ).fetchone()
+            conn.execute(
+                "DELETE FROM tntl_watch_party_order WHERE tntl_channel_id = ?",
+                (tntl_channel_id,),
+            )
+            # The seeded order is computed here once, for the whole party.
+            conn.execute(
+                """
+                INSERT INTO tntl_watch_party_order (tntl_channel_id, position, tntl_submission_id)
+                SELECT s.tntl_channel_id, row_number() OVER (ORDER BY tntl_shuffle_key(s.id, :seed), s.id), s.id
+                FROM tntl_submission s
+                JOIN tntl_channel c ON c.id = s.tntl_channel_id AND c.cycle_number = s.cycle_number
+                WHERE s.tntl_channel_id = :tntl_channel_id
+                """,
+                {"tntl_channel_id": tntl_channel_id, "seed": seed},
+            )
+            return total_submissions
+
+        return await self._transaction(begin)
+
+    async def record_watch_party_progress(
+        self, tntl_channel_id: int, links: list[tuple[int, int]]
+    ):
+        def record(conn: sqlite3.Connection):
+            conn.executemany(
+                """
+                INSERT INTO tntl_submission_message (tntl_submission_id, discord_message_id)
+                VALUES (?, ?)
+                ON CONFLICT (tntl_submission_id) DO UPDATE
+                SET discord_message_id = excluded.discord_message_id
+                """,
+                links,
+            )
+            conn.execute(
+                "UPDATE tntl_watch_party SET posted_submissions = posted_submissions + ? WHERE tntl_channel_id = ?",
+                (len(links), tntl_channel_id),
+            )
+
+        await self._transaction(record)
+
+    async def complete_watch_party(self, tntl_channel_id: int):
+        def complete(conn: sqlite3.Connection):
+            conn.execute(
+                "UPDATE tntl_watch_party SET completed_at = CURRENT_TIMESTAMP WHERE tntl_channel_id = ?",
+                (tntl_channel_id,),
+            )
+            conn.execute(
+                "DELETE FROM tntl_watch_party_order WHERE tntl_channel_id = ?",
+                (tntl_channel_id,),
+            )
+
+        await self._transaction(complete)
+
+    async def get_upvote_counts(self, tntl_submission_ids: list[int]) -> dict[int, int]:
+        result = await self._transaction(
+            lambda conn: conn.execute(
+                """
+                SELECT s.id, s.upvote_count
+                FROM tntl_submission s
+                JOIN tntl_channel c ON c.id = s.tntl_channel_id AND c.cycle_number = s.cycle_number
+                WHERE s.id IN (SELECT value FROM json_each(?))
+                """,
+                (json.dumps(tntl_submission_ids),),
+            ).fetchall()
+        )
+        return {
+            tntl_submission_id: upvote_count
+            for tntl_submission_id, upvote_count in result
+        }
+
+    async def get_discord_message_id_by_tntl_submission_id(
+        self, tntl_submission_id: int
+    ) -> int | None:
+        result = await self._transaction(
+            lambda conn: conn.execute(
+                """
+                SELECT m.discord_message_id
+                FROM tntl_submission_message m
+                JOIN tntl_submission s ON s.id = m.tntl_submission_id
+                JOIN tntl_channel c ON c.id = s.tntl_channel_id AND c.cycle_number = s.cycle_number
+                WHERE m.tntl_submission_id = ?
+                """,
+                (tntl_submission_id,),
+            ).fetchone()
+        )
+        return result[0] if result else None
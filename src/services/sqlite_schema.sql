@@ -0,0 +1,62 @@
+-- Schema of the embedded SQLite backend, the same tables as the Postgres
+-- migrations produce. Bump user_version at the bottom when this changes.
+CREATE TABLE IF NOT EXISTS tntl_channel (id INTEGER PRIMARY KEY, discord_channel_id INTEGER NOT NULL UNIQUE, max_submissions INTEGER NOT NULL, cycle_number INTEGER NOT NULL DEFAULT 1);
+
+-- AUTOINCREMENT so ids of archived submissions are never handed out again;
+-- the archive and old upvote buttons still refer to them.
+CREATE TABLE IF NOT EXISTS tntl_submission (id INTEGER PRIMARY KEY AUTOINCREMENT, message_text TEXT NOT NULL, tntl_channel_id INTEGER NOT NULL REFERENCES tntl_channel(id) ON DELETE CASCADE, submitter_id INTEGER NOT NULL, created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP, upvote_count INTEGER NOT NULL DEFAULT 0, cycle_number INTEGER NOT NULL DEFAULT 1, canonical_url TEXT, canonical_hash INTEGER);
+
+CREATE UNIQUE INDEX IF NOT EXISTS tntl_submission_canonical_hash_idx ON tntl_submission (tntl_channel_id, cycle_number, canonical_hash);
+
+CREATE INDEX IF NOT EXISTS tntl_submission_top_upvoted_idx ON tntl_submission (tntl_channel_id, upvote_count DESC);
+
+CREATE TABLE IF NOT EXISTS tntl_submission_message (id INTEGER PRIMARY KEY, tntl_submission_id INTEGER NOT NULL UNIQUE REFERENCES tntl_submission(id) ON DELETE CASCADE, discord_message_id INTEGER NOT NULL);
+
+CREATE TABLE IF NOT EXISTS tntl_submission_upvote (id INTEGER PRIMARY KEY, tntl_submission_id INTEGER NOT NULL REFERENCES tntl_submission(id) ON DELETE CASCADE, user_id INTEGER NOT NULL, UNIQUE (tntl_submission_id, user_id));
+
+CREATE TABLE IF NOT EXISTS tntl_submission_quota (tntl_channel_id INTEGER NOT NULL REFERENCES tntl_channel(id) ON DELETE CASCADE, submitter_id INTEGER NOT NULL, submission_count INTEGER NOT NULL, PRIMARY KEY (tntl_channel_id, submitter_id));
+
+CREATE TABLE IF NOT EXISTS tntl_watch_party (tntl_channel_id INTEGER PRIMARY KEY REFERENCES tntl_channel(id) ON DELETE CASCADE, seed INTEGER NOT NULL, total_submissions INTEGER NOT NULL, posted_submissions INTEGER NOT NULL DEFAULT 0, started_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP, completed_at TEXT);
+
+CREATE TABLE IF NOT EXISTS tntl_watch_party_order (tntl_channel_id INTEGER NOT NULL REFERENCES tntl_watch_party(tntl_channel_id) ON DELETE CASCADE, position INTEGER NOT NULL, tntl_submission_id INTEGER NOT NULL REFERENCES tntl_submission(id) ON DELETE CASCADE, PRIMARY KEY (tntl_channel_id, position));
+
+CREATE INDEX IF NOT EXISTS tntl_watch_party_order_submission_idx ON tntl_watch_party_order (tntl_submission_id);
+
+CREATE TABLE IF NOT EXISTS tntl_channel_voter (tntl_channel_id INTEGER NOT NULL REFERENCES tntl_channel(id) ON DELETE CASCADE, user_id INTEGER NOT NULL, upvote_count INTEGER NOT NULL, PRIMARY KEY (tntl_channel_id, user_id));
+
+CREATE INDEX IF NOT EXISTS tntl_channel_voter_top_idx ON tntl_channel_voter (tntl_channel_id, upvote_count DESC);
+
+CREATE TABLE IF NOT EXISTS tntl_submission_archive (id INTEGER PRIMARY KEY, tntl_channel_id INTEGER NOT NULL REFERENCES tntl_channel(id) ON DELETE CASCADE, cycle_number INTEGER NOT NULL, submitter_id INTEGER NOT NULL, message_text TEXT NOT NULL, upvote_count INTEGER NOT NULL, created_at TEXT NOT NULL, archived_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP);
+
+CREATE INDEX IF NOT EXISTS tntl_submission_archive_cycle_idx ON tntl_submission_archive (tntl_channel_id, cycle_number, upvote_count DESC);
+
+CREATE TABLE IF NOT EXISTS tntl_cycle_teardown (tntl_channel_id INTEGER PRIMARY KEY REFERENCES tntl_channel(id) ON DELETE CASCADE, cycle_number INTEGER NOT NULL, archived_submissions INTEGER NOT NULL DEFAULT 0, started_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP);
+
+CREATE TABLE IF NOT EXISTS tntl_cycle_score (tntl_channel_id INTEGER NOT NULL REFERENCES tntl_channel(id) ON DELETE CASCADE, cycle_number INTEGER NOT NULL, submitter_id INTEGER NOT NULL, upvote_count INTEGER NOT NULL, PRIMARY KEY (tntl_channel_id, cycle_number, submitter_id));
+
+CREATE INDEX IF NOT EXISTS tntl_cycle_score_top_idx ON tntl_cycle_score (tntl_channel_id, cycle_number, upvote_count DESC, submitter_id);
+
+CREATE TABLE IF NOT EXISTS tntl_all_time_score (tntl_channel_id INTEGER NOT NULL REFERENCES tntl_channel(id) ON DELETE CASCADE, submitter_id INTEGER NOT NULL, upvote_count INTEGER NOT NULL DEFAULT 0, submission_count INTEGER NOT NULL DEFAULT 0, cycle_count INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (tntl_channel_id, submitter_id));
+
+CREATE INDEX IF NOT EXISTS tntl_all_time_score_top_idx ON tntl_all_time_score (tntl_channel_id, upvote_count DESC, submitter_id);
+
+-- Same bookkeeping as tntl_count_upvote() in Postgres. Votes are only ever
+-- removed together with their submission, so there is no delete trigger.
+CREATE TRIGGER IF NOT EXISTS tntl_submission_upvote_count AFTER INSERT ON tntl_submission_upvote
+BEGIN
+    UPDATE tntl_submission SET upvote_count = upvote_count + 1 WHERE id = NEW.tntl_submission_id;
+
+    INSERT INTO tntl_channel_voter (tntl_channel_id, user_id, upvote_count)
+    SELECT tntl_channel_id, NEW.user_id, 1 FROM tntl_submission WHERE id = NEW.tntl_submission_id
+    ON CONFLICT (tntl_channel_id, user_id) DO UPDATE SET upvote_count = upvote_count + 1;
+
+    INSERT INTO tntl_cycle_score (tntl_channel_id, cycle_number, submitter_id, upvote_count)
+    SELECT tntl_channel_id, cycle_number, submitter_id, 1 FROM tntl_submission WHERE id = NEW.tntl_submission_id
+    ON CONFLICT (tntl_channel_id, cycle_number, submitter_id) DO UPDATE SET upvote_count = upvote_count + 1;
+
+    INSERT INTO tntl_all_time_score (tntl_channel_id, submitter_id, upvote_count)
+    SELECT tntl_channel_id, submitter_id, 1 FROM tntl_submission WHERE id = NEW.tntl_submission_id
+    ON CONFLICT (tntl_channel_id, submitter_id) DO UPDATE SET upvote_count = upvote_count + 1;
+END;
+
+PRAGMA user_version = 1;
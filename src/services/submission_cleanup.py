@@ -0,0 +1,210 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+import discord
+
+from config import logger
+
+# Discord's limit for one bulk delete.
+BULK_DELETE_LIMIT = 100
+
+
+@dataclass
+class _PendingDeletes:
+    channel: discord.abc.Messageable
+    messages: list[discord.Message] = field(default_factory=list)
+    attempts: int = 0
+    retry_at: float = 0.0
+
+
+@dataclass
+class _PendingNotices:
+    user: discord.abc.User
+    # Notice -> how many times it was queued, in the order first queued.
+    notices: dict[str, int] = field(default_factory=dict)
+    attempts: int = 0
+    retry_at: float = 0.0
+
+
+class SubmissionCleanup:
+    """Removes submitted channel messages and confirms them to their authors.
+
+    Messages are collected per channel and deleted every `flush_interval`
+    seconds with one bulk delete per 100. The notices for a user are sent
+    as a single DM, however many of their messages were handled since the
+    last flush. A failed delete or DM is put back and retried after an
+    exponential backoff, and given up after `max_attempts`; a missing
+    message or a user who doesn't accept DMs is not retried.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 1.0,
+        max_attempts: int = 5,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 60.0,
+    ):
+        self._flush_interval = flush_interval
+        self._max_attempts = max_attempts
+        self._retry_delay = retry_delay
+        self._max_retry_delay = max_retry_delay
+
+        self._deletes: dict[int, _PendingDeletes] = {}
+        self._notices: dict[int, _PendingNotices] = {}
+        self._task: asyncio.Task | None = None
+
+        self.deleted = 0
+        self.bulk_deletes = 0
+        self.notices_sent = 0
+        self.coalesced_notices = 0
+        self.retries = 0
+        self.dropped = 0
+
+    def pending(self) -> int:
+        return sum(len(pending.messages) for pending in self._deletes.values())
+
+    def queue(self, message: discord.Message, notice: str | None = None):
+        """Delete `message` and, if given, DM `notice` to its author."""
+        channel_id = message.channel.id
+        if channel_id not in self._deletes:
+            self._deletes[channel_id] = _PendingDeletes(message.channel)
+        self._deletes[channel_id].messages.append(message)
+
+        if notice is None:
+            return
+
+        user_id = message.author.id
+        if user_id not in self._notices:
+            self._notices[user_id] = _PendingNotices(message.author)
+        pending = self._notices[user_id]
+        if pending.notices:
+            self.coalesced_notices += 1
+        pending.notices[notice] = pending.notices.get(notice, 0) + 1
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.drain()
+
+    async def drain(self):
+        """Send everything queued that isn't waiting for a retry."""
+        while await self.flush():
+            pass
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to clean up submissions")
+
+    async def flush(self) -> int:
+        """Start every due delete and DM, wait for them and return how many."""
+        now = time.monotonic()
+        jobs = []
+
+        for channel_id, pending in list(self._deletes.items()):
+            if pending.retry_at > now:
+                continue
+            batch = pending.messages[:BULK_DELETE_LIMIT]
+            del pending.messages[:BULK_DELETE_LIMIT]
+            if not pending.messages:
+                del self._deletes[channel_id]
+            jobs.append(self._delete(channel_id, pending.channel, batch, pending.attempts))
+
+        for user_id, pending in list(self._notices.items()):
+            if pending.retry_at > now:
+                continue
+            del self._notices[user_id]
+            jobs.append(self._notify(user_id, pending))
+
+        await asyncio.gather(*jobs)
+        return len(jobs)
+
+    def _backoff(self, attempts: int) -> float:
+        return time.monotonic() + min(
+            self._max_retry_delay, self._retry_delay * 2 ** (attempts - 1)
+        )
+
+    async def _delete(
+        self,
+        channel_id: int,
+        channel: discord.abc.Messageable,
+        batch: list[discord.Message],
+        attempts: int,
+    ):
+        try:
+            # One message goes through the single delete endpoint.
+            await channel.delete_messages(batch)  # type: ignore
+        except discord.NotFound:
+            # A lone message that is already gone.
+            pass
+        except discord.Forbidden:
+            logger.warning(f"Not allowed to delete submissions in channel {channel_id}")
+            self.dropped += len(batch)
+            return
+        except Exception:
+            attempts += 1
+            if attempts >= self._max_attempts:
+                logger.exception(
+                    f"Giving up deleting {len(batch)} submissions in channel {channel_id}"
+                )
+                self.dropped += len(batch)
+                return
+
+            logger.warning(
+                f"Failed to delete {len(batch)} submissions in channel {channel_id}, retrying"
+            )
+            self.retries += 1
+            if channel_id not in self._deletes:
+                self._deletes[channel_id] = _PendingDeletes(channel)
+            pending = self._deletes[channel_id]
+            pending.messages[:0] = batch
+            pending.attempts = attempts
+            pending.retry_at = self._backoff(attempts)
+            return
+
+        if len(batch) > 1:
+            self.bulk_deletes += 1
+        self.deleted += len(batch)
+        pending = self._deletes.get(channel_id)
+        if pending is not None:
+            pending.attempts = 0
+
+    async def _notify(self, user_id: int, pending: _PendingNotices):
+        content = "\n".join(
+            notice if count == 1 else f"{notice} (x{count})"
+            for notice, count in pending.notices.items()
+        )
+        try:
+            await pending.user.send(content)
+        except discord.Forbidden:
+            # DMs closed; nothing will change that on retry.
+            self.dropped += 1
+            return
+        except Exception:
+            pending.attempts += 1
+            if pending.attempts >= self._max_attempts:
+                logger.exception(f"Giving up sending submission notices to user {user_id}")
+                self.dropped += 1
+                return
+
+            logger.warning(f"Failed to send submission notices to user {user_id}, retrying")
+            self.retries += 1
+            # Notices queued meanwhile go out with the retry.
+            newer = self._notices.pop(user_id, None)
+            if newer is not None:
+                for notice, count in newer.notices.items():
+                    pending.notices[notice] = pending.notices.get(notice, 0) + count
+            pending.retry_at = self._backoff(pending.attempts)
+            self._notices[user_id] = pending
+            return
+
+        self.notices_sent += 1
@@ -0,0 +1,228 @@
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+import discord
+
+from config import logger
+from services.database import DatabaseService
+
+
+class UpvoteAggregator:
+    """Buffers upvote clicks and writes them to the database in batches.
+
+    Votes are flushed every `flush_interval` seconds with one insert, and the
+    embed of each voted submission is re-rendered at most once every
+    `edit_interval` seconds with its latest count, no matter how many votes
+    came in meanwhile. Messages are edited through their cached id, so they
+    are never fetched first. `on_flush` is called with the TNTL channels
+    whose scores a flush changed.
+
+    At most `message_cache_size` posted messages are cached, least recently
+    used first out, and as many submissions known to be gone. The messages
+    of a channel are dropped when its cycle ends.
+    """
+
+    def __init__(
+        self,
+        db_service: DatabaseService,
+        render_embed: Callable[[str, int], discord.Embed],
+        flush_interval: float = 1.0,
+        edit_interval: float = 5.0,
+        message_cache_size: int = 10_000,
+        on_flush: Callable[[set[int]], None] | None = None,
+    ):
+        self._db_service = db_service
+        self._render_embed = render_embed
+        self._flush_interval = flush_interval
+        self._edit_interval = edit_interval
+        self._message_cache_size = message_cache_size
+        self._on_flush = on_flush
+
+        self._pending_votes: set[tuple[int, int]] = set()
+        self._pending_submissions: set[int] = set()
+        self._dirty: set[int] = set()
+        self._messages: OrderedDict[int, tuple[discord.PartialMessage, str]] = (
+            OrderedDict()
+        )
+        self._last_edit: dict[int, float] = {}
+        self._editing: set[int] = set()
+        self._gone: OrderedDict[int, None] = OrderedDict()
+        self._task: asyncio.Task | None = None
+        self._edit_tasks: set[asyncio.Task] = set()
+
+        self.queued = 0
+        self.flushed = 0
+        self.edits = 0
+        self.coalesced_edits = 0
+
+    async def is_posted_message(self, tntl_submission_id: int, message_id: int) -> bool:
+        """Whether `message_id` is the message a submission is posted as."""
+        if tntl_submission_id in self._gone:
+            return False
+
+        if tntl_submission_id in self._messages:
+            self._messages.move_to_end(tntl_submission_id)
+            message, _ = self._messages[tntl_submission_id]
+            return message.id == message_id
+
+        posted_message_id = (
+            await self._db_service.get_discord_message_id_by_tntl_submission_id(
+                tntl_submission_id
+            )
+        )
+        if posted_message_id is None:
+            self._mark_gone(tntl_submission_id)
+            return False
+
+        return posted_message_id == message_id
+
+    def remember_message(
+        self, tntl_submission_id: int, message: discord.PartialMessage, url: str
+    ):
+        self._gone.pop(tntl_submission_id, None)
+        self._messages[tntl_submission_id] = (message, url)
+        self._messages.move_to_end(tntl_submission_id)
+        while len(self._messages) > self._message_cache_size:
+            evicted_id, _ = self._messages.popitem(last=False)
+            self._last_edit.pop(evicted_id, None)
+
+    def forget_channel(self, discord_channel_id: int):
+        """Drop the cached messages posted in a channel whose cycle ended."""
+        for tntl_submission_id, (message, _) in list(self._messages.items()):
+            if message.channel.id == discord_channel_id:
+                del self._messages[tntl_submission_id]
+                self._last_edit.pop(tntl_submission_id, None)
+
+    def record(self, tntl_submission_id: int, user_id: int):
+        vote = (tntl_submission_id, user_id)
+        if vote in self._pending_votes:
+            return
+
+        if (
+            tntl_submission_id in self._dirty
+            or tntl_submission_id in self._pending_submissions
+        ):
+            self.coalesced_edits += 1
+
+        self._pending_votes.add(vote)
+        self._pending_submissions.add(tntl_submission_id)
+        self.queued += 1
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.drain()
+
+    async def drain(self):
+        """Flush every buffered vote and wait for the embed edits it causes."""
+        await self.flush()
+        await self._render_due()
+        if self._edit_tasks:
+            await asyncio.gather(*self._edit_tasks, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+                await self._render_due()
+            except Exception:
+                logger.exception("Failed to flush upvotes")
+
+    async def flush(self):
+        if not self._pending_votes:
+            return
+
+        votes = list(self._pending_votes)
+        self._pending_votes = set()
+        self._pending_submissions = set()
+
+        try:
+            inserted = await self._db_service.upvote_tntl_submissions(votes)
+        except Exception:
+            # Put the votes back so the next flush retries them.
+            self._pending_votes.update(votes)
+            self._pending_submissions.update(
+                tntl_submission_id for tntl_submission_id, _ in votes
+            )
+            raise
+
+        self.flushed += len(votes)
+        self._dirty.update(tntl_submission_id for tntl_submission_id, _ in votes)
+        logger.info(f"Flushed {len(votes)} upvotes ({sum(inserted.values())} new)")
+
+        if inserted and self._on_flush is not None:
+            self._on_flush(set(inserted))
+
+    async def _render_due(self):
+        now = time.monotonic()
+        due = [
+            tntl_submission_id
+            for tntl_submission_id in self._dirty
+            if tntl_submission_id not in self._editing
+            and now - self._last_edit.get(tntl_submission_id, 0) >= self._edit_interval
+        ]
+        if not due:
+            return
+
+        upvote_counts = await self._db_service.get_upvote_counts(due)
+
+        for tntl_submission_id in due:
+            self._dirty.discard(tntl_submission_id)
+
+            if tntl_submission_id not in upvote_counts:
+                self._forget(tntl_submission_id)
+                continue
+
+            if tntl_submission_id not in self._messages:
+                continue
+
+            self._last_edit[tntl_submission_id] = now
+            self._editing.add(tntl_submission_id)
+            message, url = self._messages[tntl_submission_id]
+            task = asyncio.create_task(
+                self._edit(
+                    tntl_submission_id,
+                    message,
+                    url,
+                    upvote_counts[tntl_submission_id],
+                )
+            )
+            self._edit_tasks.add(task)
+            task.add_done_callback(self._edit_tasks.discard)
+
+    async def _edit(
+        self,
+        tntl_submission_id: int,
+        message: discord.PartialMessage,
+        url: str,
+        upvote_count: int,
+    ):
+        try:
+            await message.edit(embed=self._render_embed(url, upvote_count))
+            self.edits += 1
+        except discord.NotFound:
+            self._forget(tntl_submission_id)
+        except discord.HTTPException:
+            logger.exception(f"Failed to update upvotes of message {message.id}")
+            self._dirty.add(tntl_submission_id)
+        finally:
+            self._editing.discard(tntl_submission_id)
+
+    def _forget(self, tntl_submission_id: int):
+        self._mark_gone(tntl_submission_id)
+        self._messages.pop(tntl_submission_id, None)
+        self._last_edit.pop(tntl_submission_id, None)
+
+    def _mark_gone(self, tntl_submission_id: int):
+        self._gone[tntl_submission_id] = None
+        self._gone.move_to_end(tntl_submission_id)
+        while len(self._gone) > self._message_cache_size:
+            self._gone.popitem(last=False)
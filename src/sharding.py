@@ -0,0 +1,191 @@
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import discord
+
+from config import (
+    IDENTIFY_INTERVAL,
+    SHARD_COUNT,
+    SHARD_IDS,
+    SHARD_STATS_INTERVAL,
+    SYNC_COMMANDS,
+    WORKER_COUNT,
+    WORKER_INDEX,
+    logger,
+)
+
+
+def get_worker_shard_ids() -> list[int] | None:
+    """Shards this process should run, or None to let py-cord run them all.
+
+    SHARD_IDS wins when set; otherwise the SHARD_COUNT shards are dealt out
+    round-robin over WORKER_COUNT workers and this one takes every shard
+    whose id modulo WORKER_COUNT is WORKER_INDEX.
+    """
+    if SHARD_IDS:
+        return [int(shard_id) for shard_id in SHARD_IDS.split(",")]
+
+    if SHARD_COUNT is None or WORKER_COUNT == 1:
+        return None
+
+    return _round_robin_shard_ids(SHARD_COUNT, WORKER_COUNT, WORKER_INDEX)
+
+
+def _round_robin_shard_ids(
+    shard_count: int, worker_count: int, worker_index: int
+) -> list[int]:
+    return [
+        shard_id
+        for shard_id in range(shard_count)
+        if shard_id % worker_count == worker_index
+    ]
+
+
+def create_bot(intents: discord.Intents) -> discord.Bot:
+    if SHARD_COUNT is None:
+        return discord.bot.Bot(intents=intents)
+
+    shard_ids = get_worker_shard_ids()
+    logger.info(
+        f"Worker {WORKER_INDEX}/{WORKER_COUNT} running shards {shard_ids if shard_ids is not None else 'all'} of {SHARD_COUNT}"
+    )
+
+    # Application commands are global, one process syncing them is enough.
+    sync_commands = SYNC_COMMANDS
+    if sync_commands is None:
+        sync_commands = shard_ids is None or 0 in shard_ids
+
+    return discord.AutoShardedBot(
+        intents=intents,
+        shard_count=SHARD_COUNT,
+        shard_ids=shard_ids,
+        auto_sync_commands=sync_commands,
+    )
+
+
+class ShardStats:
+    """Counts handled events per shard and logs rates and gateway latency."""
+
+    def __init__(self, bot: discord.Bot, interval: float = SHARD_STATS_INTERVAL):
+        self._bot = bot
+        self._interval = interval
+        self._events: Counter[int] = Counter()
+        self._gateway_events = 0
+        self._task: asyncio.Task | None = None
+
+        @bot.listen("on_socket_event_type")
+        async def count_gateway_event(event_type: str):
+            self._gateway_events += 1
+
+        @bot.listen("on_message")
+        async def count_message(message: discord.Message):
+            self.record(message.guild)
+
+        @bot.listen("on_interaction")
+        async def count_interaction(interaction: discord.Interaction):
+            self.record(interaction.guild)
+
+    def record(self, guild: discord.Guild | None):
+        self._events[guild.shard_id if guild else 0] += 1
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._interval)
+            self.log()
+
+    def log(self):
+        events, self._events = self._events, Counter()
+        gateway_events, self._gateway_events = self._gateway_events, 0
+
+        if isinstance(self._bot, discord.AutoShardedBot):
+            latencies = dict(self._bot.latencies)
+        else:
+            latencies = {0: self._bot.latency}
+
+        for shard_id in sorted(latencies.keys() | events.keys()):
+            latency = latencies.get(shard_id, float("nan"))
+            logger.info(
+                f"Shard {shard_id}: {events[shard_id] / self._interval:.2f} events/s, {latency * 1000:.0f} ms latency"
+            )
+        logger.info(
+            f"Worker {WORKER_INDEX}: {gateway_events / self._interval:.2f} gateway events/s"
+        )
+
+
+def _split_shard_ids(worker_count: int) -> list[list[int]]:
+    """The shards each of `worker_count` workers runs.
+
+    An explicit SHARD_IDS list is dealt out over the workers the same way
+    SHARD_COUNT shards are when it isn't set.
+    """
+    if SHARD_IDS:
+        shard_ids = [int(shard_id) for shard_id in SHARD_IDS.split(",")]
+        return [shard_ids[index::worker_count] for index in range(worker_count)]
+
+    return [
+        _round_robin_shard_ids(SHARD_COUNT, worker_count, worker_index)
+        for worker_index in range(worker_count)
+    ]
+
+
+def run_workers(worker_count: int) -> int:
+    """Run this bot as `worker_count` processes, one per shard range.
+
+    Each child is this same entry point with WORKER_INDEX, WORKER_COUNT and
+    its own SHARD_IDS set; they share nothing but Postgres. Children are
+    started one after the other, each IDENTIFY_INTERVAL seconds per shard
+    of the previous child later, so their shards don't identify at the same
+    time. Returns the first non-zero exit code, or 0.
+    """
+    if SHARD_COUNT is None:
+        raise ValueError("SHARD_COUNT must be set to run several workers.")
+
+    worker_shard_ids = _split_shard_ids(worker_count)
+    if not all(worker_shard_ids):
+        raise ValueError("Every worker needs at least one shard to run.")
+
+    workers: list[subprocess.Popen] = []
+    stopping = False
+
+    def forward(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for worker in workers:
+            worker.send_signal(signum)
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+
+    for worker_index, shard_ids in enumerate(worker_shard_ids):
+        if worker_index > 0:
+            time.sleep(IDENTIFY_INTERVAL * len(worker_shard_ids[worker_index - 1]))
+        if stopping:
+            break
+        workers.append(
+            subprocess.Popen(
+                [sys.executable, sys.argv[0]],
+                env={
+                    **os.environ,
+                    "WORKER_INDEX": str(worker_index),
+                    "WORKER_COUNT": str(worker_count),
+                    "SHARD_IDS": ",".join(map(str, shard_ids)),
+                },
+            )
+        )
+
+    return_codes = [worker.wait() for worker in workers]
+    return next((code for code in return_codes if code), 0)
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import discord
+from discord.ext import commands
+
+from config import logger
+
+WARMING_UP_MESSAGE = "The bot is still warming up. Try again in a few seconds."
+
+
+class WarmingUpError(commands.CheckFailure):
+    pass
+
+
+class Readiness:
+    """Tracks a staged startup and holds handlers back until it is done.
+
+    The gateway connects while the database and the services behind the
+    handlers are brought up in the background. Until `mark_ready`, slash
+    commands and upvote buttons are answered with WARMING_UP_MESSAGE, and
+    channel messages wait in `wait`. Each phase is timed from when this
+    object was created, which is when the bot's modules finished importing,
+    and logged along with the time to the first interaction served.
+    """
+
+    def __init__(self):
+        self._started_at = time.monotonic()
+        self._ready = asyncio.Event()
+        self.phase_durations: dict[str, float] = {}
+        self.first_interaction_after: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    async def wait(self):
+        await self._ready.wait()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started_at
+
+    def record_phase(self, name: str, duration: float):
+        self.phase_durations[name] = duration
+        logger.info(f"Startup phase {name} took {duration * 1000:.0f} ms")
+
+    @asynccontextmanager
+    async def phase(self, name: str):
+        started_at = time.monotonic()
+        yield
+        self.record_phase(name, time.monotonic() - started_at)
+
+    def mark_ready(self):
+        if self.ready:
+            return
+        self._ready.set()
+        logger.info(f"Ready to handle events {self.elapsed():.2f} s after start")
+
+    def install(self, bot: discord.Bot):
+        """Gate every slash command on readiness and log the gateway phases."""
+
+        @bot.check
+        async def warmed_up(ctx: discord.ApplicationContext) -> bool:
+            if self.ready:
+                return True
+            await ctx.respond(WARMING_UP_MESSAGE, ephemeral=True)
+            raise WarmingUpError()
+
+        @bot.event
+        async def on_application_command_error(
+            ctx: discord.ApplicationContext, error: discord.DiscordException
+        ):
+            # Already answered. Anything else is logged, as this replaces
+            # py-cord's default handler.
+            if isinstance(error, WarmingUpError):
+                return
+            logger.error(
+                f"Command {ctx.command} failed", exc_info=error  # type: ignore
+            )
+
+        @bot.listen("on_ready")
+        async def log_gateway_ready():
+            if "gateway" not in self.phase_durations:
+                self.record_phase("gateway", self.elapsed())
+
+        @bot.listen("on_interaction")
+        async def log_first_interaction(interaction: discord.Interaction):
+            if self.ready and self.first_interaction_after is None:
+                self.first_interaction_after = self.elapsed()
+                logger.info(
+                    f"First interaction served {self.first_interaction_after:.2f} s after start"
+                )
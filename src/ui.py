@@ -1,82 +1,85 @@
 import discord
 
 from config import logger
-from services.database import DatabaseService
-
-
-def get_tntl_message_view(tntl_submission_id: int, db_service: DatabaseService, bot: discord.Bot):
-    class TntlMessageView(discord.ui.View):
-        def __init__(
-            self, tntl_submission_id: int, db_service: DatabaseService, bot: discord.Bot
-        ):
-            self.tntl_submission_id = tntl_submission_id
-            self.db_service = db_service
-            self.bot = bot
-            super().__init__(timeout=None)
-
-        @discord.ui.button(
-            label="Upvote",
-            style=discord.ButtonStyle.success,
-            custom_id=f"upvote_button_{tntl_submission_id}",
-        )
-        async def upvote(self, button: discord.ui.Button, interaction: discord.Interaction):
-            user = interaction.user
-
-            if not user:
-                await interaction.respond(
-                    "You must be logged in to upvote.", ephemeral=True
-                )
-                return
-
-            if not self.db_service.check_tntl_submission_exists(self.tntl_submission_id):
-                await interaction.respond(
-                    "This message is no longer available. (Error 1)", ephemeral=True
-                )
-                return
-
-            self.db_service.upvote_tntl_submission(self.tntl_submission_id, user.id)
-
-            discord_message_id = (
-                self.db_service.get_discord_message_id_by_tntl_submission_id(
-                    self.tntl_submission_id
-                )
-            )
-            if not discord_message_id:
-                await interaction.respond(
-                    "This message is no longer available. (Error 2)", ephemeral=True
-                )
-                return
-
-            channel = interaction.channel
-            if not channel:
-                await interaction.respond(
-                    "This message is no longer available. (Error 3)", ephemeral=True
-                )
-                return
-
-            message = await channel.fetch_message(discord_message_id)
-            if not message:
-                await interaction.respond(
-                    "This message is no longer available. (Error 4)", ephemeral=True
-                )
-                return
-
-            upvote_count = self.db_service.get_upvote_count_by_tntl_submission_id(
-                self.tntl_submission_id
-            )
-            await message.edit(
-                embed=get_tntl_message_embed(
-                    message.embeds[0].fields[0].value, upvote_count
-                )
-            )
+from metrics import EVENT_DURATION, timed
+from services.rate_limiter import RateLimiter
+from services.upvote_aggregator import UpvoteAggregator
+
+UPVOTE_BUTTON_CUSTOM_ID_PREFIX = "upvote_button_"
+
+
+class TntlMessageView(discord.ui.View):
+    """Upvote button attached to a posted submission.
 
-            logger.info(
-                f"User {user.id} upvoted message {self.tntl_submission_id} - {upvote_count} upvotes"
+    The submission id is carried in the button's custom_id. Clicks are not
+    dispatched through this view but routed by the single on_interaction
+    listener in events.py, so nothing has to be registered per submission.
+    """
+
+    def __init__(self, tntl_submission_id: int):
+        super().__init__(timeout=None)
+        self.add_item(
+            discord.ui.Button(
+                label="Upvote",
+                style=discord.ButtonStyle.success,
+                custom_id=f"{UPVOTE_BUTTON_CUSTOM_ID_PREFIX}{tntl_submission_id}",
             )
+        )
+
 
-            await interaction.respond("Upvote submitted.", ephemeral=True)
+def parse_upvote_custom_id(custom_id: str) -> int | None:
+    if not custom_id.startswith(UPVOTE_BUTTON_CUSTOM_ID_PREFIX):
+        return None
 
-    return TntlMessageView(tntl_submission_id, db_service, bot)
+    tntl_submission_id = custom_id.removeprefix(UPVOTE_BUTTON_CUSTOM_ID_PREFIX)
+    return int(tntl_submission_id) if tntl_submission_id.isdigit() else None
+
+
+@timed(EVENT_DURATION, event="upvote")
+async def handle_upvote(
+    interaction: discord.Interaction,
+    tntl_submission_id: int,
+    upvote_aggregator: UpvoteAggregator,
+    upvote_limiter: RateLimiter,
+):
+    user = interaction.user
+
+    if not user:
+        await interaction.respond("You must be logged in to upvote.", ephemeral=True)
+        return
+
+    if not upvote_limiter.allow(user.id, interaction.channel_id or 0):
+        await interaction.respond(
+            "You are voting too fast. Try again in a moment.", ephemeral=True
+        )
+        return
+
+    message = interaction.message
+    if not message or not message.embeds:
+        await interaction.respond(
+            "This message is no longer available. (Error 2)", ephemeral=True
+        )
+        return
+
+    # Buttons left on messages from an earlier watch party, or on submissions
+    # that are gone, no longer count.
+    if not await upvote_aggregator.is_posted_message(tntl_submission_id, message.id):
+        await interaction.respond(
+            "This message is no longer available. (Error 1)", ephemeral=True
+        )
+        return
+
+    # The vote is written and the embed redrawn in the background.
+    upvote_aggregator.remember_message(
+        tntl_submission_id,
+        message.channel.get_partial_message(message.id),
+        message.embeds[0].fields[0].value,
+    )
+    upvote_aggregator.record(tntl_submission_id, user.id)
+
+    logger.info(f"User {user.id} upvoted message {tntl_submission_id}")
+
+    await interaction.respond("Upvote submitted.", ephemeral=True)
 
 
 def get_tntl_message_embed(url: str, upvote_count: int):
@@ -87,5 +90,3 @@ def get_tntl_message_embed(url: str, upvote_count: int):
             discord.EmbedField(name="Upvotes", value=str(upvote_count), inline=True),
         ],
     )
-
-
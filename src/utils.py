@@ -1,7 +1,10 @@
 import discord
 
+from canonical_url import canonicalize_url, hash_canonical_url
 from config import logger
+from services.channel_registry import ChannelRegistry
 from services.database import DatabaseService
+from services.rate_limiter import RateLimiter
 
 
 class NonTntlChannelError(Exception):
@@ -12,23 +15,57 @@ class SubmissionLimitExceededError(Exception):
     pass
 
 
+class DuplicateSubmissionError(Exception):
+    pass
+
+
+class SubmissionRateLimitedError(Exception):
+    pass
+
+
 async def process_submission(
     url: str,
     channel: discord.TextChannel,
     submitter_id: int,
     db_service: DatabaseService,
+    channel_registry: ChannelRegistry,
+    submission_limiter: RateLimiter,
 ):
-    tntl_channel_id = db_service.get_tntl_channel_id(channel.id)
+    tntl_channel_id = channel_registry.get_tntl_channel_id(channel.id)
 
     if not tntl_channel_id:
         logger.warning(f"Attempted to submit message to non-TNTL channel {channel.id}")
         raise NonTntlChannelError
 
-    if not db_service.can_submit_tntl_message(tntl_channel_id, submitter_id):
+    if not submission_limiter.allow(submitter_id, channel.id):
+        logger.debug(f"User {submitter_id} is submitting too fast in channel {channel.id}")
+        raise SubmissionRateLimitedError
+
+    canonical_url = canonicalize_url(url)
+    result = await db_service.submit_if_under_quota(
+        url,
+        channel.id,
+        submitter_id,
+        canonical_url=canonical_url,
+        canonical_hash=hash_canonical_url(canonical_url),
+    )
+
+    if result.status == DatabaseService.SubmissionStatus.NOT_TNTL_CHANNEL:
+        logger.warning(f"Attempted to submit message to non-TNTL channel {channel.id}")
+        raise NonTntlChannelError
+
+    if result.status == DatabaseService.SubmissionStatus.LIMIT_EXCEEDED:
         logger.info(
             f"User {submitter_id} exceeded submission limit in channel {channel.id}"
         )
         raise SubmissionLimitExceededError
 
-    tntl_message_id = db_service.submit_tntl_message(url, tntl_channel_id, submitter_id)
-    logger.info(f"New TNTL message {tntl_message_id} submitted by user {submitter_id}")
+    if result.status == DatabaseService.SubmissionStatus.DUPLICATE:
+        logger.info(
+            f"User {submitter_id} submitted duplicate {canonical_url} in channel {channel.id}"
+        )
+        raise DuplicateSubmissionError
+
+    logger.info(
+        f"New TNTL message {result.tntl_submission_id} submitted by user {submitter_id}"
+    )
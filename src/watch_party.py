@@ -0,0 +1,93 @@
+import random
+from collections.abc import Awaitable, Callable
+
+import discord
+
+from config import WATCH_PARTY_FETCH_SIZE, WATCH_PARTY_FLUSH_SIZE, logger
+from services.database import DatabaseService
+from services.upvote_aggregator import UpvoteAggregator
+from ui import TntlMessageView, get_tntl_message_embed
+
+
+async def publish_watch_party(
+    channel: discord.TextChannel,
+    tntl_channel_id: int,
+    db_service: DatabaseService,
+    upvote_aggregator: UpvoteAggregator,
+    on_progress: Callable[[int, int], Awaitable[None]],
+) -> int:
+    """Post every submission of a channel in a shuffled order.
+
+    The party is shuffled once when it begins. Submissions and their upvote
+    counts are then streamed from the database in that order, in batches of
+    WATCH_PARTY_FETCH_SIZE, so posting starts with the first batch. Posted
+    messages are remembered by the upvote aggregator, whose cache holds at
+    most UPVOTE_MESSAGE_CACHE_SIZE of them.
+    Messages are sent back to back (py-cord waits out the channel's rate
+    limit bucket between sends) and the message links are written in
+    batches of WATCH_PARTY_FLUSH_SIZE, and once more when posting stops for
+    any reason. If a party in this channel was interrupted, it is resumed
+    with the same order and already posted submissions are skipped; only
+    if the process dies can up to a batch of them be posted again.
+
+    Returns the number of submissions posted by this call.
+    """
+    watch_party = await db_service.get_unfinished_watch_party(tntl_channel_id)
+    if watch_party:
+        total = watch_party.total_submissions
+        already_posted = watch_party.posted_submissions
+        logger.info(
+            f"Resuming TNTL watch party in channel {tntl_channel_id} ({already_posted}/{total} posted)"
+        )
+    else:
+        total = await db_service.begin_watch_party(
+            tntl_channel_id, random.getrandbits(63)
+        )
+        already_posted = 0
+        await channel.send("Here are the submissions for this watch party:")
+
+    logger.info(
+        f"Starting TNTL watch party in channel {tntl_channel_id} with {total - already_posted} submissions to post"
+    )
+
+    links: list[tuple[int, int]] = []
+    posted = 0
+
+    try:
+        async for batch in db_service.stream_watch_party_submissions(
+            tntl_channel_id, WATCH_PARTY_FETCH_SIZE
+        ):
+            for submission in batch:
+                view = TntlMessageView(submission.id)
+                submission_message = await channel.send(
+                    embed=get_tntl_message_embed(
+                        submission.message_text, submission.upvote_count
+                    ),
+                    view=view,
+                )
+                # py-cord starts tracking every sent view; clicks are routed
+                # by custom_id instead, so drop it from the view store now.
+                view.stop()
+                upvote_aggregator.remember_message(
+                    submission.id,
+                    channel.get_partial_message(submission_message.id),
+                    submission.message_text,
+                )
+                links.append((submission.id, submission_message.id))
+                posted += 1
+
+                if len(links) >= WATCH_PARTY_FLUSH_SIZE:
+                    await db_service.record_watch_party_progress(
+                        tntl_channel_id, links
+                    )
+                    links = []
+                    await on_progress(already_posted + posted, total)
+    finally:
+        # Link what was posted before a failed send or a cancellation, so a
+        # resumed party doesn't post it again.
+        if links:
+            await db_service.record_watch_party_progress(tntl_channel_id, links)
+
+    await db_service.complete_watch_party(tntl_channel_id)
+
+    return posted
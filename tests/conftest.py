@@ -0,0 +1,16 @@
+import pytest
+
+from services.database import create_database_service
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+async def db_service(request, tmp_path):
+    """An empty, migrated database for each backend that needs no server."""
+    database_url = (
+        "memory://" if request.param == "memory" else f"sqlite:///{tmp_path}/tntl.db"
+    )
+    service = create_database_service(database_url)
+    await service.open()
+    await service.migrate()
+    yield service
+    await service.close()
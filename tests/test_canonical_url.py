@@ -0,0 +1,66 @@
+import pytest
+
+from canonical_url import canonicalize_url, hash_canonical_url
+
+
+@pytest.mark.parametrize(
+    ("url", "canonical_url"),
+    [
+        (
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ&feature=share",
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        ),
+        ("youtu.be/dQw4w9WgXcQ?si=abc", "https://www.youtube.com/watch?v=dQw4w9WgXcQ"),
+        (
+            "https://m.youtube.com/shorts/dQw4w9WgXcQ",
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        ),
+        (
+            "https://twitter.com/someone/status/123456?s=20",
+            "https://x.com/i/status/123456",
+        ),
+        ("https://fxtwitter.com/i/web/status/123456", "https://x.com/i/status/123456"),
+        (
+            "https://www.instagram.com/reel/Cabc_12/?igsh=x",
+            "https://www.instagram.com/p/Cabc_12",
+        ),
+        (
+            "https://www.tiktok.com/@some.one/video/7301?is_from_webapp=1",
+            "https://www.tiktok.com/video/7301",
+        ),
+        ("https://player.vimeo.com/video/76979871", "https://vimeo.com/76979871"),
+        (
+            "https://www.twitch.tv/streamer/clip/FunnySlug-abc",
+            "https://clips.twitch.tv/FunnySlug-abc",
+        ),
+        (
+            "https://old.reddit.com/r/funny/comments/abc/title/",
+            "https://www.reddit.com/r/funny/comments/abc/title",
+        ),
+        (
+            "https://Example.com/path/?utm_source=x&b=2&a=1#frag",
+            "https://example.com/path?a=1&b=2",
+        ),
+    ],
+)
+def test_links_are_reduced_to_one_canonical_form(url, canonical_url):
+    assert canonicalize_url(url) == canonical_url
+
+
+@pytest.mark.parametrize(
+    ("text", "canonical_text"),
+    [
+        ("  not a link  ", "not a link"),
+        ("ftp://example.com/file", "ftp://example.com/file"),
+        ("hello world.com", "hello world.com"),
+    ],
+)
+def test_anything_else_is_only_stripped(text, canonical_text):
+    assert canonicalize_url(text) == canonical_text
+
+
+def test_hash_fits_a_bigint():
+    canonical_hash = hash_canonical_url("https://x.com/i/status/123456")
+
+    assert -(2**63) <= canonical_hash < 2**63
+    assert canonical_hash == hash_canonical_url("https://x.com/i/status/123456")
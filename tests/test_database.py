@@ -0,0 +1,199 @@
+from canonical_url import canonicalize_url, hash_canonical_url
+from services.cycle_archiver import CycleArchiver
+from services.database import DatabaseService
+from services.memory_database import MemoryDatabaseService
+
+Status = DatabaseService.SubmissionStatus
+
+DISCORD_CHANNEL_ID = 1234
+
+
+async def submit(db_service, submitter_id: int, url: str):
+    canonical_url = canonicalize_url(url)
+    return await db_service.submit_if_under_quota(
+        url,
+        DISCORD_CHANNEL_ID,
+        submitter_id,
+        canonical_url,
+        hash_canonical_url(canonical_url),
+    )
+
+
+async def end_and_archive_cycle(db_service, tntl_channel_id: int) -> int:
+    ended_cycle_number = await db_service.end_tntl_cycle(tntl_channel_id)
+    while await db_service.archive_ended_cycle_batch(
+        tntl_channel_id, ended_cycle_number, 100
+    ):
+        pass
+    await db_service.complete_cycle_teardown(tntl_channel_id, ended_cycle_number)
+    return ended_cycle_number
+
+
+async def archived_submissions(db_service) -> dict[int, str]:
+    if isinstance(db_service, MemoryDatabaseService):
+        return {
+            submission.id: submission.message_text
+            for submission in db_service._archive.values()
+        }
+    return await db_service._transaction(
+        lambda conn: dict(
+            conn.execute("SELECT id, message_text FROM tntl_submission_archive")
+        )
+    )
+
+
+async def test_archiving_two_cycles_in_a_row_keeps_both(db_service):
+    tntl_channel_id = await db_service.define_tntl_channel(DISCORD_CHANNEL_ID, 5)
+
+    first = await submit(db_service, 1, "https://a.example")
+    await end_and_archive_cycle(db_service, tntl_channel_id)
+    second = await submit(db_service, 1, "https://b.example")
+    await end_and_archive_cycle(db_service, tntl_channel_id)
+
+    assert second.tntl_submission_id != first.tntl_submission_id
+    assert await archived_submissions(db_service) == {
+        first.tntl_submission_id: "https://a.example",
+        second.tntl_submission_id: "https://b.example",
+    }
+    assert await db_service.get_pending_cycle_teardowns() == {}
+
+
+async def test_posted_messages_are_scoped_to_the_current_cycle(db_service):
+    tntl_channel_id = await db_service.define_tntl_channel(DISCORD_CHANNEL_ID, 5)
+    submission = await submit(db_service, 1, "https://a.example")
+    tntl_submission_id = submission.tntl_submission_id
+    await db_service.begin_watch_party(tntl_channel_id, 0)
+    await db_service.record_watch_party_progress(
+        tntl_channel_id, [(tntl_submission_id, 42)]
+    )
+
+    assert (
+        await db_service.get_discord_message_id_by_tntl_submission_id(
+            tntl_submission_id
+        )
+        == 42
+    )
+    assert await db_service.get_upvote_counts([tntl_submission_id]) == {
+        tntl_submission_id: 0
+    }
+
+    await db_service.end_tntl_cycle(tntl_channel_id)
+
+    assert (
+        await db_service.get_discord_message_id_by_tntl_submission_id(
+            tntl_submission_id
+        )
+        is None
+    )
+    assert await db_service.get_upvote_counts([tntl_submission_id]) == {}
+
+
+async def test_watch_party_stream_pages_through_unposted_submissions(db_service):
+    tntl_channel_id = await db_service.define_tntl_channel(DISCORD_CHANNEL_ID, 5)
+    for submitter_id in range(1, 8):
+        await submit(db_service, submitter_id, f"https://{submitter_id}.example")
+    await db_service.begin_watch_party(tntl_channel_id, 3)
+
+    batches = [
+        [submission.id for submission in batch]
+        async for batch in db_service.stream_watch_party_submissions(
+            tntl_channel_id, batch_size=3
+        )
+    ]
+    order = [tntl_submission_id for batch in batches for tntl_submission_id in batch]
+
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert len(set(order)) == 7
+
+    await db_service.record_watch_party_progress(
+        tntl_channel_id, [(order[0], 100), (order[1], 101)]
+    )
+    resumed = [
+        submission.id
+        async for batch in db_service.stream_watch_party_submissions(
+            tntl_channel_id, batch_size=3
+        )
+        for submission in batch
+    ]
+
+    assert resumed == order[2:]
+
+
+async def test_submissions_are_held_to_the_quota_and_deduplicated(db_service):
+    tntl_channel_id = await db_service.define_tntl_channel(DISCORD_CHANNEL_ID, 2)
+
+    first = await submit(db_service, 1, "https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+    second = await submit(db_service, 1, "https://b.example")
+    over_quota = await submit(db_service, 1, "https://c.example")
+    duplicate = await submit(db_service, 2, "youtu.be/dQw4w9WgXcQ?si=abc")
+    elsewhere = await db_service.submit_if_under_quota(
+        "https://d.example", DISCORD_CHANNEL_ID + 1, 1, "https://d.example", 1
+    )
+
+    assert first.status == Status.SUBMITTED
+    assert second.status == Status.SUBMITTED
+    assert second.tntl_submission_id != first.tntl_submission_id
+    assert over_quota.status == Status.LIMIT_EXCEEDED
+    assert duplicate.status == Status.DUPLICATE
+    assert elsewhere.status == Status.NOT_TNTL_CHANNEL
+
+    await db_service.end_tntl_cycle(tntl_channel_id)
+
+    resubmitted = await submit(
+        db_service, 1, "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    )
+    assert resubmitted.status == Status.SUBMITTED
+
+
+async def test_cycle_archiver_archives_in_batches_and_keeps_scores(db_service):
+    tntl_channel_id = await db_service.define_tntl_channel(DISCORD_CHANNEL_ID, 5)
+    submissions = [
+        await submit(db_service, submitter_id, f"https://{submitter_id}.example")
+        for submitter_id in range(1, 6)
+    ]
+    await db_service.upvote_tntl_submissions(
+        [
+            (submissions[0].tntl_submission_id, 100),
+            (submissions[0].tntl_submission_id, 101),
+        ]
+    )
+    archiver = CycleArchiver(db_service, batch_size=2, batch_delay=0)
+
+    cycle_number = await db_service.end_tntl_cycle(tntl_channel_id)
+    archiver.schedule(tntl_channel_id, cycle_number)
+    await archiver.join()
+
+    assert archiver.archived == 5
+    assert await archived_submissions(db_service) == {
+        submission.tntl_submission_id: f"https://{submitter_id}.example"
+        for submitter_id, submission in enumerate(submissions, start=1)
+    }
+    assert await db_service.get_pending_cycle_teardowns() == {}
+    assert (
+        await db_service.get_leaderboard(
+            tntl_channel_id, DatabaseService.LeaderboardScope.CYCLE
+        )
+        == []
+    )
+    top, *_ = await db_service.get_leaderboard(
+        tntl_channel_id, DatabaseService.LeaderboardScope.ALL_TIME
+    )
+    assert (top.submitter_id, top.upvote_count) == (1, 2)
+
+
+async def test_cycle_archiver_resumes_pending_teardowns(db_service):
+    tntl_channel_id = await db_service.define_tntl_channel(DISCORD_CHANNEL_ID, 5)
+    submission = await submit(db_service, 1, "https://a.example")
+    cycle_number = await db_service.end_tntl_cycle(tntl_channel_id)
+    assert await db_service.get_pending_cycle_teardowns() == {
+        tntl_channel_id: cycle_number
+    }
+
+    archiver = CycleArchiver(db_service, batch_delay=0)
+    await archiver.start()
+    await archiver.join()
+
+    assert await archived_submissions(db_service) == {
+        submission.tntl_submission_id: "https://a.example"
+    }
+    assert await db_service.get_pending_cycle_teardowns() == {}
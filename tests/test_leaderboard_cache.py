@@ -0,0 +1,50 @@
+from services.database import DatabaseService
+from services.leaderboard_cache import LeaderboardCache
+from test_database import DISCORD_CHANNEL_ID, submit
+
+CYCLE = DatabaseService.LeaderboardScope.CYCLE
+
+
+async def define_channel_with_votes(db_service) -> int:
+    tntl_channel_id = await db_service.define_tntl_channel(DISCORD_CHANNEL_ID, 5)
+    submissions = [
+        await submit(db_service, submitter_id, f"https://{submitter_id}.example")
+        for submitter_id in range(1, 4)
+    ]
+    await db_service.upvote_tntl_submissions(
+        [(submission.tntl_submission_id, 100) for submission in submissions]
+    )
+    return tntl_channel_id
+
+
+async def test_pages_past_the_end_are_not_cached(db_service):
+    tntl_channel_id = await define_channel_with_votes(db_service)
+    cache = LeaderboardCache(db_service, page_size=2)
+
+    for page in range(3, 100):
+        assert await cache.get_page(tntl_channel_id, CYCLE, page) == ([], False)
+    entries, has_next = await cache.get_page(tntl_channel_id, CYCLE, 2)
+
+    assert (len(entries), has_next) == (1, False)
+    assert len(cache) == 1
+
+
+async def test_oldest_pages_are_evicted_past_max_pages(db_service):
+    tntl_channel_id = await define_channel_with_votes(db_service)
+    cache = LeaderboardCache(db_service, page_size=1, max_pages=2)
+
+    for page in (1, 2, 3):
+        await cache.get_page(tntl_channel_id, CYCLE, page)
+
+    assert [page for _, _, page in cache._pages] == [2, 3]
+
+
+async def test_expired_pages_are_evicted_on_write(db_service):
+    tntl_channel_id = await define_channel_with_votes(db_service)
+    cache = LeaderboardCache(db_service, page_size=1, ttl=0)
+
+    for page in (1, 2, 3):
+        await cache.get_page(tntl_channel_id, CYCLE, page)
+
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (0, 3)
@@ -0,0 +1,50 @@
+import pytest
+
+from services import rate_limiter
+from services.rate_limiter import RateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    return clock
+
+
+def test_burst_then_refill(clock):
+    limiter = RateLimiter(rate=1.0, burst=3)
+
+    assert [limiter.allow(1, 10) for _ in range(4)] == [True, True, True, False]
+    assert limiter.allow(2, 10)
+    assert limiter.allow(1, 11)
+
+    clock.now += 1.5
+    assert limiter.allow(1, 10)
+    assert not limiter.allow(1, 10)
+
+    clock.now += 10
+    assert [limiter.allow(1, 10) for _ in range(4)] == [True, True, True, False]
+    assert (limiter.allowed, limiter.rejected) == (9, 3)
+
+
+def test_sweep_drops_only_refilled_buckets(clock):
+    limiter = RateLimiter(rate=0.1, burst=3, sweep_interval=60)
+    for _ in range(3):
+        limiter.allow(1, 10)
+    clock.now += 55
+    limiter.allow(2, 10)
+    assert len(limiter) == 2
+
+    # The first bucket has refilled by the sweep, the second hasn't.
+    clock.now += 5
+    limiter.allow(3, 10)
+
+    assert set(limiter._buckets) == {(2, 10), (3, 10)}
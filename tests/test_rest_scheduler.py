@@ -0,0 +1,101 @@
+import asyncio
+
+from services.rest_scheduler import RestPriority, RestScheduler
+
+
+async def settle():
+    """Let the submitted calls reach the scheduler and the started ones run."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class Calls:
+    """REST calls that record when they run and finish when released."""
+
+    def __init__(self):
+        self.started: list[str] = []
+        self._release = asyncio.Event()
+
+    def make(self, name: str, wait: bool = False):
+        async def call():
+            self.started.append(name)
+            if wait:
+                await self._release.wait()
+            return name
+
+        return call
+
+    def release(self):
+        self._release.set()
+
+
+async def test_acks_skip_the_queue_and_posts_go_before_edits():
+    scheduler = RestScheduler(max_concurrency=1)
+    calls = Calls()
+
+    blocking = asyncio.create_task(
+        scheduler.submit(RestPriority.POST, "a", calls.make("blocking", wait=True))
+    )
+    await settle()
+    queued = [
+        asyncio.create_task(
+            scheduler.submit(RestPriority.EDIT, "b", calls.make("edit"))
+        ),
+        asyncio.create_task(
+            scheduler.submit(RestPriority.POST, "c", calls.make("post"))
+        ),
+        asyncio.create_task(scheduler.submit(RestPriority.ACK, "d", calls.make("ack"))),
+    ]
+    await settle()
+    assert calls.started == ["blocking", "ack"]
+
+    calls.release()
+    await asyncio.gather(blocking, *queued)
+
+    assert calls.started == ["blocking", "ack", "post", "edit"]
+
+
+async def test_queued_edits_of_a_message_are_merged():
+    scheduler = RestScheduler(max_concurrency=1)
+    calls = Calls()
+
+    blocking = asyncio.create_task(
+        scheduler.submit(RestPriority.POST, "a", calls.make("blocking", wait=True))
+    )
+    await settle()
+    edits = [
+        asyncio.create_task(
+            scheduler.submit(RestPriority.EDIT, "b", calls.make(name), "message")
+        )
+        for name in ("first", "second", "third")
+    ]
+    await settle()
+
+    calls.release()
+    results = await asyncio.gather(blocking, *edits)
+
+    assert calls.started == ["blocking", "third"]
+    assert results == ["blocking", "third", "third", "third"]
+    assert scheduler.merged_edits == 2
+
+
+async def test_calls_in_one_bucket_run_one_at_a_time():
+    scheduler = RestScheduler(max_concurrency=5)
+    calls = Calls()
+
+    first = asyncio.create_task(
+        scheduler.submit(RestPriority.POST, "a", calls.make("first", wait=True))
+    )
+    second = asyncio.create_task(
+        scheduler.submit(RestPriority.POST, "a", calls.make("second"))
+    )
+    other = asyncio.create_task(
+        scheduler.submit(RestPriority.POST, "b", calls.make("other"))
+    )
+    await settle()
+    assert calls.started == ["first", "other"]
+
+    calls.release()
+    await asyncio.gather(first, second, other)
+
+    assert calls.started == ["first", "other", "second"]
@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+from services.submission_cleanup import SubmissionCleanup
+
+
+class FlakyChannel:
+    """A channel whose first `failures` deletes raise."""
+
+    def __init__(self, channel_id: int, failures: int = 0):
+        self.id = channel_id
+        self.failures = failures
+        self.deletes: list[list[int]] = []
+
+    async def delete_messages(self, messages):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Discord is unreachable")
+        self.deletes.append([message.id for message in messages])
+
+
+class FlakyUser:
+    """A user whose first `failures` DMs raise."""
+
+    def __init__(self, user_id: int, failures: int = 0):
+        self.id = user_id
+        self.failures = failures
+        self.dms: list[str] = []
+
+    async def send(self, content: str):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Discord is unreachable")
+        self.dms.append(content)
+
+
+def message(message_id: int, channel: FlakyChannel, author: FlakyUser):
+    return SimpleNamespace(id=message_id, channel=channel, author=author)
+
+
+async def test_deletes_and_notices_are_coalesced_per_flush():
+    cleanup = SubmissionCleanup()
+    channel = FlakyChannel(10)
+    user = FlakyUser(1)
+
+    cleanup.queue(message(1, channel, user), "Submitted")
+    cleanup.queue(message(2, channel, user), "Submitted")
+    cleanup.queue(message(3, channel, user), "Duplicate")
+    await cleanup.drain()
+
+    assert channel.deletes == [[1, 2, 3]]
+    assert user.dms == ["Submitted (x2)\nDuplicate"]
+    assert (cleanup.deleted, cleanup.bulk_deletes) == (3, 1)
+    assert (cleanup.notices_sent, cleanup.coalesced_notices) == (1, 2)
+
+
+async def test_failures_are_retried_with_notices_queued_meanwhile():
+    cleanup = SubmissionCleanup(retry_delay=0)
+    channel = FlakyChannel(10, failures=1)
+    user = FlakyUser(1, failures=1)
+
+    cleanup.queue(message(1, channel, user), "Submitted")
+    await cleanup.flush()
+    assert cleanup.retries == 2
+    assert cleanup.pending() == 1
+
+    cleanup.queue(message(2, channel, user), "Submitted")
+    await cleanup.drain()
+
+    assert channel.deletes == [[1, 2]]
+    assert user.dms == ["Submitted (x2)"]
+    assert cleanup.dropped == 0
+
+
+async def test_failures_are_dropped_after_max_attempts():
+    cleanup = SubmissionCleanup(max_attempts=2, retry_delay=0)
+    channel = FlakyChannel(10, failures=2)
+    user = FlakyUser(1, failures=2)
+
+    cleanup.queue(message(1, channel, user), "Submitted")
+    await cleanup.drain()
+
+    assert channel.deletes == []
+    assert user.dms == []
+    assert cleanup.retries == 2
+    assert cleanup.dropped == 2
+    assert cleanup.pending() == 0
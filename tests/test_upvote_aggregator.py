@@ -0,0 +1,45 @@
+from bench.fake_discord import FakeChannel, FakeRest
+from services.upvote_aggregator import UpvoteAggregator
+from ui import get_tntl_message_embed
+
+
+def make_aggregator(db_service, message_cache_size: int) -> UpvoteAggregator:
+    return UpvoteAggregator(
+        db_service,
+        get_tntl_message_embed,
+        message_cache_size=message_cache_size,
+    )
+
+
+async def test_message_cache_evicts_least_recently_used(db_service):
+    aggregator = make_aggregator(db_service, message_cache_size=2)
+    channel = FakeChannel(FakeRest(latency=0, jitter=0))
+    messages = [await channel.send(f"https://{i}.example") for i in range(3)]
+
+    aggregator.remember_message(1, messages[0], "https://0.example")
+    aggregator.remember_message(2, messages[1], "https://1.example")
+    assert await aggregator.is_posted_message(1, messages[0].id)
+    aggregator.remember_message(3, messages[2], "https://2.example")
+
+    assert list(aggregator._messages) == [1, 3]
+
+
+async def test_gone_submissions_are_capped(db_service):
+    aggregator = make_aggregator(db_service, message_cache_size=2)
+
+    for tntl_submission_id in range(1, 5):
+        assert not await aggregator.is_posted_message(tntl_submission_id, 1)
+
+    assert list(aggregator._gone) == [3, 4]
+
+
+async def test_forget_channel_drops_only_its_messages(db_service):
+    aggregator = make_aggregator(db_service, message_cache_size=10)
+    rest = FakeRest(latency=0, jitter=0)
+    ended, other = FakeChannel(rest), FakeChannel(rest)
+
+    aggregator.remember_message(1, await ended.send(), "https://a.example")
+    aggregator.remember_message(2, await other.send(), "https://b.example")
+    aggregator.forget_channel(ended.id)
+
+    assert list(aggregator._messages) == [2]
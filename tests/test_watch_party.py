@@ -0,0 +1,47 @@
+import pytest
+
+from bench.fake_discord import FakeChannel, FakeRest
+from services.upvote_aggregator import UpvoteAggregator
+from test_database import DISCORD_CHANNEL_ID, submit
+from ui import get_tntl_message_embed
+from watch_party import publish_watch_party
+
+
+class FailingChannel(FakeChannel):
+    """A channel whose sends fail once `sends_left` messages went out."""
+
+    def __init__(self, sends_left: int):
+        super().__init__(FakeRest(latency=0, jitter=0))
+        self.sends_left = sends_left
+
+    async def send(self, *args, **kwargs):
+        if self.sends_left == 0:
+            raise ConnectionError("Discord is unreachable")
+        self.sends_left -= 1
+        return await super().send(*args, **kwargs)
+
+
+async def no_progress(posted: int, total: int):
+    pass
+
+
+async def test_posts_before_a_failure_are_not_posted_again(db_service):
+    tntl_channel_id = await db_service.define_tntl_channel(DISCORD_CHANNEL_ID, 5)
+    for submitter_id in range(1, 6):
+        await submit(db_service, submitter_id, f"https://{submitter_id}.example")
+    aggregator = UpvoteAggregator(db_service, get_tntl_message_embed)
+
+    # The party's intro message, then two submissions.
+    channel = FailingChannel(sends_left=3)
+    with pytest.raises(ConnectionError):
+        await publish_watch_party(
+            channel, tntl_channel_id, db_service, aggregator, no_progress
+        )
+
+    channel.sends_left = 10
+    posted = await publish_watch_party(
+        channel, tntl_channel_id, db_service, aggregator, no_progress
+    )
+
+    assert posted == 3
+    assert len(channel.messages) == 6